@@ -0,0 +1,99 @@
+"""
+    Benchmark of the memory used by the image path of classify. Compares
+    the old path, where the image was read through streams and decoded
+    separately for validation, the blank check and deduplication, with
+    the Frame path, where one buffer and one decoded image are shared.
+
+    Run from the src/ directory:
+    python -m benchmarks.classify_allocation_benchmark
+"""
+import random
+import timeit
+import tracemalloc
+from io import BytesIO
+from PIL import Image
+from PIL import ImageChops
+from webapp.frame import Frame
+from webapp.stroke_buffer import StrokeBuffer
+
+ROUNDS = 200
+STROKES = 30
+POINTS_PER_STROKE = 40
+
+
+def sample_image():
+    """
+        Returns a png of a drawing like those sent by players.
+    """
+    buffer = StrokeBuffer()
+    strokes = [
+        {
+            "id": i,
+            "points": [
+                random.randrange(buffer.size)
+                for _ in range(2 * POINTS_PER_STROKE)
+            ],
+        }
+        for i in range(STROKES)
+    ]
+    buffer.add("player", "game", 1, strokes)
+    return buffer.rasterize("player", "game")
+
+
+def digest(pimg):
+    pimg = pimg.convert("L")
+    bbox = ImageChops.invert(pimg).getbbox()
+    if bbox is not None:
+        pimg = pimg.crop(bbox)
+    return pimg.tobytes()
+
+
+def old_path(image):
+    # allowed_file
+    stream = BytesIO(image)
+    len(stream.read())
+    stream.seek(0)
+    Image.open(stream).size
+    stream.seek(0)
+    # white_image
+    rgb = Image.open(stream).convert("RGB")
+    ImageChops.invert(rgb).getbbox()
+    # prediction reads the stream sent by the client
+    BytesIO(image).read()
+    # storage decodes the image again for the content hash
+    digest(Image.open(BytesIO(image)))
+
+
+def frame_path(image):
+    frame = Frame(image)
+    frame.size
+    frame.image.size
+    ImageChops.invert(frame.rgb).getbbox()
+    BytesIO(frame.data).read()
+    digest(frame.rgb)
+
+
+def measure(path, image):
+    """
+        Returns the peak of memory allocated while handling one image, in
+        bytes, and the time per image in microseconds.
+    """
+    tracemalloc.start()
+    path(image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds = timeit.timeit(lambda: path(image), number=ROUNDS)
+    return peak, seconds / ROUNDS * 1e6
+
+
+def main():
+    image = sample_image()
+    print(f"image: {len(image)} bytes")
+    print(f"{'path':<8}{'peak bytes':>12}{'us/image':>12}")
+    for name, path in [("old", old_path), ("frame", frame_path)]:
+        peak, micros = measure(path, image)
+        print(f"{name:<8}{peak:>12}{micros:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
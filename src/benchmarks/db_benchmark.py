@@ -0,0 +1,86 @@
+"""
+    Benchmark of the score queries against a file backed SQLite database,
+    so it runs without the Azure database. Compares storing scores one
+    transaction each with storing them in batches, and reading the high
+    score lists from the database with reading the in-memory leaderboard.
+
+    Run from the src/ directory:
+    python -m benchmarks.db_benchmark
+"""
+import datetime
+import os
+import random
+import tempfile
+import time
+from flask import Flask
+from webapp import models
+from webapp.leaderboard import Leaderboard
+
+SCORES = 2000
+BATCH_SIZE = 50
+READS = 500
+DIFFICULTIES = [1, 2, 3]
+
+
+def score_rows():
+    today = datetime.date.today()
+    return [
+        ("player", random.randrange(1000),
+         today - datetime.timedelta(days=random.randrange(60)),
+         random.choice(DIFFICULTIES))
+        for _ in range(SCORES)
+    ]
+
+
+def single_inserts(rows):
+    for row in rows:
+        models.insert_into_scores(*row)
+
+
+def batch_inserts(rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        models.insert_many_scores(rows[start:start + BATCH_SIZE])
+
+
+def query_reads():
+    for i in range(READS):
+        difficulty_id = DIFFICULTIES[i % len(DIFFICULTIES)]
+        models.get_top_n_high_score_list(10, difficulty_id)
+        models.get_daily_high_score(difficulty_id)
+
+
+def leaderboard_reads():
+    leaderboard = Leaderboard()
+    for i in range(READS):
+        leaderboard.top(DIFFICULTIES[i % len(DIFFICULTIES)])
+
+
+def timed(name, count, function, *args):
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+    print(f"{name:<20}{count / seconds:>12.0f}")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
+            directory, "benchmark.db")
+        models.db.init_app(app)
+        with app.app_context():
+            models.db.create_all()
+            mode = models.db.session.execute(
+                models.db.text("PRAGMA journal_mode")).scalar()
+            print(f"journal mode: {mode}")
+            print(f"{'operation':<20}{'per second':>12}")
+            timed("single insert", SCORES, single_inserts, score_rows())
+            timed("batch insert", SCORES, batch_inserts, score_rows())
+            timed("query top lists", READS, query_reads)
+            timed("leaderboard top", READS, leaderboard_reads)
+            models.db.session.remove()
+            models.db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+    Benchmark of Socket.IO event encodings. Compares payloads sent as JSON
+    strings inside Socket.IO's JSON packets (the old format), native
+    objects in JSON packets, and native objects in MessagePack packets.
+
+    Run from the src/ directory: python -m benchmarks.serialization_benchmark
+"""
+import csv
+import json
+import random
+import timeit
+from socketio.packet import EVENT
+from socketio.packet import Packet
+from socketio.msgpack_packet import MsgPackPacket
+
+LABELS_PATH = "./dict_eng_to_nor_difficulties_v2.csv"
+ROUNDS = 2000
+
+
+def sample_payloads():
+    """
+        Returns typical payloads of the busiest events.
+    """
+    with open(LABELS_PATH) as csvfile:
+        labels = [row[0] for row in csv.reader(csvfile, delimiter=",")]
+    certainty = dict((label, random.random()) for label in labels)
+    return {
+        "prediction": {
+            "certainty": certainty,
+            "guess": labels[0],
+            "correctLabel": labels[1],
+            "hasWon": False,
+        },
+        "viewHighScore": {
+            "daily": [{"id": i, "score": 500 - i} for i in range(50)],
+            "total": [{"id": i, "score": 900 - i} for i in range(10)],
+        },
+        "getLabel": {"label": labels[0], "norwegian_label": "norsk"},
+    }
+
+
+def json_string(event, payload):
+    # the server dumps the payload, the client parses the packet and then
+    # the string inside it
+    encoded = Packet(EVENT, data=[event, json.dumps(payload)]).encode()
+    json.loads(Packet(encoded_packet=encoded).data[1])
+    return encoded
+
+
+def native_json(event, payload):
+    encoded = Packet(EVENT, data=[event, payload]).encode()
+    Packet(encoded_packet=encoded)
+    return encoded
+
+
+def native_msgpack(event, payload):
+    encoded = MsgPackPacket(EVENT, data=[event, payload]).encode()
+    MsgPackPacket(encoded_packet=encoded)
+    return encoded
+
+
+def main():
+    encodings = [
+        ("json string", json_string),
+        ("native json", native_json),
+        ("msgpack", native_msgpack),
+    ]
+    print(f"{'event':<15}{'encoding':<14}{'bytes':>8}{'us/message':>12}")
+    for event, payload in sample_payloads().items():
+        for name, encode in encodings:
+            size = len(encode(event, payload))
+            seconds = timeit.timeit(
+                lambda: encode(event, payload), number=ROUNDS)
+            micros = seconds / ROUNDS * 1e6
+            print(f"{event:<15}{name:<14}{size:>8}{micros:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
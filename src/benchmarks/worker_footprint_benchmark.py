@@ -0,0 +1,76 @@
+"""
+    Benchmark of the import time and memory of the Custom Vision clients in
+    a web worker. Compares the prediction client alone, which is what the
+    workers load now, with the prediction and training clients together,
+    which every worker loaded before. Each case runs in a new interpreter,
+    after the modules both cases share, like the blob storage used for
+    saving drawings, have been imported.
+
+    Run from the src/ directory with the keys and a database URL set, e.g.
+    DATABASE_URL=sqlite:// python -m benchmarks.worker_footprint_benchmark
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+ROUNDS = 5
+
+SHARED = """
+import resource, time, tracemalloc
+from flask import Flask
+from webapp import models
+from webapp import storage
+app = Flask(__name__)
+app.config.from_object("utilities.setup.Flask_config")
+models.db.init_app(app)
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+tracemalloc.start()
+start = time.perf_counter()
+"""
+
+CASES = {
+    "prediction": """
+from customvision.classifier import Classifier
+Classifier(app)
+""",
+    "prediction+training": """
+from customvision.classifier import Classifier
+from customvision.trainer import Trainer
+Classifier(app)
+Trainer(app)
+""",
+}
+
+REPORT = """
+seconds = time.perf_counter() - start
+_, peak = tracemalloc.get_traced_memory()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+print(json.dumps([seconds, peak, rss]))
+"""
+
+
+def run(case):
+    """
+        Returns the seconds, the peak of memory allocated by Python in
+        bytes, and the growth of the resident set in kB of one case.
+    """
+    code = "import json\n" + SHARED + CASES[case] + REPORT
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True,
+        check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    print(f"{'clients':<22}{'ms':>8}{'peak kB':>10}{'rss kB':>10}")
+    for case in CASES:
+        results = [run(case) for _ in range(ROUNDS)]
+        seconds, peak, rss = (
+            statistics.median(values) for values in zip(*results))
+        print(f"{case:<22}{seconds * 1000:>8.1f}{peak / 1024:>10.0f}"
+              f"{rss:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+    Shared reference to the published iteration used for prediction.
+"""
+import logging
+import threading
+import time
+from utilities import setup
+
+
+class IterationRef:
+    """
+        Versioned, in-memory reference to the published model iteration.
+        The name stored in the database is polled every refresh interval by
+        a background task, and a new name is verified before it replaces
+        the current one, so predictions keep using the previous iteration
+        until the new one is known to work. Reading the name never waits
+        for the database or the verification.
+    """
+
+    def __init__(self, loader, verify, name=None,
+                 interval=setup.ITERATION_REFRESH_INTERVAL,
+                 retry_interval=setup.ITERATION_VERIFY_RETRY):
+        """
+            loader: function returning the iteration name in the database
+            verify: function returning True if an iteration can predict
+            name: the initial iteration name
+            interval: seconds between polls of the database
+            retry_interval: seconds before an iteration which failed
+            verification is verified again
+        """
+        self.loader = loader
+        self.verify = verify
+        self.interval = interval
+        self.retry_interval = retry_interval
+        # name and version are swapped together as one tuple
+        self.current = (name, 0)
+        # (name, time) of the last iteration which failed verification
+        self.rejected = (None, 0.0)
+        self.started = False
+        self.lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.current[0]
+
+    @property
+    def version(self):
+        return self.current[1]
+
+    def get(self):
+        """
+            Returns the iteration name to predict with, or None if none has
+            been loaded yet.
+        """
+        return self.current[0]
+
+    def start(self, socketio):
+        """
+            Starts polling the database every interval in a background
+            task, unless already started.
+        """
+        if self.started:
+            return
+
+        self.started = True
+        socketio.start_background_task(self._run, socketio)
+
+    def _run(self, socketio):
+        while True:
+            socketio.sleep(self.interval)
+            self.refresh()
+
+    def refresh(self):
+        """
+            Polls the database for a new iteration name. Only one thread
+            polls at a time, the others keep using the current iteration.
+        """
+        if not self.lock.acquire(blocking=False):
+            return
+
+        try:
+            name = self.loader()
+        except Exception as e:
+            logging.error("Could not read iteration name: " + str(e))
+            return
+        finally:
+            self.lock.release()
+
+        self.notify(name)
+
+    def notify(self, name):
+        """
+            Switches to the given iteration if it differs from the current
+            one and passes verification. Returns True if it is in use.
+        """
+        current_name, version = self.current
+        if name is None or name == current_name:
+            return name is not None
+
+        rejected_name, rejected_at = self.rejected
+        if (name == rejected_name
+                and time.monotonic() - rejected_at < self.retry_interval):
+            # verifying costs a prediction, so it isn't repeated every poll
+            return False
+
+        try:
+            # without a current iteration there is nothing to fall back to
+            verified = current_name is None or self.verify(name)
+        except Exception as e:
+            logging.error("Could not verify iteration " + name + ": " + str(e))
+            verified = False
+
+        if not verified:
+            self.rejected = (name, time.monotonic())
+            logging.warning("Keeping iteration " + str(current_name))
+            return False
+
+        with self.lock:
+            self.current = (name, self.current[1] + 1)
+        logging.info("Switched to iteration " + name)
+        return True
@@ -0,0 +1,127 @@
+"""
+    Micro-batching of prediction calls from concurrent games.
+"""
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from utilities import setup
+from utilities.histogram import Histogram
+
+
+class PredictionBatcher:
+    """
+        Collects frames arriving within a short window, from any game, and
+        predicts them together with a single call to predict_batch. Every
+        caller waits on its own future, so results go back to the player
+        who sent the frame, and a frame whose result is ready doesn't wait
+        for the slower ones in its batch. Batches are sent when the window
+        closes or the batch is full, and the achieved batch sizes are
+        recorded.
+    """
+
+    def __init__(self, predict_batch, window=setup.BATCH_WINDOW,
+                 max_batch=setup.BATCH_MAX_SIZE):
+        """
+            predict_batch: function taking a list of images and returning
+            a list with a result, an exception or a Future per image
+            window: seconds to wait for more frames after the first one
+            max_batch: maximum number of frames in a batch
+        """
+        self.predict_batch = predict_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = []
+        self.timer = None
+        self.batch_sizes = Histogram(lowest=1, highest=max_batch, factor=1.5)
+        self.lock = threading.Lock()
+
+    def predict(self, image):
+        """
+            Predicts the labels of an image as part of the next batch.
+
+            Returns:
+            (prediction (dict[str,float]): labels and assosiated probabilities,
+            best_guess: (str): name of the label with highest probability)
+        """
+        future = Future()
+        with self.lock:
+            self.pending.append((image, future))
+            if len(self.pending) >= self.max_batch:
+                batch = self._take_batch()
+            else:
+                batch = None
+                if self.timer is None:
+                    self.timer = threading.Timer(self.window, self._flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+
+        if batch is not None:
+            self._send(batch)
+        return future.result()
+
+    def metrics(self):
+        """
+            Returns statistics of the achieved batch sizes.
+        """
+        return self.batch_sizes.snapshot()
+
+    def _flush(self):
+        with self.lock:
+            batch = self._take_batch()
+        self._send(batch)
+
+    def _take_batch(self):
+        """
+            Takes the pending frames. Must be called while holding the lock.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch = self.pending
+        self.pending = []
+        return batch
+
+    def _send(self, batch):
+        if len(batch) == 0:
+            return
+
+        self.batch_sizes.record(len(batch))
+        try:
+            results = self.predict_batch([image for image, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Future):
+                result.add_done_callback(partial(_resolve, future))
+            elif isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def _resolve(future, done):
+    """
+        Passes the outcome of the finished future done on to future.
+    """
+    if done.exception() is not None:
+        future.set_exception(done.exception())
+    else:
+        future.set_result(done.result())
+
+
+def pipelined(predict, workers=setup.PREDICTION_WORKERS):
+    """
+        Returns a predict_batch function for a service without batch
+        inference, which sends the requests of a batch concurrently and
+        returns a Future per image without waiting for them. There are as
+        many threads as prediction workers, so the requests of several
+        batches in flight, up to the scheduler's limit, are not queued.
+    """
+    executor = ThreadPoolExecutor(workers)
+
+    def predict_batch(images):
+        return [executor.submit(predict, image) for image in images]
+
+    return predict_batch
@@ -0,0 +1,144 @@
+"""
+    Scheduling of prediction calls within the Custom Vision quota.
+"""
+import heapq
+import itertools
+import threading
+import time
+from utilities import setup
+from utilities.exceptions import PredictionUnavailable
+
+
+class PredictionScheduler:
+    """
+        Limits the number of concurrent predictions and decides which
+        waiting frame goes next. The limit adapts to the service (AIMD):
+        it grows by one per round of fast answers, and is cut in half when
+        answers get slow or the service throttles. Waiting frames are
+        served by priority, and frames which can't be answered before the
+        round ends are shed instead of using up the quota.
+    """
+
+    def __init__(self, predict):
+        """
+            predict: function making a prediction from image bytes
+        """
+        self.predict_image = predict
+        self.limit = float(setup.SCHEDULER_INITIAL_LIMIT)
+        self.in_flight = 0
+        self.queue = []
+        self.counter = itertools.count()
+        self.expected_latency = 0.0
+        self.shed = 0
+        self.throttled = 0
+        self.cond = threading.Condition()
+
+    def predict(self, image, priority, time_left):
+        """
+            Predicts the labels of an image once a slot is free.
+
+            Parameters:
+            image: png image as bytes
+            priority: setup.PRIORITY_*, lower numbers go first
+            time_left: seconds until the round is over
+
+            Raises PredictionUnavailable if the frame was shed or the
+            prediction failed.
+        """
+        now = time.monotonic()
+        if priority == setup.PRIORITY_FINAL:
+            deadline = now + setup.PREDICTION_DEADLINE
+        else:
+            deadline = now + max(time_left, 0)
+        # [priority, order, deadline, state], state is set by _grant()
+        ticket = [priority, next(self.counter), deadline, None]
+
+        with self.cond:
+            heapq.heappush(self.queue, ticket)
+            self._grant()
+            while ticket[3] is None:
+                remaining = ticket[2] - time.monotonic()
+                if remaining <= 0:
+                    self.queue.remove(ticket)
+                    heapq.heapify(self.queue)
+                    ticket[3] = "shed"
+                    self.shed += 1
+                    break
+
+                self.cond.wait(remaining)
+
+        if ticket[3] == "shed":
+            raise PredictionUnavailable("Prediction shed, round is over")
+
+        start = time.monotonic()
+        try:
+            result = self.predict_image(image)
+            self._on_result(time.monotonic() - start, False, False)
+            return result
+        except PredictionUnavailable as e:
+            # a timed out call took the whole deadline, which must lower
+            # the limit like a slow answer
+            self._on_result(time.monotonic() - start, e.throttled, True)
+            raise
+        finally:
+            with self.cond:
+                self.in_flight -= 1
+                self._grant()
+
+    def metrics(self):
+        """
+            Returns the current limit and counters of the scheduler.
+        """
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self.queue),
+            "expected_latency": self.expected_latency,
+            "shed": self.shed,
+            "throttled": self.throttled,
+        }
+
+    def _grant(self):
+        """
+            Hands free slots to the waiting frames with the highest
+            priority. Must be called while holding self.cond.
+        """
+        now = time.monotonic()
+        granted = False
+        while self.queue and self.in_flight < int(self.limit):
+            ticket = heapq.heappop(self.queue)
+            missed = now + self.expected_latency > ticket[2]
+            if missed and ticket[0] != setup.PRIORITY_FINAL:
+                ticket[3] = "shed"
+                self.shed += 1
+            else:
+                ticket[3] = "granted"
+                self.in_flight += 1
+            granted = True
+
+        if granted:
+            self.cond.notify_all()
+
+    def _on_result(self, latency, throttled, failed):
+        """
+            Adapts the limit to the outcome of a call. A failed call never
+            raises the limit.
+        """
+        with self.cond:
+            if throttled:
+                self.throttled += 1
+                self._decrease()
+                return
+
+            alpha = setup.SCHEDULER_LATENCY_SMOOTHING
+            self.expected_latency += alpha * (latency - self.expected_latency)
+            if latency > setup.SCHEDULER_LATENCY_TARGET:
+                self._decrease()
+            elif not failed:
+                self.limit = min(
+                    self.limit + 1 / self.limit, setup.SCHEDULER_MAX_LIMIT)
+
+    def _decrease(self):
+        self.limit = max(
+            self.limit * setup.SCHEDULER_DECREASE_FACTOR,
+            setup.SCHEDULER_MIN_LIMIT)
@@ -0,0 +1,146 @@
+"""
+    Latency protection for predictions made by Custom Vision.
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from io import BytesIO
+from utilities import setup
+from utilities.circuit_breaker import CircuitBreaker
+from utilities.exceptions import PredictionUnavailable
+from utilities.histogram import Histogram
+
+
+class ResilientPredictor:
+    """
+        Wraps Classifier.predict_image_by_post with a deadline per call, a
+        circuit breaker and optional hedged requests. A hedged request is a
+        second call started when the first one is slower than the 95th
+        percentile of earlier calls; the first answer wins. Latencies and
+        outcomes are recorded per iteration.
+    """
+
+    def __init__(self, get_classifier, deadline=setup.PREDICTION_DEADLINE,
+                 hedging=setup.PREDICTION_HEDGING):
+        """
+            get_classifier: function returning the classifier to call
+            deadline: seconds to wait for a prediction
+            hedging: whether slow calls are hedged
+        """
+        self.get_classifier = get_classifier
+        self.deadline = deadline
+        self.hedging = hedging
+        self.breaker = CircuitBreaker(
+            setup.CIRCUIT_BREAKER_THRESHOLD, setup.CIRCUIT_BREAKER_COOLDOWN)
+        self.executor = ThreadPoolExecutor(setup.PREDICTION_WORKERS)
+        self.latencies = {}
+        self.outcomes = {}
+        self.lock = threading.Lock()
+
+    def predict(self, image):
+        """
+            Predicts the labels of a png image given as bytes.
+
+            Returns:
+            (prediction (dict[str,float]): labels and assosiated probabilities,
+            best_guess: (str): name of the label with highest probability)
+
+            Raises PredictionUnavailable if the circuit is open, no iteration
+            has been published, or no prediction arrived before the deadline.
+        """
+        # the deadline covers everything done for the call
+        start = time.monotonic()
+        classifier = self.get_classifier()
+        # a snapshot, refreshing the iteration is done in the background
+        iteration = classifier.iteration_name
+        if iteration is None:
+            raise PredictionUnavailable("No published iteration")
+
+        latency, outcomes = self._metrics_for(iteration)
+        if not self.breaker.allow():
+            outcomes["rejected"] += 1
+            raise PredictionUnavailable("Prediction service unavailable")
+
+        pending = {self._submit(classifier, image)}
+        hedge_at = self.hedge_delay(latency)
+        error = None
+        while pending:
+            elapsed = time.monotonic() - start
+            if elapsed >= self.deadline:
+                break
+
+            if hedge_at is not None and elapsed >= hedge_at:
+                hedge_at = None
+                outcomes["hedged"] += 1
+                pending.add(self._submit(classifier, image))
+            wake_at = self.deadline if hedge_at is None else hedge_at
+            done, pending = wait(
+                pending, wake_at - elapsed, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    latency.record(time.monotonic() - start)
+                    outcomes["ok"] += 1
+                    self.breaker.record_success()
+                    self._cancel(pending)
+                    return future.result()
+
+                error = future.exception()
+
+        self.breaker.record_failure()
+        if pending:
+            self._cancel(pending)
+            outcomes["timeout"] += 1
+            raise PredictionUnavailable("Prediction timed out")
+
+        response = getattr(error, "response", None)
+        throttled = getattr(response, "status_code", None) == 429
+        outcomes["throttled" if throttled else "error"] += 1
+        raise PredictionUnavailable(
+            "Prediction failed: " + str(error), throttled=throttled)
+
+    def hedge_delay(self, latency):
+        """
+            Returns the seconds to wait before hedging, or None if hedging
+            is off or there are too few measurements.
+        """
+        if not self.hedging or latency.count < setup.HEDGE_MIN_SAMPLES:
+            return None
+
+        delay = max(latency.percentile(0.95), setup.HEDGE_MIN_DELAY)
+        return delay if delay < self.deadline else None
+
+    def metrics(self):
+        """
+            Returns latency percentiles and outcome counts per iteration,
+            and the state of the circuit breaker.
+        """
+        with self.lock:
+            iterations = dict(
+                (iteration, {
+                    "latency": self.latencies[iteration].snapshot(),
+                    "outcomes": dict(self.outcomes[iteration]),
+                })
+                for iteration in self.latencies
+            )
+        return {"circuit": self.breaker.state, "iterations": iterations}
+
+    def _submit(self, classifier, image):
+        # every call gets its own stream over the same bytes
+        return self.executor.submit(
+            classifier.predict_image_by_post, BytesIO(image))
+
+    def _cancel(self, futures):
+        # calls which haven't started yet are dropped, a running call can't
+        # be stopped and its answer is ignored
+        for future in futures:
+            future.cancel()
+
+    def _metrics_for(self, iteration):
+        with self.lock:
+            if iteration not in self.latencies:
+                self.latencies[iteration] = Histogram()
+                self.outcomes[iteration] = Counter()
+            return self.latencies[iteration], self.outcomes[iteration]
@@ -0,0 +1,401 @@
+#! /usr/bin/env python
+"""
+    Tools for training the Custom Vision model on the drawings in storage,
+    and a command line interface to them
+"""
+import argparse
+import logging
+import uuid
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from flask import Flask
+from msrest.authentication import ApiKeyCredentials
+from azure.cognitiveservices.vision.customvision.training import (
+    CustomVisionTrainingClient,
+)
+from azure.cognitiveservices.vision.customvision.training.models import (
+    ImageFileCreateBatch,
+    ImageFileCreateEntry,
+    ImageUrlCreateEntry,
+)
+from typing import Dict
+from typing import List
+from urllib.parse import unquote
+from customvision.upload_manifest import UploadManifest
+from utilities.keys import Keys
+from utilities.rate_limiter import RateLimiter
+from utilities import setup
+from webapp import models
+from webapp import storage
+
+
+class Trainer:
+    """
+        Class for training the model in Custom Vision. Contains the key methods:
+            - upload_images() / reads image URLs from Blob Storage and uploads to Custom Vision
+            - train() / trains and publishes a model
+            - delete_iteration() / makes room for a new iteration
+            - delete_all_images() / deletes the uploaded images
+        It is used by training jobs and from the command line, so the web workers only need the
+        prediction client in Classifier.
+    """
+
+    def __init__(self, app, iteration=None) -> None:
+        """
+            Reads configuration file
+            Initializes connection to Azure Custom Vision training resources.
+
+            Parameters:
+            app: Flask app with the database, for storing the published iteration
+            iteration (IterationRef): optional, switched to a newly published iteration right away
+
+            Returns:
+            None
+        """
+        self.app = app
+        self.iteration = iteration
+        self.ENDPOINT = Keys.get("CV_ENDPOINT")
+        self.project_id = Keys.get("CV_PROJECT_ID")
+        self.training_key = Keys.get("CV_TRAINING_KEY")
+        self.prediction_resource_id = Keys.get("CV_PREDICTION_RESOURCE_ID")
+        self.training_credentials = ApiKeyCredentials(
+            in_headers={"Training-key": self.training_key}
+        )
+        self.client = CustomVisionTrainingClient(
+            self.ENDPOINT, self.training_credentials
+        )
+        self.manifest = UploadManifest(setup.UPLOAD_MANIFEST_PATH)
+        self.rate_limiter = RateLimiter(setup.CV_TRAINING_RATE)
+
+    def sync_iteration_name(self) -> str:
+        """
+            Stores the latest published iteration in Custom Vision as the iteration to predict
+            with, for when it was published outside this application.
+
+            Returns:
+            iteration_name (str): the name stored, or None if Custom Vision could not be reached
+        """
+        try:
+            # get all project iterations
+            iterations = self.client.get_iterations(self.project_id)
+            # find published iterations
+            puplished_iterations = [
+                iteration
+                for iteration in iterations
+                if iteration.publish_name is not None
+            ]
+            # get the latest published iteration
+            puplished_iterations.sort(key=lambda i: i.created)
+            if len(puplished_iterations) > 0:
+                iteration_name = puplished_iterations[-1].publish_name
+            else:
+                iteration_name = 'iteration-1'
+            with self.app.app_context():
+                models.update_iteration_name(iteration_name)
+        except Exception as e:
+            logging.debug(e)
+            return None
+
+        if self.iteration is not None:
+            self.iteration.notify(iteration_name)
+        return iteration_name
+
+    def __chunks(self, lst, n):
+        """
+            Helper method used by upload_images() to upload URL chunks of 64, which is maximum chunk size in Azure Custom Vision.
+        """
+        for i in range(0, len(lst), n):
+            yield lst[i: i + n]
+
+    def upload_images(self, labels: List) -> Dict[str, int]:
+        """
+            Takes as input a list of labels, uploads all assosiated images to Azure Custom Vision project.
+            If label in input already exists in Custom Vision project, all images are uploaded directly.
+            If label in input does not exist in Custom Vision project, new label (Tag object in Custom Vision) is created before uploading images
+
+            Images listed in the upload manifest are skipped, so only new images are sent. Listing and
+            uploading run concurrently, limited to setup.CV_TRAINING_RATE calls per second. If the job
+            fails, running it again resumes from the last uploaded chunk.
+
+            Parameters:
+            labels (str[]): List of labels
+
+            Returns:
+            (dict[str, int]): number of uploaded, skipped and failed images
+        """
+        for label in labels:
+            # check if input has correct type
+            if not isinstance(label, str):
+                raise Exception("label " + str(label) + " must be a string")
+
+        existing_tags = dict(
+            (t.name, t) for t in self.client.get_tags(self.project_id))
+        backend = storage.get_backend(Keys.get("CONTAINER_NAME"))
+        summary = {"uploaded": 0, "skipped": 0, "failed": 0}
+
+        with ThreadPoolExecutor(setup.CV_UPLOAD_WORKERS) as executor:
+            listings = executor.map(
+                lambda label: backend.list(f"{label}/"), labels)
+            futures = []
+            for label, blob_names in zip(labels, listings):
+                if len(blob_names) == 0:
+                    print("No images for label: " + label)
+                    continue
+
+                new_names = [
+                    name for name in blob_names
+                    if not self.manifest.contains(label, name)
+                ]
+                summary["skipped"] += len(blob_names) - len(new_names)
+                if len(new_names) == 0:
+                    continue
+
+                # check if tag already exists
+                tag = existing_tags.get(label)
+                if tag is None:
+                    try:
+                        self.rate_limiter.acquire()
+                        tag = self.client.create_tag(self.project_id, label)
+                        print("Created new label in project: " + label)
+                    except Exception as e:
+                        print(e)
+                        continue
+
+                # upload URLs in chunks of 64
+                for chunk in self.__chunks(new_names, setup.CV_MAX_IMAGES):
+                    futures.append(executor.submit(
+                        self.__upload_chunk, backend, label, tag, chunk))
+
+            for future in as_completed(futures):
+                uploaded, failed = future.result()
+                summary["uploaded"] += uploaded
+                summary["failed"] += failed
+
+        print("Upload summary: " + str(summary))
+        return summary
+
+    def __upload_chunk(self, backend, label, tag, blob_names):
+        """
+            Helper method used by upload_images() to upload one chunk of images and record the
+            successful ones in the manifest. Images are sent by URL, or by content if the storage
+            backend has no URLs Custom Vision can download from.
+
+            Returns:
+            (uploaded (int), failed (int)): number of uploaded and failed images
+        """
+        try:
+            if backend.public_urls:
+                sources = [backend.url(name) for name in blob_names]
+                entries = [
+                    ImageUrlCreateEntry(url=url, tag_ids=[tag.id]) for url in sources]
+                self.rate_limiter.acquire()
+                upload_result = self.client.create_images_from_urls(
+                    self.project_id, images=entries
+                )
+            else:
+                # Custom Vision can't download local files, so their contents are sent
+                sources = blob_names
+                entries = [
+                    ImageFileCreateEntry(
+                        name=name, contents=bytes(backend.fetch(name)), tag_ids=[tag.id])
+                    for name in blob_names
+                ]
+                self.rate_limiter.acquire()
+                upload_result = self.client.create_images_from_files(
+                    self.project_id, ImageFileCreateBatch(images=entries)
+                )
+        except Exception as e:
+            print("Image batch upload failed: ", e)
+            return 0, len(blob_names)
+
+        if not upload_result.is_batch_successful:
+            print("Image batch upload failed.")
+        # Custom Vision may return the source URL with a different escaping,
+        # files are returned with the name they were sent with
+        source_names = dict(
+            (unquote(source), name) for source, name in zip(sources, blob_names))
+        uploaded = []
+        for image in upload_result.images:
+            name = source_names.get(unquote(image.source_url))
+            if image.status in setup.CV_UPLOAD_OK_STATUSES and name is not None:
+                uploaded.append(name)
+            elif image.status not in setup.CV_UPLOAD_OK_STATUSES:
+                print("Image status: ", image.status)
+        self.manifest.add(label, uploaded)
+        return len(uploaded), len(blob_names) - len(uploaded)
+
+    def delete_iteration(self) -> None:
+        """
+            Deletes the oldest iteration in Custom Vision if there are 11 iterations.
+            Custom Vision allows maximum 10 iterations in the free version.
+        """
+        iterations = self.client.get_iterations(self.project_id)
+        if len(iterations) >= setup.CV_MAX_ITERATIONS:
+            iterations.sort(key=lambda i: i.created)
+            oldest_iteration = iterations[0].id
+            self.client.unpublish_iteration(self.project_id, oldest_iteration)
+            self.client.delete_iteration(self.project_id, oldest_iteration)
+
+    def train(self, labels: list) -> None:
+        """
+            Trains model on all labels specified in input list, exeption is raised by self.client.train_projec() is asked to train on non existent labels.
+            Generates unique iteration name, publishes model and switches self.iteration to it if successful.
+            Blocks until training is done, use TrainingJobManager to train in the background.
+
+            Parameters:
+            labels (str[]): List of labels
+
+            Returns:
+            None
+
+            Other processes pick up the new iteration name from the database within
+            setup.ITERATION_REFRESH_INTERVAL seconds, see IterationRef.
+        """
+        iteration = self.start_training()
+        iteration = self.wait_for_training(iteration)
+        self.publish(iteration)
+
+    def start_training(self):
+        """
+            Makes room for a new iteration and starts training it.
+
+            Returns:
+            iteration (Iteration): the iteration being trained
+        """
+        try:
+            email = Keys.get("EMAIL")
+        except Exception:
+            print("No email found, setting to empty")
+            email = ""
+
+        self.delete_iteration()
+        print("Training...")
+        return self.client.train_project(
+            self.project_id,
+            reserved_budget_in_hours=1,
+            notification_email_address=email,
+        )
+
+    def wait_for_training(self, iteration, on_status=None, sleep=time.sleep):
+        """
+            Polls the training status with exponential backoff until training is done.
+
+            Parameters:
+            iteration (Iteration): the iteration being trained
+            on_status (function): optional, called with the iteration after every poll
+            sleep (function): function used for waiting between polls
+
+            Returns:
+            iteration (Iteration): the trained iteration
+        """
+        delay = setup.TRAINING_POLL_INITIAL
+        while iteration.status != "Completed":
+            if iteration.status == "Failed":
+                raise Exception("Training of iteration " + str(iteration.id) + " failed")
+
+            sleep(delay)
+            delay = min(delay * setup.TRAINING_POLL_FACTOR, setup.TRAINING_POLL_MAX)
+            iteration = self.client.get_iteration(
+                self.project_id, iteration.id
+            )
+            print("Training status: " + iteration.status)
+            if on_status is not None:
+                on_status(iteration)
+
+        return iteration
+
+    def publish(self, iteration) -> str:
+        """
+            Publishes a trained iteration to the project endpoint under a unique name, and makes it
+            the iteration used for prediction.
+
+            Parameters:
+            iteration (Iteration): a trained iteration
+
+            Returns:
+            iteration_name (str): the publish name of the iteration
+        """
+        iteration_name = str(uuid.uuid4())
+        self.client.publish_iteration(
+            self.project_id,
+            iteration.id,
+            iteration_name,
+            self.prediction_resource_id,
+        )
+        iteration.publish_name = iteration_name
+        with self.app.app_context():
+            models.update_iteration_name(iteration_name)
+        # switch this process right away, others follow when they poll
+        if self.iteration is not None:
+            self.iteration.notify(iteration_name)
+        return iteration_name
+
+    def delete_all_images(self) -> None:
+        """
+            Function for deleting uploaded images in Customv Vision.
+        """
+        try:
+            self.client.delete_images(
+                self.project_id, all_images=True, all_iterations=True
+            )
+            self.manifest.clear()
+        except Exception as e:
+            raise Exception("Could not delete all images: " + str(e))
+
+
+def create_app():
+    """
+        Returns a Flask app with only the database, for using the trainer outside the web server.
+    """
+    app = Flask(__name__)
+    app.config.from_object("utilities.setup.Flask_config")
+    models.db.init_app(app)
+    return app
+
+
+def main():
+    """
+        Command line interface for training. Run from the src/ directory, e.g.:
+        python -m customvision.trainer train
+        python -m customvision.trainer upload airplane angel
+        To be able to train, make sure:
+        -no more than two projects created in Azure Custom Vision
+        -no more than 10 iterations done in one project
+    """
+    parser = argparse.ArgumentParser(description="Train the Custom Vision model.")
+    parser.add_argument(
+        "command",
+        choices=["upload", "train", "delete-iteration", "delete-images", "sync"],
+        help="upload: upload new images, train: upload new images, then train and publish, "
+        "delete-iteration: delete the oldest iteration if there are too many, "
+        "delete-images: delete all uploaded images, "
+        "sync: use the latest published iteration for prediction")
+    parser.add_argument(
+        "labels", nargs="*", help="labels to upload and train on, all labels if none are given")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    app = create_app()
+    trainer = Trainer(app)
+    labels = args.labels
+    if len(labels) == 0 and args.command in ("upload", "train"):
+        with app.app_context():
+            labels = models.get_all_labels()
+
+    if args.command == "upload":
+        trainer.upload_images(labels)
+    elif args.command == "train":
+        trainer.upload_images(labels)
+        trainer.train(labels)
+    elif args.command == "delete-iteration":
+        trainer.delete_iteration()
+    elif args.command == "delete-images":
+        trainer.delete_all_images()
+    else:
+        print("Iteration: " + str(trainer.sync_iteration_name()))
+
+
+if __name__ == "__main__":
+    main()
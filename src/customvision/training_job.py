@@ -0,0 +1,122 @@
+"""
+    Background training of the Custom Vision model.
+"""
+import datetime
+import json
+import logging
+import uuid
+from utilities import setup
+from webapp import models
+
+
+class TrainingJobManager:
+    """
+        Runs training jobs in the background: new images are uploaded, a
+        new iteration is trained and published, and predictions switch to
+        it. The state of every job is stored in the TrainingJob table and
+        sent as "trainingProgress" events to the admin room.
+
+        Only one job is scheduled or running at a time. A scheduled job is
+        resumed when the server starts again, and a job interrupted while
+        running holds the slot until it counts as lost, see
+        setup.TRAINING_JOB_TIMEOUT.
+    """
+
+    def __init__(self, create_trainer, socketio, app):
+        """
+            create_trainer: function returning the Trainer, called when the
+            first job runs, so workers which never train don't load it
+        """
+        self.create_trainer = create_trainer
+        self.trainer = None
+        self.socketio = socketio
+        self.app = app
+
+    def start(self, labels, start_at=None):
+        """
+            Schedules a training job on the given labels. The job starts
+            at start_at, or right away if no time is given, which allows
+            retraining to be put outside opening hours.
+
+            Returns the id of the job. Raises UserError if another job is
+            scheduled or running.
+        """
+        if start_at is None:
+            start_at = datetime.datetime.today()
+        job_id = uuid.uuid4().hex
+        models.insert_into_training_jobs(job_id, start_at, labels)
+        self._emit(job_id, setup.TRAINING_SCHEDULED)
+        self.socketio.start_background_task(
+            self._run, job_id, labels, start_at)
+        return job_id
+
+    def resume(self):
+        """
+            Schedules the job which was waiting for its start time when the
+            server stopped, if any. Must be called inside an app context.
+            Every worker may resume the job, it only runs once.
+
+            Returns the id of the job, or None.
+        """
+        job = models.get_scheduled_training_job()
+        if job is None:
+            return None
+
+        # jobs stored before their labels were kept train on all labels
+        if job.labels is None:
+            labels = models.get_all_labels()
+        else:
+            labels = json.loads(job.labels)
+        logging.info("Resuming training job %s", job.job_id)
+        self.socketio.start_background_task(
+            self._run, job.job_id, labels, job.start_at)
+        return job.job_id
+
+    def _run(self, job_id, labels, start_at):
+        """
+            Runs the job. Waiting happens through socketio.sleep, so the
+            job never blocks the workers serving players.
+        """
+        delay = (start_at - datetime.datetime.today()).total_seconds()
+        if delay > 0:
+            self.socketio.sleep(delay)
+
+        with self.app.app_context():
+            if not models.claim_training_job(job_id):
+                # started by another worker
+                return
+
+            try:
+                self._emit(job_id, setup.TRAINING_UPLOADING)
+                if self.trainer is None:
+                    self.trainer = self.create_trainer()
+                self.trainer.upload_images(labels)
+                self._update(job_id, setup.TRAINING_TRAINING)
+                iteration = self.trainer.start_training()
+                iteration = self.trainer.wait_for_training(
+                    iteration,
+                    on_status=lambda i: self._update(
+                        job_id, setup.TRAINING_TRAINING, i),
+                    sleep=self.socketio.sleep)
+                self._update(job_id, setup.TRAINING_PUBLISHING, iteration)
+                self.trainer.publish(iteration)
+                self._update(job_id, setup.TRAINING_COMPLETED, iteration)
+            except Exception as e:
+                logging.error("Training job %s failed: %s", job_id, e)
+                self._update(job_id, setup.TRAINING_FAILED, message=str(e))
+
+    def _update(self, job_id, state, iteration=None, message=None):
+        """
+            Stores the new state of the job and reports it to the admins.
+        """
+        models.update_training_job(job_id, state, iteration, message)
+        self._emit(job_id, state, iteration, message)
+
+    def _emit(self, job_id, state, iteration=None, message=None):
+        data = {"job_id": job_id, "state": state}
+        if iteration is not None:
+            data["iteration_status"] = iteration.status
+            data["iteration_name"] = iteration.publish_name
+        if message is not None:
+            data["message"] = message
+        self.socketio.emit("trainingProgress", data, to=setup.ADMIN_ROOM)
@@ -0,0 +1,64 @@
+"""
+    Record of training images already uploaded to Custom Vision.
+"""
+import json
+import os
+import threading
+
+
+class UploadManifest:
+    """
+        Keeps the names of uploaded images per tag. Every finished upload
+        is appended to the manifest file as one JSON line, so an upload job
+        which fails halfway can be resumed without sending images twice.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.uploaded = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as manifest_file:
+                for line in manifest_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line cut short by a crash, its chunk is redone
+                        continue
+                    self.uploaded.setdefault(
+                        entry["tag"], set()).update(entry["names"])
+
+    def contains(self, tag, name):
+        """
+            Returns True if the image has been uploaded with the given tag.
+        """
+        return name in self.uploaded.get(tag, ())
+
+    def add(self, tag, names):
+        """
+            Records the images as uploaded with the given tag.
+        """
+        if len(names) == 0:
+            return
+
+        entry = json.dumps({"tag": tag, "names": list(names)})
+        with self.lock:
+            with open(self.path, "a") as manifest_file:
+                manifest_file.write(entry + "\n")
+            self.uploaded.setdefault(tag, set()).update(names)
+
+    def count(self):
+        """
+            Returns the number of uploaded images.
+        """
+        return sum(len(names) for names in self.uploaded.values())
+
+    def clear(self):
+        """
+            Forgets all uploads, e.g. after the images in Custom Vision have
+            been deleted.
+        """
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.uploaded = {}
@@ -0,0 +1,68 @@
+"""
+    Fixtures and fakes shared by the tests.
+"""
+import pytest
+from flask import Flask
+from webapp import models
+
+
+class Stop(Exception):
+    """
+        Raised by FakeSocketIO to end a background loop.
+    """
+
+
+class FakeSocketIO:
+    """
+        Stands in for the Socket.IO server of background tasks and
+        events. Started tasks are kept until run_tasks is called, and the
+        data of emitted events is recorded. If sleeps is given, sleeping
+        raises Stop after that many sleeps, which ends a background loop.
+    """
+
+    def __init__(self, sleeps=None):
+        self.sleeps = sleeps
+        self.tasks = []
+        self.events = []
+
+    def start_background_task(self, target, *args):
+        self.tasks.append((target, args))
+
+    def run_tasks(self):
+        tasks, self.tasks = self.tasks, []
+        for target, args in tasks:
+            target(*args)
+
+    def sleep(self, seconds):
+        if self.sleeps is None:
+            return
+        if self.sleeps == 0:
+            raise Stop()
+        self.sleeps -= 1
+
+    def emit(self, event, data, to=None):
+        self.events.append(data)
+
+
+@pytest.fixture
+def app_config():
+    """
+        Settings of the app fixture, overridden by tests needing another
+        database.
+    """
+    return {"SQLALCHEMY_DATABASE_URI": "sqlite://"}
+
+
+@pytest.fixture
+def app(app_config):
+    """
+        An app with all tables created, used inside its app context.
+    """
+    app = Flask(__name__)
+    app.config.update(app_config)
+    models.db.init_app(app)
+    with app.app_context():
+        models.db.create_all()
+        yield app
+        models.db.session.remove()
+        models.db.engine.dispose()
@@ -6,6 +6,7 @@
 """
 import uuid
 import datetime
+from pytest import fixture
 from pytest import raises
 import sys
 import os
@@ -14,6 +15,7 @@ import os
 utilities_directory = sys.path[0].replace("/test", "")
 sys.path.insert(0, utilities_directory)
 
+from utilities import setup
 from utilities.difficulties import DifficultyId
 from webapp import api
 from webapp import models
@@ -30,6 +32,17 @@ class TestValues:
     STATE = "Ready"
 
 
+@fixture(scope="module", autouse=True)
+def iteration():
+    """
+        A new database, like a local SQLite file, has no iteration until
+        the model is trained, so the expected one is added.
+    """
+    with api.app.app_context():
+        if models.Iteration.query.first() is None:
+            models.update_iteration_name(TestValues.CV_ITERATION_NAME)
+
+
 def test_create_tables():
     """
         Check that the tables exists.
@@ -105,6 +118,18 @@ def test_illegal_parameter_scores():
             100, "score", "01.01.2020", DifficultyId.Medium)
 
 
+def test_scores_out_of_range():
+    """
+        Check that scores which are not finite or not between 0 and the
+        highest score are rejected.
+    """
+    today = datetime.date.today()
+    for score in [float("nan"), float("inf"), -1, setup.MAX_SCORE + 1, 1e9]:
+        with raises(UserError):
+            models.check_score(
+                TestValues.PLAYER_ID, score, today, DifficultyId.Medium)
+
+
 def test_illegal_parameter_labels():
     """
         Check that exception is raised when illegal arguments is passed
@@ -168,6 +193,29 @@ def test_delete_session_from_game():
     assert result == "Record deleted."
 
 
+def test_delete_old_games():
+    """
+        Adds expired games with players and pairings, and checks that they
+        are deleted in batches.
+    """
+    expired = datetime.datetime(2000, 1, 1)
+    game_ids = [uuid.uuid4().hex for _ in range(3)]
+    with api.app.app_context():
+        for game_id in game_ids:
+            player_id = uuid.uuid4().hex
+            models.insert_into_games(game_id, TestValues.LABELS, expired, DifficultyId.Easy)
+            models.insert_into_players(player_id, game_id, "Done")
+            models.insert_into_mulitplayer(game_id, player_id, None)
+
+        cutoff = expired + datetime.timedelta(days=1)
+        assert models.delete_old_games(cutoff, 2) == 2
+        assert models.delete_old_games(cutoff, 2) == 1
+        assert models.delete_old_games(cutoff, 2) == 0
+        for game_id in game_ids:
+            assert models.Games.query.filter_by(game_id=game_id).first() is None
+            assert models.Players.query.filter_by(game_id=game_id).first() is None
+
+
 def test_get_iteration_name_is_string():
     """
         Tests if it's possible to get an iteration name from the database and the type is str
@@ -178,6 +226,21 @@ def test_get_iteration_name_is_string():
     assert isinstance(iteration_name, str)
 
 
+def test_get_iteration_name_without_iteration():
+    """
+        Tests that a database without an iteration gives a clear error
+    """
+    with api.app.app_context():
+        iteration = models.Iteration.query.first()
+        models.db.session.delete(iteration)
+        models.db.session.commit()
+        try:
+            with raises(Exception, match="trainer sync"):
+                models.get_iteration_name()
+        finally:
+            models.update_iteration_name(iteration.iteration_name)
+
+
 def test_get_n_labels_correct_size():
     """
         Test that get_n_labels return lists of correct sizes
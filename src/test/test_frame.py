@@ -0,0 +1,52 @@
+"""
+    Tests for the frame shared along the classify path.
+"""
+from io import BytesIO
+from PIL import Image
+from pytest import raises
+from utilities.exceptions import UserError
+from webapp.frame import Frame
+from webapp.image_index import ImageIndex
+
+
+def _png(size=(64, 64)):
+    stream = BytesIO()
+    Image.new("L", size, 255).save(stream, format="PNG")
+    return stream.getvalue()
+
+
+def test_buffer_is_not_copied():
+    """
+        Check that the bytes received are passed on as the same object.
+    """
+    image = _png()
+    frame = Frame(image)
+
+    assert frame.data is image
+    assert BytesIO(frame.data).read() is image
+    assert frame.size == len(image)
+
+
+def test_image_is_decoded_once():
+    frame = Frame(_png())
+
+    assert frame.image is frame.image
+    assert frame.rgb is frame.rgb
+    assert frame.rgb.mode == "RGB"
+
+
+def test_invalid_image_is_rejected():
+    with raises(UserError):
+        Frame(b"not an image").image
+
+
+def test_digest_of_decoded_image(tmp_path):
+    """
+        Check that hashing the shared decoded image gives the same digest
+        as decoding the bytes again.
+    """
+    index = ImageIndex(str(tmp_path / "index"))
+    frame = Frame(_png())
+
+    assert index.digest(frame.data, "cat", frame.rgb) == index.digest(
+        frame.data, "cat")
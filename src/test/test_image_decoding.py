@@ -0,0 +1,100 @@
+"""
+    Tests for the compact image encodings of the classify event.
+"""
+from io import BytesIO
+from PIL import Image
+from pytest import raises
+from utilities import setup
+from utilities.exceptions import UserError
+from webapp.frame import Frame
+
+SIZE = 256
+
+
+def _sketch():
+    """
+        A white image with a black square in the top left corner.
+    """
+    image = Image.new("L", (SIZE, SIZE), 255)
+    image.paste(0, (0, 0, 16, 16))
+    return image
+
+
+def _rle(image):
+    pixels = image.tobytes()
+    runs = []
+    color = 255
+    run = 0
+    for pixel in pixels:
+        if pixel == color:
+            run += 1
+        else:
+            runs.append(run)
+            color = pixel
+            run = 1
+    runs.append(run)
+
+    data = bytearray()
+    for run in runs:
+        while run >= 0x80:
+            data.append(run & 0x7F | 0x80)
+            run >>= 7
+        data.append(run)
+    return bytes(data)
+
+
+def _decoded_pixels(frame):
+    return Image.open(BytesIO(frame.data)).convert("L").tobytes()
+
+
+def test_bitmap_is_normalized_to_png():
+    image = _sketch()
+    bitmap = image.point(lambda p: 255 - p).convert("1").tobytes()
+    frame = Frame.decode(bitmap, setup.IMAGE_ENCODING_BITMAP, SIZE, SIZE)
+
+    assert frame.data.startswith(b"\x89PNG")
+    assert _decoded_pixels(frame) == image.tobytes()
+
+
+def test_rle_is_decoded():
+    image = _sketch()
+    frame = Frame.decode(_rle(image), setup.IMAGE_ENCODING_RLE, SIZE, SIZE)
+
+    assert _decoded_pixels(frame) == image.tobytes()
+
+
+def test_transparent_webp_becomes_white():
+    image = Image.new("RGBA", (SIZE, SIZE), (0, 0, 0, 0))
+    image.paste((0, 0, 0, 255), (0, 0, 16, 16))
+    stream = BytesIO()
+    image.save(stream, format="WEBP", lossless=True)
+    frame = Frame.decode(stream.getvalue(), setup.IMAGE_ENCODING_WEBP)
+
+    assert _decoded_pixels(frame) == _sketch().tobytes()
+
+
+def test_invalid_compact_images_are_rejected():
+    rle = _rle(_sketch())
+    with raises(UserError):
+        Frame.decode(rle, setup.IMAGE_ENCODING_RLE, SIZE, SIZE + 1)
+    with raises(UserError):
+        Frame.decode(rle + b"\x01", setup.IMAGE_ENCODING_RLE, SIZE, SIZE)
+    with raises(UserError):
+        Frame.decode(b"\x00", setup.IMAGE_ENCODING_BITMAP, SIZE, SIZE)
+    with raises(UserError):
+        Frame.decode(b"", setup.IMAGE_ENCODING_BITMAP,
+                     setup.MAX_RESOLUTION + 1, 1)
+    with raises(UserError):
+        Frame.decode(rle, "gif", SIZE, SIZE)
+
+
+def test_oversized_rle_varint_is_rejected():
+    """
+        Check that a run length longer than 5 varint bytes is rejected
+        right away, also when its value stays small.
+    """
+    with raises(UserError, match="too long"):
+        Frame.decode(b"\x80" * 1000000 + b"\x00", setup.IMAGE_ENCODING_RLE,
+                     SIZE, SIZE)
+    with raises(UserError, match="exceed"):
+        Frame.decode(b"\xff" * 1000000, setup.IMAGE_ENCODING_RLE, SIZE, SIZE)
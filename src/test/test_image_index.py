@@ -0,0 +1,77 @@
+"""
+    Tests for the content hash index used to deduplicate saved drawings.
+"""
+from io import BytesIO
+from PIL import Image
+from PIL import ImageDraw
+from webapp.image_index import ImageIndex
+
+
+def _drawing(offset=0, fmt="PNG"):
+    image = Image.new("RGB", (256, 256), "white")
+    draw = ImageDraw.Draw(image)
+    draw.line((20 + offset, 20, 120 + offset, 120), fill="black", width=4)
+    stream = BytesIO()
+    image.save(stream, format=fmt)
+    return stream.getvalue()
+
+
+def test_duplicate_is_rejected(tmp_path):
+    """
+        Check that the same drawing is only added once.
+    """
+    index = ImageIndex(str(tmp_path / "index.bin"))
+    digest = index.digest(_drawing(), "cat")
+
+    assert index.add(digest)
+    assert not index.add(digest)
+    index.commit(digest)
+    assert not index.add(digest)
+    assert index.dedup_ratio() == 2 / 3
+
+
+def test_digest_is_normalized():
+    """
+        Check that shifted and re-encoded copies of a drawing hash equally,
+        while the same drawing under another label does not.
+    """
+    index = ImageIndex("unused")
+    digest = index.digest(_drawing(), "cat")
+
+    assert index.digest(_drawing(offset=30), "cat") == digest
+    assert index.digest(_drawing(fmt="BMP"), "cat") == digest
+    assert index.digest(_drawing(), "dog") != digest
+
+
+def test_index_is_shared_through_file(tmp_path):
+    """
+        Check that a second index on the same file sees existing records,
+        and that clearing the index is picked up by other instances.
+    """
+    path = str(tmp_path / "index.bin")
+    first = ImageIndex(path)
+    second = ImageIndex(path)
+    digest = first.digest(_drawing(), "cat")
+
+    assert first.add(digest)
+    first.commit(digest)
+    assert not second.add(digest)
+
+    first.clear()
+    assert second.add(digest)
+
+
+def test_failed_upload_is_not_recorded(tmp_path):
+    """
+        Check that a discarded digest is neither kept in memory nor
+        written for other workers and restarts.
+    """
+    path = str(tmp_path / "index.bin")
+    index = ImageIndex(path)
+    digest = index.digest(_drawing(), "cat")
+
+    assert index.add(digest)
+    index.discard(digest)
+
+    assert ImageIndex(path).add(digest)
+    assert index.add(digest)
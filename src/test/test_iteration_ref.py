@@ -0,0 +1,92 @@
+"""
+    Tests for the shared reference to the published iteration.
+"""
+import pytest
+from customvision.iteration_ref import IterationRef
+from test.conftest import FakeSocketIO
+from test.conftest import Stop
+
+
+def test_get_does_not_poll():
+    """
+        Check that reading the iteration never reads the database.
+    """
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return "new"
+
+    ref = IterationRef(loader, lambda name: True, "old", interval=0)
+    assert ref.get() == "old"
+    assert loads == []
+
+    ref.refresh()
+    assert ref.get() == "new"
+    assert ref.version == 1
+
+
+def test_polls_in_background():
+    """
+        Check that the started task polls the database every interval.
+    """
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return "new"
+
+    ref = IterationRef(loader, lambda name: True, "old", interval=60)
+    socketio = FakeSocketIO(sleeps=2)
+    ref.start(socketio)
+    with pytest.raises(Stop):
+        socketio.run_tasks()
+
+    assert loads == [1, 1]
+    assert ref.get() == "new"
+
+
+def test_keeps_iteration_failing_verification():
+    """
+        Check that an iteration which fails verification is not used.
+    """
+    def verify(name):
+        raise Exception("iteration not published")
+
+    ref = IterationRef(lambda: "new", verify, "old", interval=0)
+
+    assert ref.get() == "old"
+    assert not ref.notify("new")
+    assert ref.version == 0
+
+
+def test_failed_verification_is_not_repeated():
+    """
+        Check that an iteration which failed verification is only verified
+        again after the retry interval.
+    """
+    verified = []
+
+    def verify(name):
+        verified.append(name)
+        return False
+
+    ref = IterationRef(lambda: "new", verify, "old", retry_interval=60)
+    ref.refresh()
+    ref.refresh()
+    assert verified == ["new"]
+
+    ref.retry_interval = 0
+    ref.refresh()
+    assert verified == ["new", "new"]
+    assert ref.get() == "old"
+
+
+def test_notify_switches_without_polling():
+    """
+        Check that a notified iteration is used right away.
+    """
+    ref = IterationRef(lambda: "old", lambda name: True, "old", interval=60)
+
+    assert ref.notify("new")
+    assert ref.get() == "new"
@@ -0,0 +1,92 @@
+"""
+    Tests for the in-memory leaderboard.
+"""
+import datetime
+from webapp import models
+from webapp.leaderboard import Leaderboard
+
+DIFFICULTY = 4
+
+
+def _scores(entries):
+    return [entry["score"] for entry in entries]
+
+
+def test_lists_are_loaded_once(app):
+    today = datetime.date.today()
+    yesterday = today - datetime.timedelta(days=1)
+    for score, date in [(5, yesterday), (3, today), (9, yesterday)]:
+        models.insert_into_scores("player", score, date, DIFFICULTY)
+
+    leaderboard = Leaderboard(top_n=2)
+    assert leaderboard.top(DIFFICULTY) == {
+        "daily": [{"id": 2, "score": 3}],
+        "total": [{"id": 3, "score": 9}, {"id": 1, "score": 5}],
+    }
+
+    before = models.database_stats().get("statements", 0)
+    leaderboard.record(7, DIFFICULTY)
+    lists = leaderboard.top(DIFFICULTY)
+
+    assert models.database_stats().get("statements", 0) == before
+    assert _scores(lists["daily"]) == [7, 3]
+    assert _scores(lists["total"]) == [9, 7]
+
+
+def test_lists_are_bounded_and_ordered(app):
+    leaderboard = Leaderboard(top_n=3)
+    for score in [4, 8, 1, 8, 6, 2]:
+        leaderboard.record(score, DIFFICULTY)
+
+    assert _scores(leaderboard.top(DIFFICULTY)["total"]) == [8, 8, 6]
+
+
+def test_entry_gets_id_when_stored(app):
+    leaderboard = Leaderboard()
+    entry = leaderboard.record(5, DIFFICULTY)
+    entry["id"] = 42
+
+    assert leaderboard.top(DIFFICULTY)["total"] == [{"id": 42, "score": 5}]
+
+
+def test_daily_list_rolls_over_at_midnight(app):
+    day = [datetime.date(2024, 1, 1)]
+    leaderboard = Leaderboard(today=lambda: day[0])
+    leaderboard.record(5, DIFFICULTY)
+    day[0] += datetime.timedelta(days=1)
+    leaderboard.record(2, DIFFICULTY)
+
+    lists = leaderboard.top(DIFFICULTY)
+    assert _scores(lists["daily"]) == [2]
+    assert _scores(lists["total"]) == [5, 2]
+
+
+def test_reload_reads_scores_of_other_instances(app):
+    today = datetime.date.today()
+    leaderboard = Leaderboard(top_n=2)
+    entry = leaderboard.record(5, DIFFICULTY)
+    # stored by this instance, so it is already listed
+    entry["id"] = models.insert_into_scores("player", 5, today, DIFFICULTY)
+    # stored by another instance
+    models.insert_into_scores("player", 8, today, DIFFICULTY)
+    assert leaderboard.reload() == 1
+
+    lists = leaderboard.top(DIFFICULTY)
+    assert lists["total"] == [{"id": 2, "score": 8}, {"id": 1, "score": 5}]
+    assert lists["daily"] == lists["total"]
+
+
+def test_reload_only_reads_new_scores(app):
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    leaderboard = Leaderboard(top_n=2)
+    leaderboard.top(DIFFICULTY)
+    models.insert_into_scores("player", 8, yesterday, DIFFICULTY)
+
+    before = models.database_stats().get("statements", 0)
+    leaderboard.reload()
+    leaderboard.reload()
+
+    assert models.database_stats().get("statements", 0) == before + 2
+    lists = leaderboard.top(DIFFICULTY)
+    assert lists["total"] == [{"id": 1, "score": 8}]
+    assert lists["daily"] == []
@@ -0,0 +1,66 @@
+"""
+    Tests for the local filesystem storage backend.
+"""
+from pytest import raises
+from webapp.local_storage import LocalStorage
+from webapp.storage_backend import StorageBackend
+
+
+def test_save_and_fetch(tmp_path):
+    """
+        Check that saved images can be fetched, listed and counted.
+    """
+    backend = LocalStorage("container", str(tmp_path))
+    backend.save("cat/1.png", b"first")
+    backend.save("cat/2.png", b"second")
+    backend.save("dog/1.png", b"third")
+
+    assert bytes(backend.fetch("cat/2.png")) == b"second"
+    assert backend.list("cat/") == ["cat/1.png", "cat/2.png"]
+    assert backend.count() == 3
+
+
+def test_save_existing_name(tmp_path):
+    """
+        Check that an image is never overwritten.
+    """
+    backend = LocalStorage("container", str(tmp_path))
+    backend.save("cat/1.png", b"first")
+
+    with raises(FileExistsError):
+        backend.save("cat/1.png", b"second")
+    assert bytes(backend.fetch("cat/1.png")) == b"first"
+    assert backend.count() == 1
+
+
+def test_reset(tmp_path):
+    """
+        Check that reset removes all images.
+    """
+    backend = LocalStorage("container", str(tmp_path))
+    backend.save("cat/1.png", b"first")
+    backend.reset()
+
+    assert backend.count() == 0
+
+
+def test_name_outside_container(tmp_path):
+    """
+        Check that names can't point outside the container directory.
+    """
+    backend = LocalStorage("container", str(tmp_path))
+
+    with raises(ValueError):
+        backend.save("../outside.png", b"data")
+
+
+def test_incomplete_backend():
+    """
+        Check that a backend missing methods can't be created.
+    """
+    class IncompleteStorage(StorageBackend):
+        def save(self, name, data):
+            return name
+
+    with raises(TypeError):
+        IncompleteStorage("container")
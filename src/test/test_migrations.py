@@ -0,0 +1,106 @@
+"""
+    Tests for schema migrations and the indexes of the hot queries.
+"""
+import datetime
+import json
+from flask import Flask
+from sqlalchemy import inspect
+from webapp import migrations
+from webapp import models
+
+
+def _index_names(table):
+    return set(
+        index["name"] for index in inspect(models.db.engine).get_indexes(table))
+
+
+def test_migration_adds_missing_indexes(app):
+    """
+        Check that an existing database without the indexes gets them, and
+        that the migration is recorded and only applied once.
+    """
+    models.db.session.execute(models.db.text(
+        "DROP INDEX ix_scores_difficulty_score"))
+    models.db.session.commit()
+
+    version = migrations.migrate(app)
+
+    assert version == migrations.MIGRATIONS[-1][0]
+    assert "ix_scores_difficulty_score" in _index_names("scores")
+    assert migrations.applied_versions() == set(
+        version for version, _, _ in migrations.MIGRATIONS)
+
+    models.db.session.execute(models.db.text(
+        "DROP INDEX ix_scores_difficulty_score"))
+    models.db.session.commit()
+    migrations.migrate(app)
+    assert "ix_scores_difficulty_score" not in _index_names("scores")
+
+
+def test_hot_queries_use_indexes(app):
+    """
+        Check that the leaderboard and matchmaking queries do not scan
+        whole tables.
+    """
+    queries = [
+        models.daily_high_score_query(1),
+        models.top_n_high_score_query(10, 1),
+        models.waiting_game_query("pair"),
+        models.Players.query.filter_by(game_id="game"),
+        models.Games.query.filter(models.Games.date < "2000-01-01"),
+        models.ExampleImages.query.filter_by(label="cat"),
+    ]
+
+    for query in queries:
+        assert migrations.full_scans(query) == []
+
+
+def test_setup_database_on_new_database(tmp_path):
+    """
+        Check that the deploy step creates the schema of a new database and
+        adds the labels.
+    """
+    labels_file = tmp_path / "labels.csv"
+    labels_file.write_text("cat,katt\ndog,hund\n")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    models.db.init_app(app)
+
+    version = migrations.setup_database(app, str(labels_file))
+
+    assert version == migrations.MIGRATIONS[-1][0]
+    with app.app_context():
+        assert models.to_norwegian("dog") == "hund"
+
+
+def test_migration_adds_missing_columns(app):
+    """
+        Check that a training job table from before the labels were stored
+        gets the column.
+    """
+    models.db.session.execute(models.db.text(
+        "ALTER TABLE training_job DROP COLUMN labels"))
+    models.db.session.commit()
+
+    migrations.migrate(app)
+
+    columns = inspect(models.db.engine).get_columns("training_job")
+    assert "labels" in set(column["name"] for column in columns)
+
+
+def test_migration_merges_archived_tops(app):
+    """
+        Check that the days archived before the all time row was kept are
+        merged into it.
+    """
+    for day, top in [(1, [{"id": 1, "score": 5}]),
+                     (2, [{"id": 2, "score": 9}, {"id": 3, "score": 2}])]:
+        models.db.session.add(models.ScoreSummary(
+            date=datetime.date(2024, 1, day), difficulty_id=4, count=len(top),
+            top=json.dumps(top), histogram="[]"))
+    models.db.session.commit()
+
+    migrations.migrate(app)
+
+    assert [e["score"] for e in models.get_top_n_high_score_list(10, 4)] == [
+        9, 5, 2]
@@ -0,0 +1,70 @@
+"""
+    Tests for the week, month and exhibition period leaderboards.
+"""
+import datetime
+import pytest
+from utilities import setup
+from webapp import migrations
+from webapp import models
+from webapp import score_periods
+
+DIFFICULTY = 4
+# a wednesday
+DATE = datetime.date(2024, 5, 15)
+
+
+@pytest.fixture(autouse=True)
+def exhibition_starts(monkeypatch):
+    monkeypatch.setattr(
+        score_periods, "exhibition_starts",
+        lambda: [datetime.date(2024, 1, 15), datetime.date(2024, 6, 1)])
+
+
+def _scores(period, start):
+    return [
+        entry["score"] for entry in models.get_period_high_scores(
+            period, start, DIFFICULTY, setup.TOP_N)
+    ]
+
+
+def test_period_starts(app):
+    assert score_periods.periods_of(DATE) == [
+        (setup.PERIOD_WEEK, datetime.date(2024, 5, 13)),
+        (setup.PERIOD_MONTH, datetime.date(2024, 5, 1)),
+        (setup.PERIOD_EXHIBITION, datetime.date(2024, 1, 15)),
+    ]
+    assert score_periods.period_start(
+        setup.PERIOD_EXHIBITION, datetime.date(2024, 1, 1)) is None
+
+
+def test_scores_are_added_to_their_periods(app):
+    models.insert_into_scores("player", 5, DATE, DIFFICULTY)
+    models.insert_into_scores(
+        "player", 7, DATE + datetime.timedelta(days=7), DIFFICULTY)
+
+    assert _scores(setup.PERIOD_WEEK, datetime.date(2024, 5, 13)) == [5]
+    assert _scores(setup.PERIOD_MONTH, datetime.date(2024, 5, 1)) == [7, 5]
+
+
+def test_compaction_keeps_top_scores(app):
+    for score in range(setup.TOP_N + 5):
+        models.insert_into_scores("player", score, DATE, DIFFICULTY)
+    top = _scores(setup.PERIOD_MONTH, datetime.date(2024, 5, 1))
+
+    # five extra scores in each of the three buckets
+    assert models.compact_leaderboard_buckets(setup.TOP_N) == 15
+    assert _scores(setup.PERIOD_MONTH, datetime.date(2024, 5, 1)) == top
+    assert models.LeaderboardBucket.query.count() == 3 * setup.TOP_N
+
+
+def test_backfill_of_existing_scores(app):
+    for score in range(setup.TOP_N + 5):
+        models.insert_into_scores("player", score, DATE, DIFFICULTY)
+    top = _scores(setup.PERIOD_WEEK, datetime.date(2024, 5, 13))
+    models.LeaderboardBucket.query.delete()
+    models.db.session.commit()
+
+    migrations.migrate(app)
+
+    assert _scores(setup.PERIOD_WEEK, datetime.date(2024, 5, 13)) == top
+    assert models.LeaderboardBucket.query.count() == 3 * setup.TOP_N
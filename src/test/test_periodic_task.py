@@ -0,0 +1,60 @@
+"""
+    Tests for the background maintenance jobs.
+"""
+import pytest
+from flask import Flask
+from webapp.periodic_task import PeriodicTask
+from webapp.standings_refresher import StandingsRefresher
+from test.conftest import FakeSocketIO
+from test.conftest import Stop
+
+RUNS = 3
+
+
+class FailingTask(PeriodicTask):
+    def __init__(self, socketio, app):
+        super().__init__(socketio, app, interval=1)
+        self.runs = 0
+
+    def run_once(self):
+        self.runs += 1
+        raise Exception("database unavailable")
+
+
+def test_task_keeps_running_after_failures():
+    socketio = FakeSocketIO(RUNS)
+    task = FailingTask(socketio, Flask(__name__))
+    task.start()
+    task.start()
+
+    assert len(socketio.tasks) == 1
+    with pytest.raises(Stop):
+        socketio.run_tasks()
+    assert task.runs == RUNS
+
+
+def test_task_needs_work():
+    with pytest.raises(TypeError):
+        PeriodicTask(FakeSocketIO(0), Flask(__name__), interval=1)
+
+
+def test_standings_are_reloaded_after_storing_scores():
+    calls = []
+
+    class Fake:
+        def __init__(self, name):
+            self.name = name
+
+        def flush(self):
+            calls.append(self.name)
+
+        def reload(self):
+            calls.append(self.name)
+            return 1
+
+    refresher = StandingsRefresher(
+        FakeSocketIO(0), Flask(__name__), Fake("leaderboard"),
+        Fake("rank_index"), Fake("score_writer"))
+
+    assert refresher.run_once() == 2
+    assert calls == ["score_writer", "leaderboard", "rank_index"]
@@ -0,0 +1,84 @@
+"""
+    Tests for micro-batching of predictions.
+"""
+import threading
+import time
+from pytest import raises
+from customvision.prediction_batcher import PredictionBatcher
+from customvision.prediction_batcher import pipelined
+
+
+def test_frames_are_batched_and_demultiplexed():
+    """
+        Check that concurrent frames are sent as one batch, and that every
+        caller gets the result of its own frame.
+    """
+    batches = []
+
+    def predict_batch(images):
+        batches.append(images)
+        return [({label: 1.0}, label) for label in images]
+
+    batcher = PredictionBatcher(predict_batch, window=0.05, max_batch=8)
+    results = {}
+
+    def run(label):
+        results[label] = batcher.predict(label)
+
+    threads = [
+        threading.Thread(target=run, args=(label,))
+        for label in ["cat", "dog", "eel"]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(batches) == 1
+    assert results["dog"] == ({"dog": 1.0}, "dog")
+    assert batcher.metrics()["count"] == 1
+
+
+def test_full_batch_is_sent_right_away():
+    batcher = PredictionBatcher(
+        lambda images: [({}, image) for image in images],
+        window=60, max_batch=1)
+
+    assert batcher.predict("cat") == ({}, "cat")
+
+
+def test_errors_reach_their_caller():
+    def predict(image):
+        if image == "bad":
+            raise ValueError("bad image")
+        return {}, image
+
+    batcher = PredictionBatcher(pipelined(predict), window=0, max_batch=1)
+
+    assert batcher.predict("cat") == ({}, "cat")
+    with raises(ValueError):
+        batcher.predict("bad")
+
+
+def test_fast_frame_is_not_held_by_slow_frame():
+    """
+        Check that a frame is answered as soon as its own prediction is
+        done, even if another frame in the same batch is still running.
+    """
+    release = threading.Event()
+
+    def predict(image):
+        if image == "slow":
+            release.wait()
+        return {}, image
+
+    batcher = PredictionBatcher(pipelined(predict), window=0.05, max_batch=8)
+    slow = threading.Thread(target=batcher.predict, args=("slow",))
+    slow.start()
+
+    start = time.monotonic()
+    assert batcher.predict("fast") == ({}, "fast")
+    assert time.monotonic() - start < 1
+    assert batcher.metrics()["count"] == 1
+    release.set()
+    slow.join()
@@ -0,0 +1,103 @@
+"""
+    Tests for the adaptive prediction scheduler.
+"""
+import threading
+import time
+from pytest import raises
+from customvision.prediction_scheduler import PredictionScheduler
+from utilities import setup
+from utilities.exceptions import PredictionUnavailable
+
+
+def test_limit_grows_on_fast_answers():
+    scheduler = PredictionScheduler(lambda image: ({"angel": 1.0}, "angel"))
+
+    for i in range(10):
+        scheduler.predict(b"image", setup.PRIORITY_ROUTINE, 10)
+
+    assert scheduler.limit > setup.SCHEDULER_INITIAL_LIMIT
+
+
+def test_limit_halves_when_throttled():
+    def throttled(image):
+        raise PredictionUnavailable("quota exceeded", throttled=True)
+
+    scheduler = PredictionScheduler(throttled)
+
+    with raises(PredictionUnavailable):
+        scheduler.predict(b"image", setup.PRIORITY_ROUTINE, 10)
+    assert scheduler.limit == (
+        setup.SCHEDULER_INITIAL_LIMIT * setup.SCHEDULER_DECREASE_FACTOR)
+
+
+def test_limit_halves_on_timeout(monkeypatch):
+    """
+        Check that a call which timed out lowers the limit like a slow
+        answer, and a fast failure doesn't raise it.
+    """
+    def timed_out(image):
+        time.sleep(0.02)
+        raise PredictionUnavailable("Prediction timed out")
+
+    def failed(image):
+        raise PredictionUnavailable("Prediction failed")
+
+    monkeypatch.setattr(setup, "SCHEDULER_LATENCY_TARGET", 0.01)
+    scheduler = PredictionScheduler(timed_out)
+
+    with raises(PredictionUnavailable):
+        scheduler.predict(b"image", setup.PRIORITY_ROUTINE, 10)
+    limit = setup.SCHEDULER_INITIAL_LIMIT * setup.SCHEDULER_DECREASE_FACTOR
+    assert scheduler.limit == limit
+
+    scheduler.predict_image = failed
+    with raises(PredictionUnavailable):
+        scheduler.predict(b"image", setup.PRIORITY_ROUTINE, 10)
+    assert scheduler.limit == limit
+
+
+def test_final_frames_go_first_and_late_frames_are_shed(monkeypatch):
+    """
+        Check that a waiting final frame is served before a routine frame
+        queued earlier, and that a routine frame which can't be answered
+        before the round ends is shed.
+    """
+    release = threading.Event()
+    order = []
+
+    def predict(image):
+        if image == b"blocking":
+            release.wait()
+        order.append(image)
+        return {"angel": 1.0}, "angel"
+
+    monkeypatch.setattr(setup, "SCHEDULER_MAX_LIMIT", 1)
+    scheduler = PredictionScheduler(predict)
+    scheduler.limit = 1
+    results = {}
+
+    def run(image, priority, time_left):
+        try:
+            scheduler.predict(image, priority, time_left)
+            results[image] = "ok"
+        except PredictionUnavailable:
+            results[image] = "shed"
+
+    threads = [
+        threading.Thread(target=run, args=args) for args in [
+            (b"blocking", setup.PRIORITY_ROUTINE, 10),
+            (b"routine", setup.PRIORITY_ROUTINE, 10),
+            (b"final", setup.PRIORITY_FINAL, 0),
+            (b"late", setup.PRIORITY_ROUTINE, 0.05),
+        ]
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert order == [b"blocking", b"final", b"routine"]
+    assert results[b"late"] == "shed"
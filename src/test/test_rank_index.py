@@ -0,0 +1,97 @@
+"""
+    Tests for looking up the rank of a score.
+"""
+import datetime
+import random
+from utilities import setup
+from utilities.fenwick_tree import FenwickTree
+from webapp import models
+from webapp.rank_index import RankIndex
+
+DIFFICULTY = 4
+
+
+def test_fenwick_tree_prefix_sums():
+    """
+        Check prefix sums against plain sums while the tree grows.
+    """
+    tree = FenwickTree()
+    counts = [0] * 1000
+    for _ in range(500):
+        position = random.randrange(len(counts))
+        tree.add(position)
+        counts[position] += 1
+
+    for end in range(0, len(counts) + 10, 7):
+        assert tree.prefix_sum(end) == sum(counts[:end])
+    assert tree.total == sum(counts)
+
+
+def test_rank_counts_loaded_and_new_scores(app):
+    today = datetime.date.today()
+    yesterday = today - datetime.timedelta(days=1)
+    for score, date in [(50, yesterday), (30, today), (90, yesterday)]:
+        models.insert_into_scores("player", score, date, DIFFICULTY)
+
+    index = RankIndex()
+    index.add(40, DIFFICULTY)
+
+    before = models.database_stats().get("statements", 0)
+    assert index.rank(40, DIFFICULTY) == {"total": 3, "daily": 1}
+    assert index.rank(95, DIFFICULTY) == {"total": 1, "daily": 1}
+    assert index.rank(30, DIFFICULTY) == {"total": 4, "daily": 2}
+    assert index.rank(10, 1) == {"total": 1, "daily": 1}
+    # only the counts of the new difficulty were read, up to the highest
+    # score id, from the scores and from the summaries of archived days
+    assert models.database_stats().get("statements", 0) == before + 5
+
+
+def test_daily_ranks_roll_over(app):
+    day = [datetime.date(2024, 1, 1)]
+    index = RankIndex(today=lambda: day[0])
+    index.add(70, DIFFICULTY)
+    day[0] += datetime.timedelta(days=1)
+    index.add(20, DIFFICULTY)
+
+    assert index.rank(20, DIFFICULTY) == {"total": 2, "daily": 1}
+
+
+def test_reload_counts_scores_of_other_instances(app):
+    index = RankIndex()
+    assert index.rank(40, DIFFICULTY) == {"total": 1, "daily": 1}
+
+    # stored by another instance
+    models.insert_into_scores("player", 50, datetime.date.today(), DIFFICULTY)
+    assert index.rank(40, DIFFICULTY) == {"total": 1, "daily": 1}
+    assert index.reload() == 1
+
+    assert index.rank(40, DIFFICULTY) == {"total": 2, "daily": 2}
+
+
+def test_reload_skips_scores_added_here(app):
+    today = datetime.date.today()
+    index = RankIndex()
+    index.add(50, DIFFICULTY)
+    # stored by this instance, then by another one
+    models.insert_into_scores("player", 50, today, DIFFICULTY)
+    models.insert_into_scores("player", 50, today, DIFFICULTY)
+
+    before = models.database_stats().get("statements", 0)
+    index.reload()
+    index.reload()
+
+    # only the new rows were read
+    assert models.database_stats().get("statements", 0) == before + 2
+    assert index.rank(40, DIFFICULTY) == {"total": 3, "daily": 3}
+
+
+def test_tree_size_is_bounded(app):
+    """
+        Check that looking up a huge score doesn't grow the trees past
+        the highest score accepted.
+    """
+    index = RankIndex()
+    index.add(setup.MAX_SCORE, DIFFICULTY)
+
+    assert index.rank(1e9, DIFFICULTY) == {"total": 1, "daily": 1}
+    assert len(index.total[DIFFICULTY].counts) <= 2 * (setup.MAX_SCORE + 1)
@@ -0,0 +1,108 @@
+"""
+    Tests for deadlines, circuit breaking and hedging of predictions.
+"""
+import time
+from pytest import raises
+from customvision.resilient_predictor import ResilientPredictor
+from utilities import setup
+from utilities.exceptions import PredictionUnavailable
+
+
+class FakeClassifier:
+    iteration_name = "iteration"
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.calls = 0
+
+    def predict_image_by_post(self, img):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        time.sleep(delay)
+        if delay < 0:
+            raise Exception("service error")
+        return {"angel": 1.0}, "angel"
+
+
+def test_prediction_within_deadline():
+    classifier = FakeClassifier([0])
+    predictor = ResilientPredictor(lambda: classifier, deadline=1)
+
+    assert predictor.predict(b"image") == ({"angel": 1.0}, "angel")
+    outcomes = predictor.metrics()["iterations"]["iteration"]["outcomes"]
+    assert outcomes == {"ok": 1}
+
+
+def test_slow_prediction_times_out():
+    classifier = FakeClassifier([0.5])
+    predictor = ResilientPredictor(lambda: classifier, deadline=0.05)
+
+    with raises(PredictionUnavailable):
+        predictor.predict(b"image")
+
+
+def test_circuit_opens_after_failures():
+    """
+        Check that calls stop after repeated failures.
+    """
+    classifier = FakeClassifier([-0.001])
+    predictor = ResilientPredictor(lambda: classifier, deadline=1)
+
+    for i in range(setup.CIRCUIT_BREAKER_THRESHOLD):
+        with raises(PredictionUnavailable):
+            predictor.predict(b"image")
+    with raises(PredictionUnavailable):
+        predictor.predict(b"image")
+
+    assert classifier.calls == setup.CIRCUIT_BREAKER_THRESHOLD
+    assert predictor.metrics()["circuit"] == "open"
+
+
+def test_hedged_request_answers_slow_call():
+    """
+        Check that a slow call is hedged once enough latencies are known.
+    """
+    samples = setup.HEDGE_MIN_SAMPLES
+    classifier = FakeClassifier([0] * samples + [1, 0])
+    predictor = ResilientPredictor(
+        lambda: classifier, deadline=0.5, hedging=True)
+    for i in range(samples):
+        predictor.predict(b"image")
+
+    assert predictor.predict(b"image") == ({"angel": 1.0}, "angel")
+    outcomes = predictor.metrics()["iterations"]["iteration"]["outcomes"]
+    assert outcomes["hedged"] == 1
+
+
+def test_no_iteration_is_unavailable():
+    """
+        Check that nothing is sent before an iteration is published.
+    """
+    classifier = FakeClassifier([0])
+    classifier.iteration_name = None
+    predictor = ResilientPredictor(lambda: classifier, deadline=1)
+
+    with raises(PredictionUnavailable):
+        predictor.predict(b"image")
+    assert classifier.calls == 0
+
+
+def test_queued_calls_are_cancelled_after_timeout():
+    """
+        Check that calls still waiting for a worker are dropped when the
+        deadline has passed.
+    """
+    classifier = FakeClassifier([0.2])
+    predictor = ResilientPredictor(lambda: classifier, deadline=0.05)
+    # keep every worker busy so the next call has to queue
+    busy = [
+        predictor.executor.submit(time.sleep, 0.2)
+        for _ in range(setup.PREDICTION_WORKERS)
+    ]
+
+    with raises(PredictionUnavailable):
+        predictor.predict(b"image")
+    for future in busy:
+        future.result()
+    predictor.executor.shutdown(wait=True)
+    assert classifier.calls == 0
@@ -0,0 +1,69 @@
+"""
+    Tests for archival and roll-up of old scores.
+"""
+import datetime
+import random
+from webapp import models
+from webapp.leaderboard import Leaderboard
+from webapp.rank_index import RankIndex
+from webapp.score_archiver import ScoreArchiver
+from test.conftest import FakeSocketIO
+
+DIFFICULTIES = [1, 4]
+TODAY = datetime.date.today()
+
+
+def _insert_scores():
+    random.seed(0)
+    rows = [
+        ("player", random.randrange(100), TODAY - datetime.timedelta(days=age),
+         random.choice(DIFFICULTIES))
+        for age in (0, 0, 1, 200, 200, 300, 300, 300) * 5
+    ]
+    models.insert_many_scores(rows)
+    return rows
+
+
+def _leaderboards():
+    leaderboard = Leaderboard()
+    ranks = RankIndex()
+    return [
+        (leaderboard.top(i), [ranks.rank(score, i) for score in range(100)])
+        for i in DIFFICULTIES
+    ]
+
+
+def test_archival_keeps_leaderboards(app):
+    rows = _insert_scores()
+    before = _leaderboards()
+
+    archived = ScoreArchiver(FakeSocketIO(), app, age=30).run_once()
+
+    old = [row for row in rows if row[2] < TODAY - datetime.timedelta(30)]
+    assert archived == len(old)
+    assert models.Scores.query.count() == len(rows) - len(old)
+    assert models.ScoresArchive.query.count() == len(old)
+    assert _leaderboards() == before
+
+
+def test_archiving_a_day_again_merges_summaries(app):
+    date = TODAY - datetime.timedelta(days=200)
+    models.insert_into_scores("player", 5, date, 4)
+    models.archive_scores_of_day(date, 10)
+    models.insert_into_scores("player", 9, date, 4)
+    models.archive_scores_of_day(date, 10)
+
+    summary = models.db.session.get(models.ScoreSummary, (date, 4))
+    assert summary.count == 2
+    assert sorted(models.get_score_counts(4, date)) == [(5, 1), (9, 1)]
+    assert [e["score"] for e in models.get_top_n_high_score_list(10, 4)] == [
+        9, 5]
+
+
+def test_export_streams_all_scores(app):
+    rows = _insert_scores()
+    ScoreArchiver(FakeSocketIO(), app, age=30).run_once()
+
+    exported = list(models.export_scores(batch_size=3))
+    assert len(exported) == len(rows)
+    assert len(set(row[0] for row in exported)) == len(rows)
@@ -0,0 +1,94 @@
+"""
+    Tests for the write-behind buffer of scores.
+"""
+import datetime
+import pytest
+from utilities.exceptions import UserError
+from webapp import models
+from webapp.score_writer import ScoreWriter
+from test.conftest import FakeSocketIO
+
+DIFFICULTY = 4
+TODAY = datetime.date.today()
+
+
+def test_full_batch_is_stored_in_one_commit(app):
+    socketio = FakeSocketIO()
+    writer = ScoreWriter(socketio, app, batch_size=3)
+    entries = [{"id": None, "score": score} for score in (4, 5, 6)]
+    for entry in entries:
+        writer.add("player", entry["score"], TODAY, DIFFICULTY, entry)
+
+    assert models.Scores.query.count() == 0
+    before = models.database_stats().get("commits", 0)
+    socketio.run_tasks()
+
+    assert models.database_stats().get("commits", 0) == before + 1
+    assert models.Scores.query.count() == 3
+    assert [entry["id"] for entry in entries] == [1, 2, 3]
+
+
+def test_flush_stores_partial_batch(app):
+    writer = ScoreWriter(FakeSocketIO(), app)
+    writer.add("player", 7, TODAY, DIFFICULTY)
+
+    assert writer.flush() == 1
+    assert writer.flush() == 0
+    assert models.Scores.query.one().score == 7
+
+
+def test_failed_batch_is_kept(app, monkeypatch):
+    writer = ScoreWriter(FakeSocketIO(), app)
+    writer.add("player", 7, TODAY, DIFFICULTY)
+
+    def fail(rows):
+        raise Exception("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(models, "insert_many_scores", fail)
+        assert writer.flush() == 0
+
+    assert writer.flush() == 1
+
+
+def test_failing_score_is_dropped(app, monkeypatch):
+    insert_many_scores = models.insert_many_scores
+
+    def fail_deleted_player(rows):
+        if any(row[0] == "deleted" for row in rows):
+            raise Exception("foreign key violation")
+        return insert_many_scores(rows)
+
+    monkeypatch.setattr(models, "insert_many_scores", fail_deleted_player)
+    writer = ScoreWriter(FakeSocketIO(), app, max_attempts=2)
+    writer.add("deleted", 3, TODAY, DIFFICULTY)
+    # alone, the score is retried like when the database is down
+    assert writer.flush() == 0
+    entries = [{"id": None, "score": score} for score in (4, 5)]
+    for entry in entries:
+        writer.add("player", entry["score"], TODAY, DIFFICULTY, entry)
+
+    assert writer.flush() == 2
+    assert writer.flush() == 0
+    assert sorted(s.score for s in models.Scores.query) == [4, 5]
+    assert all(entry["id"] is not None for entry in entries)
+
+
+def test_retries_are_capped(app, monkeypatch):
+    def fail(rows):
+        raise Exception("database unavailable")
+
+    monkeypatch.setattr(models, "insert_many_scores", fail)
+    writer = ScoreWriter(FakeSocketIO(), app, max_attempts=2)
+    writer.add("player", 7, TODAY, DIFFICULTY)
+
+    assert writer.flush() == 0
+    assert len(writer.pending) == 1
+    assert writer.flush() == 0
+    assert writer.pending == []
+
+
+def test_invalid_score_is_rejected(app):
+    writer = ScoreWriter(FakeSocketIO(), app)
+    with pytest.raises(UserError):
+        writer.add(None, 7, TODAY, DIFFICULTY)
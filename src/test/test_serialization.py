@@ -0,0 +1,46 @@
+"""
+    Tests for encoding of Socket.IO event payloads.
+"""
+import json
+from unittest.mock import MagicMock
+from webapp.serialization import EventSerializer
+
+
+def _serializer(room_members):
+    socketio = MagicMock()
+    socketio.server.manager.get_participants.return_value = [
+        (sid, "eio_" + sid) for sid in room_members
+    ]
+    return EventSerializer(socketio), socketio
+
+
+def test_decode_accepts_strings_and_objects():
+    serializer, _ = _serializer([])
+
+    assert serializer.decode('{"game_id": "a"}', "old") == {"game_id": "a"}
+    assert serializer.decode({"game_id": "a"}, "new") == {"game_id": "a"}
+    assert serializer.encode({"a": 1}, "old") == '{"a": 1}'
+    assert serializer.encode({"a": 1}, "new") == {"a": 1}
+
+
+def test_room_with_one_encoding_gets_one_emit():
+    serializer, socketio = _serializer(["old_1", "old_2"])
+
+    serializer.emit("getLabel", {"label": "cat"}, room="game")
+
+    socketio.emit.assert_called_once_with(
+        "getLabel", '{"label": "cat"}', room="game", namespace="/")
+
+
+def test_mixed_room_is_encoded_per_client():
+    serializer, socketio = _serializer(["old", "new"])
+    serializer.decode({"game_id": "game"}, "new")
+
+    serializer.emit("getLabel", {"label": "cat"}, room="game")
+
+    payloads = dict(
+        (call.kwargs["room"], call.args[1])
+        for call in socketio.emit.call_args_list
+    )
+    assert json.loads(payloads["old"]) == {"label": "cat"}
+    assert payloads["new"] == {"label": "cat"}
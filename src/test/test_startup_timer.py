@@ -0,0 +1,38 @@
+"""
+    Tests for the startup timing report.
+"""
+import time
+from utilities.startup_timer import StartupTimer
+
+TASK_SECONDS = 0.2
+
+
+def test_phases_are_reported_in_order():
+    timer = StartupTimer()
+    timer.mark("imports")
+    time.sleep(TASK_SECONDS)
+    timer.mark("database")
+
+    report = timer.report()
+    assert list(report["phases"]) == ["imports", "database"]
+    assert report["phases"]["database"] >= TASK_SECONDS
+    assert report["total"] >= TASK_SECONDS
+
+
+def test_warm_ups_run_in_parallel():
+    timer = StartupTimer()
+
+    def fail():
+        raise ConnectionError("unreachable")
+
+    failed = timer.parallel("warm-up", {
+        "first": lambda: time.sleep(TASK_SECONDS),
+        "second": lambda: time.sleep(TASK_SECONDS),
+        "third": fail,
+    })
+
+    assert failed == ["third"]
+    phases = timer.report()["phases"]
+    assert phases["warm-up"] < 2 * TASK_SECONDS
+    assert phases["warm-up: first"] >= TASK_SECONDS
+    assert "warm-up: third" not in phases
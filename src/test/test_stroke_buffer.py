@@ -0,0 +1,67 @@
+"""
+    Tests for the stroke buffer of the stroke-delta protocol.
+"""
+from io import BytesIO
+from PIL import Image
+from pytest import raises
+from utilities.exceptions import UserError
+from webapp.stroke_buffer import StrokeBuffer
+
+
+def _ink(png):
+    image = Image.open(BytesIO(png))
+    return sum(1 for pixel in image.getdata() if pixel < 128)
+
+
+def test_strokes_are_accumulated():
+    """
+        Check that points sent in several messages extend the same stroke.
+    """
+    buffer = StrokeBuffer()
+    buffer.add("player", "game", 1, [{"id": 0, "points": [10, 10, 50, 10]}])
+    short_line = _ink(buffer.rasterize("player", "game"))
+    buffer.add("player", "game", 1, [{"id": 0, "points": [100, 10]}])
+    long_line = _ink(buffer.rasterize("player", "game"))
+
+    assert 0 < short_line < long_line
+
+
+def test_new_round_starts_new_drawing():
+    buffer = StrokeBuffer()
+    buffer.add("player", "game", 1, [{"id": 0, "points": [10, 10, 90, 90]}])
+    buffer.add("player", "game", 2, [{"id": 0, "points": [20, 20]}])
+    image = Image.open(BytesIO(buffer.rasterize("player", "game")))
+
+    assert image.size == (buffer.size, buffer.size)
+    assert image.getpixel((80, 80)) == 255
+    assert image.getpixel((20, 20)) == 0
+
+
+def test_invalid_strokes():
+    buffer = StrokeBuffer(max_points=3)
+
+    with raises(UserError):
+        buffer.add("player", "game", 1, [{"id": 0, "points": [1, 2, 3]}])
+    with raises(UserError):
+        buffer.add("player", "game", 1, [{"points": [1, 2]}])
+    with raises(UserError):
+        buffer.add("player", "game", 1, [{"id": 0, "points": [0] * 8}])
+
+
+def test_invalid_message_is_not_applied():
+    """
+        Check that a message with an invalid stroke leaves the drawing,
+        and its point count, as it was.
+    """
+    buffer = StrokeBuffer(max_points=3)
+    buffer.add("player", "game", 1, [{"id": 0, "points": [10, 10]}])
+    before = buffer.rasterize("player", "game")
+
+    with raises(UserError):
+        buffer.add("player", "game", 1, [
+            {"id": 0, "points": [50, 50]}, {"id": 1, "points": [1]}])
+    with raises(UserError):
+        buffer.add("player", "game", 2, [{"id": 0, "points": [0] * 8}])
+
+    assert buffer.rasterize("player", "game") == before
+    buffer.add("player", "game", 1, [{"id": 0, "points": [20, 20, 30, 30]}])
@@ -0,0 +1,88 @@
+"""
+    Tests for the connection pool settings, warm-up and metrics.
+"""
+import threading
+import pytest
+from flask import Flask
+from utilities import setup
+from utilities.exceptions import UserError
+from utilities.timed_pool import TimedQueuePool
+from webapp import models
+
+POOL_SIZE = 3
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///%s" % (tmp_path / "pool.db"),
+        "SQLALCHEMY_ENGINE_OPTIONS": {
+            "poolclass": TimedQueuePool,
+            "pool_size": POOL_SIZE,
+            "max_overflow": 1,
+            "pool_pre_ping": True,
+        },
+    }
+
+
+def test_warm_up_opens_the_pool(app):
+    before = models.database_stats().get("connects", 0)
+
+    assert models.warm_up_pool(app) == POOL_SIZE
+
+    # create_all opened and checked out the first connection
+    assert models.database_stats()["connects"] - before == POOL_SIZE - 1
+    stats = models.pool_stats()
+    assert stats["open"] == POOL_SIZE
+    assert stats["checked_out"] == 0
+    assert stats["overflow"] == 0
+    assert stats["checkout_seconds"]["count"] == POOL_SIZE + 1
+
+
+def test_checkout_times_survive_recreate(app):
+    models.Scores.query.count()
+    pool = models.db.engine.pool
+    count = pool.waits.count
+
+    assert pool.recreate().waits.count == count
+
+
+def test_sqlite_without_pool_settings():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    models.db.init_app(app)
+
+    assert models.warm_up_pool(app) == 0
+    with app.app_context():
+        assert models.pool_stats() == {}
+
+
+def test_handlers_hold_a_slot_per_transaction(app, monkeypatch):
+    """
+        Check that a transaction of a handler holds a slot until it ends,
+        that a handler waits for a slot, and that background tasks, which
+        run without a request context, don't need one.
+    """
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(models, "handler_slots", slots)
+    monkeypatch.setattr(setup, "DB_POOL_TIMEOUT", 0.01)
+
+    models.Labels.query.all()
+    assert slots.acquire(blocking=False)
+    slots.release()
+    models.db.session.commit()
+
+    with app.test_request_context():
+        models.Labels.query.all()
+        assert not slots.acquire(blocking=False)
+        models.release_connection()
+        assert slots.acquire(blocking=False)
+
+        with pytest.raises(UserError):
+            models.Labels.query.all()
+        models.db.session.rollback()
+        slots.release()
+        models.Labels.query.all()
+        models.db.session.remove()
+
+    assert slots.acquire(blocking=False)
@@ -0,0 +1,53 @@
+"""
+    Tests for uploading images to Custom Vision.
+"""
+from types import SimpleNamespace
+from flask import Flask
+from customvision.trainer import Trainer
+from utilities import keys
+from utilities import setup
+from webapp import storage
+from webapp.local_storage import LocalStorage
+
+
+class FakeClient:
+    """
+        Accepts every image sent as file contents.
+    """
+
+    def __init__(self):
+        self.files = []
+
+    def get_tags(self, project_id):
+        return [SimpleNamespace(name="cat", id="tag")]
+
+    def create_images_from_urls(self, project_id, images):
+        raise AssertionError("local file URLs can't be downloaded")
+
+    def create_images_from_files(self, project_id, batch):
+        self.files.extend(batch.images)
+        return SimpleNamespace(is_batch_successful=True, images=[
+            SimpleNamespace(source_url=entry.name, status="OK")
+            for entry in batch.images
+        ])
+
+
+def test_local_images_are_sent_as_files(tmp_path, monkeypatch):
+    for key in ["CV_ENDPOINT", "CV_PROJECT_ID", "CV_TRAINING_KEY",
+                "CV_PREDICTION_RESOURCE_ID"]:
+        monkeypatch.setitem(keys.keys, key, "https://example.com")
+    monkeypatch.setattr(
+        setup, "UPLOAD_MANIFEST_PATH", str(tmp_path / "manifest.jsonl"))
+    backend = LocalStorage("container", str(tmp_path))
+    backend.save("cat/1.png", b"first")
+    backend.save("cat/2.png", b"second")
+    monkeypatch.setattr(storage, "get_backend", lambda name: backend)
+
+    trainer = Trainer(Flask(__name__))
+    trainer.client = FakeClient()
+
+    assert trainer.upload_images(["cat"]) == {
+        "uploaded": 2, "skipped": 0, "failed": 0}
+    assert sorted(entry.contents for entry in trainer.client.files) == [
+        b"first", b"second"]
+    assert trainer.manifest.contains("cat", "cat/2.png")
@@ -0,0 +1,111 @@
+"""
+    Tests for background training jobs.
+"""
+import datetime
+import pytest
+from utilities import setup
+from utilities.exceptions import UserError
+from webapp import models
+from customvision.training_job import TrainingJobManager
+from test.conftest import FakeSocketIO
+
+
+class FakeIteration:
+    id = "id"
+    status = "Completed"
+    publish_name = "published"
+
+
+class FakeTrainer:
+    def __init__(self):
+        self.calls = []
+
+    def upload_images(self, labels):
+        self.calls.append("upload_images")
+
+    def start_training(self):
+        self.calls.append("start_training")
+        return FakeIteration()
+
+    def wait_for_training(self, iteration, on_status=None, sleep=None):
+        self.calls.append("wait_for_training")
+        return iteration
+
+    def publish(self, iteration):
+        self.calls.append("publish")
+
+
+def test_trainer_is_created_by_the_first_job(app):
+    trainers = []
+
+    def create_trainer():
+        trainers.append(FakeTrainer())
+        return trainers[-1]
+
+    socketio = FakeSocketIO()
+    jobs = TrainingJobManager(create_trainer, socketio, app)
+    assert trainers == []
+
+    for _ in range(2):
+        job_id = jobs.start(["cat"])
+        socketio.run_tasks()
+        assert models.get_training_job(job_id).state == (
+            setup.TRAINING_COMPLETED)
+
+    assert len(trainers) == 1
+    assert trainers[0].calls == [
+        "upload_images", "start_training", "wait_for_training", "publish"
+    ] * 2
+    assert socketio.events[-1]["state"] == setup.TRAINING_COMPLETED
+
+
+def test_only_one_job_at_a_time(app):
+    socketio = FakeSocketIO()
+    jobs = TrainingJobManager(FakeTrainer, socketio, app)
+    jobs.start(["cat"])
+
+    with pytest.raises(UserError):
+        jobs.start(["dog"])
+
+    socketio.run_tasks()
+    jobs.start(["dog"])
+
+
+def test_lost_job_frees_the_slot(app):
+    socketio = FakeSocketIO()
+    jobs = TrainingJobManager(FakeTrainer, socketio, app)
+    job_id = jobs.start(["cat"])
+    job = models.get_training_job(job_id)
+    job.updated = job.start_at = datetime.datetime.today() - (
+        datetime.timedelta(seconds=setup.TRAINING_JOB_TIMEOUT + 1))
+    models.db.session.commit()
+
+    jobs.start(["dog"])
+
+
+def test_scheduled_job_is_resumed_once(app):
+    """
+        Check that a job waiting for its start time when the server
+        stopped is scheduled again, and runs once even if every worker
+        resumes it.
+    """
+    start_at = datetime.datetime.today() + datetime.timedelta(hours=1)
+    job_id = TrainingJobManager(FakeTrainer, FakeSocketIO(), app).start(
+        ["cat"], start_at)
+
+    trainers = []
+
+    def create_trainer():
+        trainers.append(FakeTrainer())
+        return trainers[-1]
+
+    socketio = FakeSocketIO()
+    workers = [
+        TrainingJobManager(create_trainer, socketio, app) for _ in range(2)
+    ]
+    assert [jobs.resume() for jobs in workers] == [job_id, job_id]
+    socketio.run_tasks()
+
+    assert models.get_training_job(job_id).state == setup.TRAINING_COMPLETED
+    assert len(trainers) == 1
+    assert workers[0].resume() is None
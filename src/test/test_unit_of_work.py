@@ -0,0 +1,76 @@
+"""
+    Tests for batching the database writes of one event in a unit of work.
+"""
+import datetime
+import json
+import pytest
+from webapp import models
+
+
+def _delta(before):
+    after = models.database_stats()
+    return dict(
+        (key, after.get(key, 0) - before.get(key, 0))
+        for key in ("statements", "commits")
+    )
+
+
+def _create_game(game_id, player_1, player_2):
+    with models.unit_of_work():
+        models.insert_into_games(
+            game_id, json.dumps(["cat"]), datetime.datetime.today(), 1)
+        models.insert_into_players(player_1, game_id, "Waiting")
+        models.insert_into_mulitplayer(game_id, player_1, "pair")
+    with models.unit_of_work():
+        models.update_mulitplayer(player_2, game_id)
+        models.insert_into_players(player_2, game_id, "Ready")
+
+
+def test_join_game_commits_once(app):
+    before = models.database_stats()
+    with models.unit_of_work():
+        models.insert_into_games(
+            "game", json.dumps(["cat"]), datetime.datetime.today(), 1)
+        models.insert_into_players("player", "game", "Waiting")
+        models.insert_into_mulitplayer("game", "player", "pair")
+
+    assert _delta(before) == {"statements": 3, "commits": 1}
+    assert models.get_player("player").state == "Waiting"
+
+
+def test_loaded_records_are_reused(app):
+    """
+        Check that updating both players of a game, as getLabel does,
+        reads each record once and commits once.
+    """
+    _create_game("game", "player_1", "player_2")
+    models.db.session.expire_all()
+
+    before = models.database_stats()
+    with models.unit_of_work():
+        opponent = models.get_opponent("game", "player_1")
+        models.update_game_for_player("game", "player_1", 0, "Ready")
+        models.update_game_for_player("game", opponent.player_id, 0, "Ready")
+        models.get_game("game")
+
+    # mulitplayer, opponent, game and player are read, then both players
+    # are updated in one statement
+    assert _delta(before) == {"statements": 5, "commits": 1}
+
+
+def test_failed_unit_of_work_is_rolled_back(app):
+    with pytest.raises(RuntimeError):
+        with models.unit_of_work():
+            models.insert_into_games(
+                "game", json.dumps(["cat"]), datetime.datetime.today(), 1)
+            raise RuntimeError()
+
+    assert models.db.session.get(models.Games, "game") is None
+
+
+def test_writes_outside_unit_of_work_commit(app):
+    before = models.database_stats()
+    models.insert_into_games(
+        "game", json.dumps(["cat"]), datetime.datetime.today(), 1)
+
+    assert _delta(before)["commits"] == 1
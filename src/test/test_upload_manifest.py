@@ -0,0 +1,37 @@
+"""
+    Tests for the manifest of images uploaded to Custom Vision.
+"""
+from customvision.upload_manifest import UploadManifest
+
+
+def test_manifest_is_resumed_from_file(tmp_path):
+    """
+        Check that uploads recorded by one manifest are known to a new
+        manifest on the same file, also if the last line was cut short.
+    """
+    path = tmp_path / "manifest.jsonl"
+    manifest = UploadManifest(str(path))
+    manifest.add("cat", ["cat/1.png", "cat/2.png"])
+    manifest.add("dog", ["dog/1.png"])
+    with open(path, "a") as manifest_file:
+        manifest_file.write('{"tag": "dog", "names": ["dog/2')
+
+    resumed = UploadManifest(str(path))
+
+    assert resumed.contains("cat", "cat/2.png")
+    assert resumed.contains("dog", "dog/1.png")
+    assert not resumed.contains("dog", "dog/2.png")
+    assert not resumed.contains("dog", "cat/1.png")
+    assert resumed.count() == 3
+
+
+def test_clear(tmp_path):
+    """
+        Check that a cleared manifest is empty.
+    """
+    manifest = UploadManifest(str(tmp_path / "manifest.jsonl"))
+    manifest.add("cat", ["cat/1.png"])
+    manifest.clear()
+
+    assert not manifest.contains("cat", "cat/1.png")
+    assert UploadManifest(str(tmp_path / "manifest.jsonl")).count() == 0
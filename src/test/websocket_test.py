@@ -11,6 +11,7 @@ import pytest
 import json
 import tempfile
 import werkzeug
+from webapp import api
 from webapp.api import app, socketio
 import os
 
@@ -436,6 +437,36 @@ def test_classification_both_timeout(test_clients):
     assert len(r2) == 1
 
 
+@patch('webapp.api.classifier', mock_classifier)
+def test_compact_prediction_format(test_clients):
+    correct_label = "angel"
+    _, ws_client1, ws_client2 = test_clients
+    ws_client1.emit(
+        "joinGame",
+        '{"pair_id": "compact", "difficulty_id": 1, "format": "compact"}')
+    ws_client2.emit("joinGame", '{"pair_id": "compact","difficulty_id": 1}')
+    r1 = ws_client1.get_received()
+    ws_client2.get_received()
+    table = [r for r in r1 if r["name"] == "labelTable"][0]["args"][0]
+    game_id = r1[0]["args"][0]["game_id"]
+    data = {"game_id": game_id, "time_left": 1, "lang": "NO"}
+
+    ws_client1.emit(
+        "classify",
+        data,
+        _get_image_as_stream(HARAMBE_PATH),
+        correct_label)
+
+    r1 = ws_client1.get_received()
+    label_id = table["labels"].index(correct_label)
+    scale = 2 ** table["bits"] - 1
+    assert r1[0]["name"] == "prediction"
+    assert r1[0]["args"][0]["top"] == [[label_id, scale]]
+    assert r1[0]["args"][0]["guess"] == label_id
+    assert r1[0]["args"][0]["correctLabel"] == label_id
+    assert r1[0]["args"][0]["hasWon"] is True
+
+
 def test_players_not_with_same_playerid(test_clients):
     """TODO: implement me"""
     _, ws_client1, ws_client2 = test_clients
@@ -489,6 +520,71 @@ def test_end_game(test_clients):
     assert r2_json['playerId'] == player_1_id
 
 
+def test_strokes_require_round(test_clients):
+    """
+        tests that strokes without a round are rejected
+    """
+    _, ws_client1, _ = test_clients
+    ws_client1.emit("strokes", {
+        "game_id": "game", "strokes": [{"id": 0, "points": [10, 10]}]})
+
+    r1 = ws_client1.get_received()
+    assert r1[0]["name"] == "error"
+    assert "round" in r1[0]["args"][0]
+
+
+@patch('webapp.api.storage', MagicMock())
+@patch('webapp.api.classifier', mock_classifier)
+def test_classify_strokes(test_clients):
+    """
+        tests that strokes sent in several messages are classified as one
+        drawing
+    """
+    correct_label = "angel"
+    _, ws_client1, ws_client2 = test_clients
+    ws_client1.emit("joinGame", '{"pair_id": "strokes","difficulty_id": 1}')
+    ws_client2.emit("joinGame", '{"pair_id": "strokes","difficulty_id": 1}')
+    r1 = ws_client1.get_received()
+    ws_client2.get_received()
+    game_id = r1[0]["args"][0]["game_id"]
+
+    ws_client1.emit("strokes", {
+        "game_id": game_id, "round": 1,
+        "strokes": [{"id": 0, "points": [20, 20, 120, 20]}]})
+    assert ws_client1.get_received() == []
+
+    data = {
+        "game_id": game_id, "time_left": 1, "lang": "NO", "round": 1,
+        "strokes": [{"id": 0, "points": [120, 120]}]}
+    ws_client1.emit("classifyStrokes", data, correct_label)
+
+    r1 = ws_client1.get_received()
+    assert r1[0]["name"] == "prediction"
+    assert r1[0]["args"][0]["guess"] == "engel"
+    assert r1[0]["args"][0]["hasWon"] is True
+    assert len(r1) == 1
+
+
+@pytest.mark.parametrize("score", ["nan", "inf", "-5", "1e9", "score"])
+def test_invalid_score_is_not_recorded(test_clients, score):
+    """
+        tests that an invalid score is rejected before it reaches the
+        leaderboard
+    """
+    _, ws_client1, _ = test_clients
+    with app.app_context():
+        before = api.leaderboard.top(4)
+    data = json.dumps(
+        {"player_id": "player", "score": score, "difficulty_id": 4})
+
+    ws_client1.emit("postScore", data)
+
+    r1 = ws_client1.get_received()
+    assert r1[0]["name"] == "error"
+    with app.app_context():
+        assert api.leaderboard.top(4) == before
+
+
 def _get_image_as_stream(file_path):
     image_file = open(file_path, "rb")
     data_stream = image_file.read()
@@ -0,0 +1,55 @@
+"""
+    Circuit breaker for calls to external services.
+"""
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+        Stops calls to a failing service. After threshold consecutive
+        failures the circuit opens and calls are rejected for cooldown
+        seconds. Then a single trial call is let through, which closes the
+        circuit on success and opens it again on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+            Returns True if a call may be made.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+
+            cooled_down = time.monotonic() - self.opened_at >= self.cooldown
+            if self.state == self.OPEN and cooled_down:
+                # let a single trial call through
+                self.state = self.HALF_OPEN
+                return True
+
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN
+                    or self.failures >= self.threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
@@ -15,3 +15,20 @@ class UserError(Exception):
         """
         self.message = message
         super().__init__(self.message)
+
+
+class PredictionUnavailable(Exception):
+    """
+        Raised when no prediction could be made in time, e.g. because the
+        prediction service is slow or failing.
+    """
+
+    def __init__(self, message="Prediction unavailable", throttled=False):
+        """
+            message -> str: the reason no prediction was made
+            throttled -> bool: True if the service rejected the call
+            because the transaction quota was exceeded
+        """
+        self.message = message
+        self.throttled = throttled
+        super().__init__(self.message)
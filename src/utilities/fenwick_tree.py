@@ -0,0 +1,53 @@
+"""
+    Binary indexed tree of counts.
+"""
+
+
+class FenwickTree:
+    """
+        Counts for the positions 0, 1, 2, ... with updates and prefix sums
+        in O(log n). The tree grows when a position past its end is added.
+    """
+
+    def __init__(self, size=1):
+        self.counts = [0] * size
+        self.tree = [0] * (size + 1)
+        self.total = 0
+
+    def add(self, position, delta=1):
+        """
+            Adds delta to the count at the position.
+        """
+        if position >= len(self.counts):
+            self._grow(position + 1)
+
+        self.counts[position] += delta
+        self.total += delta
+        i = position + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, end):
+        """
+            Returns the sum of the counts at positions below end.
+        """
+        i = min(end, len(self.counts))
+        result = 0
+        while i > 0:
+            result += self.tree[i]
+            i -= i & -i
+
+        return result
+
+    def _grow(self, size):
+        """
+            Rebuilds the tree in O(n) with room for at least size positions.
+        """
+        size = max(size, 2 * len(self.counts))
+        self.counts += [0] * (size - len(self.counts))
+        self.tree = [0] + self.counts
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                self.tree[parent] += self.tree[i]
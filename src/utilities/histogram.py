@@ -0,0 +1,62 @@
+"""
+    Histogram for latency measurements.
+"""
+import bisect
+import threading
+
+
+class Histogram:
+    """
+        Counts values in buckets with geometrically growing bounds, which
+        gives percentiles with a bounded relative error in constant memory.
+    """
+
+    def __init__(self, lowest=0.001, highest=60.0, factor=1.25):
+        self.bounds = [lowest]
+        while self.bounds[-1] < highest:
+            self.bounds.append(self.bounds[-1] * factor)
+        # the last bucket counts values above the highest bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, value):
+        """
+            Adds a value to the histogram.
+        """
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def percentile(self, fraction):
+        """
+            Returns the upper bound of the bucket holding the given fraction
+            of all values, e.g. 0.95 for the 95th percentile. Returns None
+            if the histogram is empty.
+        """
+        if self.count == 0:
+            return None
+
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count > 0:
+                break
+
+        return self.bounds[min(index, len(self.bounds) - 1)]
+
+    def snapshot(self):
+        """
+            Returns count, mean and common percentiles of the values.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
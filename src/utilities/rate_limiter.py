@@ -0,0 +1,29 @@
+"""
+    Rate limiting of calls to external services.
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """
+        Spaces out calls evenly, so that no more than rate calls start per
+        second. Can be shared between threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+            Blocks until the next call may start.
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if wait > 0:
+            time.sleep(wait)
@@ -1,10 +1,37 @@
 import sys
 import os
 from utilities.keys import Keys
+from utilities.timed_pool import TimedQueuePool
 from urllib import parse
 
 # number of players in overall high score top list
 TOP_N = 10
+# highest score accepted, scores are whole points from 0 to this
+MAX_SCORE = 10000
+# Periods with their own leaderboard, kept as buckets of at most TOP_N
+# scores which are compacted every compaction interval, in seconds
+PERIOD_WEEK = "week"
+PERIOD_MONTH = "month"
+PERIOD_EXHIBITION = "exhibition"
+PERIODS = [PERIOD_WEEK, PERIOD_MONTH, PERIOD_EXHIBITION]
+BUCKET_COMPACTION_INTERVAL = 900
+# seconds between reloads of the in-memory leaderboard and rank counts, so
+# scores posted to other server instances show up
+STANDINGS_REFRESH_INTERVAL = 60
+# Posted scores are stored in batches of at most this size, at least every
+# flush interval, in seconds
+SCORE_BATCH_SIZE = 50
+SCORE_FLUSH_INTERVAL = 2
+# Flushes a score is kept for while the database can't store any score
+SCORE_MAX_ATTEMPTS = 5
+# Scores older than the archive age, in days, are rolled up into daily
+# summaries and moved to the archive, a few days per run every archive
+# interval, in seconds
+SCORE_ARCHIVE_AGE = 90
+SCORE_ARCHIVE_INTERVAL = 3600
+SCORE_ARCHIVE_DAYS_PER_RUN = 7
+# Rows read per query when exporting scores
+EXPORT_BATCH_SIZE = 1000
 # Total number of games
 NUM_GAMES = 3
 # certainties from costum vision lower than this -> haswon=False
@@ -12,10 +39,87 @@ CERTAINTY_THRESHOLD = 0.7
 # certainty threshold for saving images to BLOB storage for training
 SAVE_CERTAINTY = 0.3
 # custom vision can't have more than 10 iterations at a time,
-# if more classifier.py will delete the oldest iteration
+# if more trainer.py will delete the oldest iteration
 CV_MAX_ITERATIONS = 10
+# seconds between checks for a newly published iteration
+ITERATION_REFRESH_INTERVAL = 30
+# seconds before an iteration which failed verification is tried again
+ITERATION_VERIFY_RETRY = 600
+# seconds to wait for a prediction before answering that the AI is thinking
+PREDICTION_DEADLINE = 2.0
+# threads making prediction calls, at least SCHEDULER_MAX_LIMIT so no
+# prediction let through by the scheduler waits for a thread
+PREDICTION_WORKERS = 16
+# consecutive failed predictions before calls are stopped, and for how long
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_COOLDOWN = 10
+# hedged predictions send a second request when the first is slower than
+# the 95th percentile, at the cost of extra prediction transactions
+PREDICTION_HEDGING = False
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+# Concurrent predictions allowed by the scheduler, adapted between the
+# bounds by halving on slow answers or throttling and growing otherwise
+SCHEDULER_INITIAL_LIMIT = 4
+SCHEDULER_MIN_LIMIT = 1
+SCHEDULER_MAX_LIMIT = 16
+SCHEDULER_DECREASE_FACTOR = 0.5
+# seconds a prediction may take before the limit is decreased
+SCHEDULER_LATENCY_TARGET = 1.0
+# weight of the newest latency in the expected prediction latency
+SCHEDULER_LATENCY_SMOOTHING = 0.2
+# seconds to collect frames into one prediction batch, and its maximum size
+BATCH_WINDOW = 0.005
+BATCH_MAX_SIZE = 8
+# Prediction priorities, lower numbers go first
+PRIORITY_FINAL = 0
+PRIORITY_NEAR_WIN = 1
+PRIORITY_ROUTINE = 2
+# certainty for the correct label which makes a player near a win
+NEAR_WIN_CERTAINTY = 0.3
+# The guess provided to the user when no prediction could be made in time
+THINKING_GUESS = "thinking..."
 # can't upload more than 64 images at a time, if more
 CV_MAX_IMAGES = 64
+# parallel workers and calls per second when uploading training images,
+# kept below the transaction limit of the Custom Vision training API
+CV_UPLOAD_WORKERS = 4
+CV_TRAINING_RATE = 8
+# image statuses which mean that an image exists in Custom Vision
+CV_UPLOAD_OK_STATUSES = ("OK", "OKDuplicate")
+# States of background training jobs
+TRAINING_SCHEDULED = "Scheduled"
+TRAINING_UPLOADING = "Uploading"
+TRAINING_TRAINING = "Training"
+TRAINING_PUBLISHING = "Publishing"
+TRAINING_COMPLETED = "Completed"
+TRAINING_FAILED = "Failed"
+TRAINING_FINISHED_STATES = (TRAINING_COMPLETED, TRAINING_FAILED)
+# Seconds without progress before a training job is considered lost
+TRAINING_JOB_TIMEOUT = 3 * 60 * 60
+# key of the row held by the training job which is scheduled or running
+TRAINING_SLOT = 1
+# Exponential backoff when polling training status, in seconds
+TRAINING_POLL_INITIAL = 1
+TRAINING_POLL_MAX = 60
+TRAINING_POLL_FACTOR = 2
+# Socket.IO room for administrators following training progress
+ADMIN_ROOM = "admin"
+# File recording which images have been uploaded to Custom Vision
+UPLOAD_MANIFEST_PATH = "upload_manifest.jsonl"
+# Number of labels and bits per probability in compact predictions
+COMPACT_TOP_K = 3
+COMPACT_PROBABILITY_BITS = 6
+# Stroke-delta drawings: canvas size in pixels, line width, and maximum
+# number of points in one drawing
+STROKE_CANVAS_SIZE = 256
+STROKE_WIDTH = 6
+STROKE_MAX_POINTS = 20000
+# Games older than the expiration are deleted with their players and
+# pairings, in batches of at most the batch size, every janitor interval
+GAME_EXPIRATION_DAYS = 1
+JANITOR_INTERVAL = 600
+JANITOR_BATCH_SIZE = 500
 # The guess provided to the user when the image is blank
 WHITE_IMAGE_GUESS = "blank image"
 # Authorization cookie expiration time in minutes
@@ -23,9 +127,65 @@ SESSION_EXPIRATION_TIME = 10
 # Maximum file size and minimum resolution for CV classification
 MAX_IMAGE_SIZE = 4000000
 MIN_RESOLUTION = 256
+# Encodings accepted by the classify event. Compact encodings are decoded
+# and normalized to png, and may not declare more pixels per side than the
+# maximum resolution
+IMAGE_ENCODING_PNG = "png"
+IMAGE_ENCODING_BITMAP = "bitmap"
+IMAGE_ENCODING_RLE = "rle"
+IMAGE_ENCODING_WEBP = "webp"
+# Run lengths in "rle" images are varints of at most 5 bytes, 7 bits each
+RLE_MAX_VARINT_SHIFT = 28
+MAX_RESOLUTION = 4096
+# zlib level of png images encoded by the server, low since they are sent
+# on right away
+PNG_COMPRESS_LEVEL = 1
 # Container names
 CONTAINER_NAME_ORIGINAL = "oldimgcontainer"
 CONTAINER_NAME_NEW = "newimgcontainer"
+# Storage backends, selected with the "STORAGE_BACKEND" key
+STORAGE_BACKEND_AZURE = "azure"
+STORAGE_BACKEND_LOCAL = "local"
+# Attempts and seconds between attempts when recreating a deleted container
+CREATE_CONTAINER_TRIES = 10
+CREATE_CONTAINER_WAITER = 6
+# Number of bytes in the content hash used to deduplicate saved drawings
+IMAGE_HASH_BYTES = 8
+# File holding the content hashes of all drawings saved for training
+IMAGE_INDEX_PATH = "image_index.bin"
+# Pragmas set on every SQLite connection: write-ahead logging, so readers
+# and the writer don't block each other, fewer syncs, which is safe with
+# WAL, waiting up to 5 s for locks, and a 16 MB page cache
+SQLITE_PRAGMAS = [
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "busy_timeout=5000",
+    "temp_store=MEMORY",
+    "cache_size=-16000",
+]
+# Database connections are held by socket handlers, at most the handler
+# concurrency at once, which models.handler_slots enforces, and by the
+# background tasks: the game janitor, the bucket compactor, the score
+# writer, the score archiver, the standings refresh, the iteration refresh
+# and a training job. The pool keeps one connection for each, opened at
+# startup, and opens up to the overflow more in bursts, waiting at most
+# the timeout, in seconds, when all are in use
+DB_HANDLER_CONCURRENCY = 8
+DB_BACKGROUND_TASKS = 7
+DB_POOL_SIZE = DB_HANDLER_CONCURRENCY + DB_BACKGROUND_TASKS
+DB_MAX_OVERFLOW = DB_HANDLER_CONCURRENCY
+DB_POOL_TIMEOUT = 10
+# Seconds before a connection is replaced, below the 30 minutes after which
+# Azure SQL drops idle connections
+DB_POOL_RECYCLE = 1200
+
+
+# The test database is used when running the tests or in debug mode. Its
+# schema is set up when the app starts, since it may be new or in memory,
+# while production runs "python -m webapp.migrations" as a deploy step
+DEVELOPMENT = "pytest" in sys.modules or "DEBUG" in os.environ
+# labels and translations added to the database by the setup
+LABELS_FILE = "./dict_eng_to_nor_difficulties_v2.csv"
 
 
 class Flask_config:
@@ -33,14 +193,34 @@ class Flask_config:
         Config settings for flask and sqlalchemy should be set here.
     """
 
-    if "pytest" in sys.modules or "DEBUG" in os.environ:
-        # Connection string for test database
-        con_str = Keys.get("TEST_DB_CONNECTION_STRING")
+    if DEVELOPMENT:
+        # Database URL or connection string for test database
+        url_key = "TEST_DATABASE_URL"
+        con_str_key = "TEST_DB_CONNECTION_STRING"
 
     else:
-        # Connection string for production database
+        # Database URL or connection string for production database
         # REMEMBER TO CHANGE BACK TO GAMEDB
-        con_str = Keys.get("DB_CONNECTION_STRING")
+        url_key = "DATABASE_URL"
+        con_str_key = "DB_CONNECTION_STRING"
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_DATABASE_URI = "mssql+pyodbc://%s" % con_str
+    if Keys.exists(url_key):
+        # any SQLAlchemy URL, e.g. "sqlite:///game.db" for a local file or
+        # "sqlite://" for an in-memory database
+        SQLALCHEMY_DATABASE_URI = Keys.get(url_key)
+    else:
+        SQLALCHEMY_DATABASE_URI = "mssql+pyodbc://%s" % Keys.get(con_str_key)
+
+    if not SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+        # SQLite connections are local and configured by Flask-SQLAlchemy.
+        # Connections are checked before use, since they may have been
+        # dropped while the museum was closed
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            "poolclass": TimedQueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
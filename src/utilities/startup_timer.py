@@ -0,0 +1,76 @@
+"""
+    Timing of the phases of application startup.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StartupTimer:
+    """
+        Records how long each phase of startup takes. A phase ends when
+        the next one is marked, so importing this module first and marking
+        "imports" after the other imports times the imports. Independent
+        warm-ups are run in parallel as one phase, each timed on its own.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        # list of (name, seconds)
+        self.phases = []
+
+    def mark(self, name):
+        """
+            Ends the current phase, which is recorded under the given name.
+        """
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def parallel(self, name, tasks):
+        """
+            Runs the tasks, a dict of names and functions, in parallel and
+            waits for them, which ends the current phase under the given
+            name. The time of each task is recorded as well. A failed task
+            is logged and doesn't stop the others, since the components it
+            warms up are also set up on first use.
+
+            Returns the names of the tasks which failed.
+        """
+        failed = []
+        task_seconds = []
+        with ThreadPoolExecutor(len(tasks)) as executor:
+            futures = dict(
+                (task_name, executor.submit(self._timed, task))
+                for task_name, task in tasks.items()
+            )
+            for task_name, future in futures.items():
+                try:
+                    task_seconds.append(
+                        (name + ": " + task_name, future.result()))
+                except Exception as e:
+                    logging.error("Warm-up %s failed: %s", task_name, e)
+                    failed.append(task_name)
+
+        self.mark(name)
+        self.phases.extend(task_seconds)
+        return failed
+
+    def _timed(self, task):
+        start = time.perf_counter()
+        task()
+        return time.perf_counter() - start
+
+    def report(self):
+        """
+            Returns the seconds spent in each phase and in total, and logs
+            them.
+        """
+        phases = dict(
+            (name, round(seconds, 3)) for name, seconds in self.phases)
+        total = round(self.last - self.start, 3)
+        for name, seconds in phases.items():
+            logging.info("Startup %s: %.3f s", name, seconds)
+        logging.info("Startup total: %.3f s", total)
+        return {"phases": phases, "total": total}
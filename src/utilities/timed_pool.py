@@ -0,0 +1,44 @@
+"""
+    Connection pool which measures how long checkouts take.
+"""
+import time
+from sqlalchemy.pool import QueuePool
+from utilities.histogram import Histogram
+
+
+class TimedQueuePool(QueuePool):
+    """
+        A QueuePool which records the seconds spent getting a connection,
+        waiting for one to be checked in or opening a new one, in a
+        histogram. The histogram is kept when the pool is recreated after
+        the database has dropped its connections.
+    """
+
+    def __init__(self, *args, waits=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = waits if waits is not None else Histogram()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.waits = self.waits
+        return pool
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            return super()._do_get()
+        finally:
+            self.waits.record(time.monotonic() - start)
+
+    def stats(self):
+        """
+            Returns the pool size, the open connections and those in use,
+            and the checkout times.
+        """
+        return {
+            "size": self.size(),
+            "open": self.checkedin() + self.checkedout(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "checkout_seconds": self.waits.snapshot(),
+        }
@@ -5,30 +5,56 @@
     root has been established, since it makes it easy to check if the
     application is live.
 """
-from flask_socketio import SocketIO, emit, send, join_room
+from utilities.startup_timer import StartupTimer
+# started first, so the imports below are timed
+startup = StartupTimer()
+from flask_socketio import SocketIO, emit, send, join_room, rooms
 from flask import request
 from flask import Flask
-from PIL import Image
+from flask import Response
+from flask import stream_with_context
 from PIL import ImageChops
-from io import BytesIO
 from datetime import datetime
 import logging
 from logging.handlers import RotatingFileHandler
 import os
+import csv
+import io
 import json
+import math
 import uuid
 import time
 import random
 
 from customvision.classifier import Classifier
+from customvision.resilient_predictor import ResilientPredictor
+from customvision.prediction_scheduler import PredictionScheduler
+from customvision.prediction_batcher import PredictionBatcher
+from customvision.prediction_batcher import pipelined
+from customvision.training_job import TrainingJobManager
 from utilities.difficulties import DifficultyId
 from utilities.languages import Language
 from webapp import models
 from webapp import storage
+from webapp import migrations
+from webapp.label_table import LabelTable
+from webapp.serialization import EventSerializer
+from webapp.stroke_buffer import StrokeBuffer
+from webapp.frame import Frame
+from webapp.game_janitor import GameJanitor
+from webapp.bucket_compactor import BucketCompactor
+from webapp.score_writer import ScoreWriter
+from webapp.score_archiver import ScoreArchiver
+from webapp import score_periods
+from webapp.leaderboard import Leaderboard
+from webapp.rank_index import RankIndex
+from webapp.standings_refresher import StandingsRefresher
 from utilities.exceptions import UserError
+from utilities.exceptions import PredictionUnavailable
 from utilities import setup
 from utilities.keys import Keys
 
+startup.mark("imports")
 # Initialize app
 app = Flask(__name__)
 logger = True
@@ -45,22 +71,145 @@ app.logger.addHandler(handler)
 
 if "IS_PRODUCTION" in os.environ:
     logger = True
+# "msgpack" requires all clients to use the socket.io msgpack parser
+if Keys.exists("SOCKETIO_SERIALIZER"):
+    serializer_name = Keys.get("SOCKETIO_SERIALIZER")
+else:
+    serializer_name = "default"
+app.logger.info("socket.io serializer is: " + serializer_name)
 if Keys.exists("CORS_ALLOWED_ORIGIN"):
     app.logger.info("cors is: " + Keys.get("CORS_ALLOWED_ORIGIN"))
     socketio = SocketIO(app, cors_allowed_origins=Keys.get(
-        "CORS_ALLOWED_ORIGIN"), logger=logger)
+        "CORS_ALLOWED_ORIGIN"), logger=logger, serializer=serializer_name)
 else:
     app.logger.info("cors is: " + "[*]")
-    socketio = SocketIO(app, cors_allowed_origins='*', logger=logger)
+    socketio = SocketIO(
+        app, cors_allowed_origins='*', logger=logger,
+        serializer=serializer_name)
+serializer = EventSerializer(socketio)
 app.config.from_object("utilities.setup.Flask_config")
 
 models.db.init_app(app)
+startup.mark("app")
+
+if setup.DEVELOPMENT:
+    migrations.setup_database(app)
+    startup.mark("database")
+
 
-models.create_tables(app)
-models.seed_labels(app, "./dict_eng_to_nor_difficulties_v2.csv")
+classifier = Classifier(app)
 
 
-classifier = Classifier()
+def create_trainer():
+    """
+        Imported here, so only workers running a training job load the
+        training client.
+    """
+    from customvision.trainer import Trainer
+
+    return Trainer(app, classifier.iteration)
+
+
+training_jobs = TrainingJobManager(create_trainer, socketio, app)
+janitor = GameJanitor(socketio, app)
+janitor.start()
+compactor = BucketCompactor(socketio, app)
+compactor.start()
+score_writer = ScoreWriter(socketio, app)
+score_writer.start()
+archiver = ScoreArchiver(socketio, app)
+archiver.start()
+# looks up the classifier on every call, so it can be replaced in tests
+predictor = ResilientPredictor(lambda: classifier)
+batcher = PredictionBatcher(pipelined(predictor.predict))
+scheduler = PredictionScheduler(batcher.predict)
+# certainty of the correct label in the last prediction of each player
+last_certainty = {}
+label_table = LabelTable()
+# players who asked for the compact prediction format in joinGame
+compact_clients = set()
+stroke_buffer = StrokeBuffer()
+leaderboard = Leaderboard()
+rank_index = RankIndex()
+standings = StandingsRefresher(
+    socketio, app, leaderboard, rank_index, score_writer)
+standings.start()
+startup.mark("components")
+
+
+def _in_app_context(function):
+    def run():
+        with app.app_context():
+            function()
+
+    return run
+
+
+# The components are also set up on first use, these calls only take the
+# network round trips out of the first games. The database connections
+# are opened before sockets are accepted, and a training job scheduled
+# before a restart is scheduled again.
+startup.parallel("warm-up", {
+    "database pool": lambda: models.warm_up_pool(app),
+    "labels": _in_app_context(label_table.load),
+    "training jobs": _in_app_context(training_jobs.resume),
+    "iteration": classifier.iteration.refresh,
+})
+startup_report = startup.report()
+if classifier.iteration.get() is None:
+    logging.error(
+        "No iteration to predict with, drawings are not classified until "
+        "a model is trained or 'python -m customvision.trainer sync' is run")
+classifier.iteration.start(socketio)
+
+
+@app.route("/metrics")
+def metrics():
+    """
+        Returns prediction latencies and outcomes per iteration, image
+        deduplication counters, database statement, commit and connection
+        counts, the use of the connection pool, and the time spent in each
+        phase of startup.
+    """
+    return {
+        "predictions": predictor.metrics(),
+        "scheduler": scheduler.metrics(),
+        "batch_sizes": batcher.metrics(),
+        "image_dedup": storage.dedup_stats(),
+        "database": models.database_stats(),
+        "pool": models.pool_stats(),
+        "startup": startup_report,
+    }
+
+
+@app.route("/scores/export")
+def export_scores():
+    """
+        Streams all scores, archived ones included, as CSV. Requires the
+        username and password of an administrator, with basic auth.
+    """
+    auth = request.authorization
+    if auth is None or not models.check_admin(auth.username, auth.password):
+        return Response(
+            "Administrator login required", 401,
+            {"WWW-Authenticate": 'Basic realm="scores"'})
+
+    def generate():
+        lines = io.StringIO()
+        writer = csv.writer(lines)
+        writer.writerow(
+            ["score_id", "player_id", "score", "date", "difficulty_id"])
+        for i, row in enumerate(models.export_scores(), 1):
+            writer.writerow(row)
+            if i % setup.EXPORT_BATCH_SIZE == 0:
+                yield lines.getvalue()
+                lines.seek(0)
+                lines.truncate()
+        yield lines.getvalue()
+
+    return Response(
+        stream_with_context(generate()), mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=scores.csv"})
 
 
 @socketio.on("connect")
@@ -76,16 +225,26 @@ def disconnect():
         database connected to the session.
     """
     player_id = request.sid
-    player = models.get_player(player_id)
-    game = models.get_game(player.game_id)
+    last_certainty.pop(player_id, None)
+    compact_clients.discard(player_id)
+    serializer.forget(player_id)
+    stroke_buffer.clear(player_id)
     data = {"player_disconnected": True}
-    models.update_game_for_player(game.game_id, player_id, 0, "Disconnected")
-    opponent = models.get_opponent(game.game_id, player_id)
-    if opponent is None or opponent.state == "Disconnected":
-        emit("playerDisconnected", json.dumps(data), room=player_id)
-        models.delete_session_from_game(game.game_id)
+    # scores refer to the player, which may be deleted below
+    score_writer.flush()
+    with models.unit_of_work():
+        player = models.get_player(player_id)
+        game_id = models.get_game(player.game_id).game_id
+        models.update_game_for_player(game_id, player_id, 0, "Disconnected")
+        opponent = models.get_opponent(game_id, player_id)
+        alone = opponent is None or opponent.state == "Disconnected"
+        if alone:
+            models.delete_session_from_game(game_id)
+
+    if alone:
+        serializer.emit("playerDisconnected", data, room=player_id)
     else:
-        emit("playerDisconnected", json.dumps(data), room=game.game_id)
+        serializer.emit("playerDisconnected", data, room=game_id)
     app.logger.info("=== client " + request.sid + " disconnected ===")
 
 
@@ -108,9 +267,12 @@ def handle_joinGame(json_data):
         * If check is false create new mulitplayer game.
         * If check is true insert player where player2 is none and start
           the game.
+        Clients sending "format": "compact" get predictions in the compact
+        format, and receive the label table once in a "labelTable" event.
     """
 
-    data = json.loads(json_data or 'null')
+    data = serializer.decode(json_data, request.sid)
+    compact = isinstance(data, dict) and data.get("format") == "compact"
     try:
         difficulty_id = data["difficulty_id"]
         pair_id = data["pair_id"]
@@ -121,26 +283,27 @@ def handle_joinGame(json_data):
     player_id = request.sid
     #  Players join their own room as well
     join_room(player_id)
-    game_id = models.check_player_2_in_mulitplayer(player_id, pair_id)
+    with models.unit_of_work():
+        game_id = models.check_player_2_in_mulitplayer(player_id, pair_id)
 
-    if game_id is not None:
-        # Update mulitplayer table by inserting player_id for player_2 and
-        # change state of palyer_1 in PIG to "Ready"
-        models.update_mulitplayer(player_id, game_id)
-        models.insert_into_players(player_id, game_id, "Ready")
-        player_nr = "player_2"
-        is_ready = True
+        if game_id is not None:
+            # Update mulitplayer table by inserting player_id for player_2
+            # and change state of palyer_1 in PIG to "Ready"
+            models.update_mulitplayer(player_id, game_id)
+            models.insert_into_players(player_id, game_id, "Ready")
+            player_nr = "player_2"
+            is_ready = True
 
-    else:
-        game_id = uuid.uuid4().hex
-        labels = models.get_n_labels(setup.NUM_GAMES, difficulty_id)
-        today = datetime.today()
-        models.insert_into_games(
-            game_id, json.dumps(labels), today, difficulty_id)
-        models.insert_into_players(player_id, game_id, "Waiting")
-        models.insert_into_mulitplayer(game_id, player_id, pair_id)
-        player_nr = "player_1"
-        is_ready = False
+        else:
+            game_id = uuid.uuid4().hex
+            labels = models.get_n_labels(setup.NUM_GAMES, difficulty_id)
+            today = datetime.today()
+            models.insert_into_games(
+                game_id, json.dumps(labels), today, difficulty_id)
+            models.insert_into_players(player_id, game_id, "Waiting")
+            models.insert_into_mulitplayer(game_id, player_id, pair_id)
+            player_nr = "player_1"
+            is_ready = False
 
     data = {"player_nr": player_nr, "player_id": player_id, "game_id": game_id}
     state_data = {"ready": is_ready}
@@ -151,6 +314,10 @@ def handle_joinGame(json_data):
     # triggers the event
     emit("joinGame", state_data, room=game_id)
 
+    if compact:
+        compact_clients.add(player_id)
+        emit("labelTable", label_table.table(), sid=player_id)
+
 
 @socketio.on("getLabel")
 def handle_getLabel(json_data):
@@ -158,52 +325,108 @@ def handle_getLabel(json_data):
         Event for providing both players with a new label.
     """
     player_id = request.sid
-    data = json.loads(json_data)
+    data = serializer.decode(json_data, request.sid)
     game_id = data["game_id"]
 
-    opponent = models.get_opponent(game_id, player_id)
-    models.update_game_for_player(game_id, player_id, 0, "Ready")
-    models.update_game_for_player(game_id, opponent.player_id, 0, "Ready")
+    with models.unit_of_work():
+        opponent = models.get_opponent(game_id, player_id)
+        models.update_game_for_player(game_id, player_id, 0, "Ready")
+        models.update_game_for_player(
+            game_id, opponent.player_id, 0, "Ready")
+        label = get_label(game_id)
 
-    label = get_label(game_id)
     app.logger.info("returned label: " + json.dumps(label))
-    emit("getLabel", json.dumps(label), room=game_id)
+    serializer.emit("getLabel", label, room=game_id)
 
 
 @socketio.on("postScore")
 def handle_postScore(json_data):
-    data = json.loads(json_data)
+    data = serializer.decode(json_data, request.sid)
     app.logger.info(data)
     player_id = data.get("player_id")
-    score = float(data.get("score"))
-    difficulty_id = int(data.get("difficulty_id"))
-    assert isinstance(difficulty_id, int)
+    try:
+        score = float(data.get("score"))
+        difficulty_id = int(data.get("difficulty_id"))
+    except (TypeError, ValueError):
+        raise UserError("score and difficulty_id are required")
 
     today = datetime.today()
-    models.insert_into_scores(player_id, score, today, difficulty_id)
+    # checked before anything is changed, so a bad score never reaches
+    # the leaderboards
+    models.check_score(player_id, score, today, difficulty_id)
+    # the leaderboards show the score right away, and the entry gets its
+    # id once the batch with the score is stored
+    entry = leaderboard.record(score, difficulty_id)
+    rank_index.add(score, difficulty_id)
+    score_writer.add(player_id, score, today, difficulty_id, entry)
 
 
 @socketio.on("viewHighScore")
 def view_high_score(json_data):
     """
-        Read highscore from database. Return top n of all time and daily high
-        scores.
+        Return top n of all time and daily high scores, from the in-memory
+        leaderboard.
     """
     difficulty_id = DifficultyId.Multiplayer
-    data = json.loads(json_data)
+    data = serializer.decode(json_data, request.sid)
     game_id = data["game_id"]
-    # read top n overall high score
-    top_n_high_scores = models.get_top_n_high_score_list(
-        setup.TOP_N, difficulty_id=difficulty_id)
-    # read daily high score
-    daily_high_scores = models.get_daily_high_score(
-        difficulty_id=difficulty_id)
+    data = leaderboard.top(difficulty_id)
+
+    serializer.emit("viewHighScore", data, room=game_id)
+
+
+@socketio.on("viewPeriodHighScore")
+def view_period_high_score(json_data):
+    """
+        Return the top n scores of a week, month or exhibition period.
+        params: {"game_id": str,
+                 "period": "week", "month" or "exhibition",
+                 "date": optional ISO date in the period, today by default,
+                 "difficulty_id": optional int, multiplayer by default}
+    """
+    data = serializer.decode(json_data, request.sid)
+    game_id = data["game_id"]
+    period = data.get("period")
+    difficulty_id = data.get("difficulty_id", DifficultyId.Multiplayer)
+    date = datetime.today().date()
+    try:
+        if "date" in data:
+            date = datetime.fromisoformat(data["date"]).date()
+    except (TypeError, ValueError):
+        raise UserError("date must be an ISO date")
+
+    start = score_periods.period_start(period, date)
+    scores = []
+    if start is not None:
+        scores = models.get_period_high_scores(
+            period, start, difficulty_id, setup.TOP_N)
     data = {
-        "daily": daily_high_scores,
-        "total": top_n_high_scores,
+        "period": period,
+        "start": None if start is None else start.isoformat(),
+        "scores": scores,
     }
 
-    emit("viewHighScore", json.dumps(data), room=game_id)
+    serializer.emit("viewPeriodHighScore", data, room=game_id)
+
+
+@socketio.on("getRank")
+def handle_getRank(json_data):
+    """
+        Returns the all time and daily rank of a score among the scores of
+        a difficulty, e.g. to show a player "you placed #347 today".
+        params: {"score": float, "difficulty_id": int}
+    """
+    data = serializer.decode(json_data, request.sid)
+    try:
+        score = float(data["score"])
+        difficulty_id = int(data["difficulty_id"])
+    except (KeyError, TypeError, ValueError):
+        raise UserError("score and difficulty_id are required")
+    if not math.isfinite(score):
+        raise UserError("score has to be a number")
+
+    rank = rank_index.rank(score, difficulty_id)
+    serializer.emit("getRank", rank, room=request.sid)
 
 
 @socketio.on("getExampleDrawings")
@@ -211,7 +434,7 @@ def get_example_drawings(json_data, emitEndpoint="getExampleDrawings"):
     """
         Get example drawings from the database
     """
-    data = json.loads(json_data)
+    data = serializer.decode(json_data, request.sid)
     game_id = data["game_id"]
     number_of_images = data["number_of_images"]
 
@@ -224,7 +447,7 @@ def get_example_drawings(json_data, emitEndpoint="getExampleDrawings"):
         label, number_of_images)
     example_drawings = storage.get_images_from_relative_url(
         example_drawing_urls)
-    emit(emitEndpoint, json.dumps(example_drawings), room=game_id)
+    serializer.emit(emitEndpoint, example_drawings, room=game_id)
 
 
 @socketio.on("getExampleDrawingsP1")
@@ -242,12 +465,21 @@ def handle_classify(data, image, correct_label=None):
     """
         WS event for accepting images for classification
         params: data: {"game_id": str: the game_id you get from joinGame,
-                       "time_left": float: the time left until the game is over}
+                       "time_left": float: the time left until the game is over,
+                       "encoding": optional str: "png" (default), "bitmap", "rle" or "webp",
+                       "width", "height": int: image size, required by "bitmap" and "rle"}
                image: binary string with the image data
+        The image is wrapped in a Frame once and shared, without copies,
+        by validation, prediction and storage.
     """
-    image_stream = BytesIO(image)
+    frame = Frame.decode(
+        image,
+        data.get("encoding", setup.IMAGE_ENCODING_PNG),
+        data.get("width"),
+        data.get("height"),
+    )
 
-    allowed_file(image_stream)
+    allowed_file(frame)
 
     player_id = request.sid
     game_id = data["game_id"]
@@ -260,8 +492,7 @@ def handle_classify(data, image, correct_label=None):
         correct_label = labels[game.session_num - 1]
 
     # Check if the image hasn't been drawn on
-    bytes_img = Image.open(image_stream).convert('RGB')
-    if white_image(bytes_img):
+    if white_image(frame.rgb):
         response = white_image_data(
             correct_label, time_left, game_id, player_id
         )
@@ -269,16 +500,35 @@ def handle_classify(data, image, correct_label=None):
             emit("prediction", response)
             return
 
-    image_stream.seek(0)
-    certainty, best_guess = classifier.predict_image_by_post(image_stream)
-    best_certainty = certainty[best_guess]
-
     time_out = (time_left <= 0)
 
+    if time_out:
+        priority = setup.PRIORITY_FINAL
+    elif last_certainty.get(player_id, 0) >= setup.NEAR_WIN_CERTAINTY:
+        priority = setup.PRIORITY_NEAR_WIN
+    else:
+        priority = setup.PRIORITY_ROUTINE
+
+    # no connection is held while waiting for the prediction
+    models.release_connection()
+    try:
+        certainty, best_guess = scheduler.predict(
+            frame.data, priority, time_left)
+        best_certainty = certainty[best_guess]
+        last_certainty[player_id] = certainty.get(correct_label, 0)
+    except PredictionUnavailable as e:
+        app.logger.warning(e)
+        if not time_out:
+            emit("prediction", thinking_data(correct_label))
+            return
+        # the round is over anyway, only the image isn't saved
+        best_certainty = 0
+
     if time_out:
         # to break race condition if both players timeout
         time.sleep(0.5 * random.random())
-        storage.save_image(image, correct_label, best_certainty)
+        storage.save_image(
+            frame.data, correct_label, best_certainty, frame.rgb)
         player = models.get_player(player_id)
         opponent = models.get_opponent(game_id, player_id)
         if opponent.state == "Done":
@@ -293,12 +543,16 @@ def handle_classify(data, image, correct_label=None):
 
     has_won = (correct_label == best_guess) and (time_left > 0)
 
-    if lang == Language.Norwegian:
+    if player_id in compact_clients:
+        response = label_table.compact_prediction(
+            certainty, best_guess, correct_label, has_won)
+
+    elif lang == Language.Norwegian:
 
         response = {
-            "certainty": translate_probabilities(certainty),
-            "guess": models.to_norwegian(best_guess),
-            "correctLabel": models.to_norwegian(correct_label),
+            "certainty": label_table.translate_probabilities(certainty),
+            "guess": label_table.to_norwegian(best_guess),
+            "correctLabel": label_table.to_norwegian(correct_label),
             "hasWon": has_won,
         }
 
@@ -313,7 +567,8 @@ def handle_classify(data, image, correct_label=None):
     emit("prediction", response)
 
     if has_won:
-        storage.save_image(image, correct_label, best_certainty)
+        storage.save_image(
+            frame.data, correct_label, best_certainty, frame.rgb)
         player = models.get_player(player_id)
         opponent = models.get_opponent(game_id, player_id)
         if opponent.state == "Done":
@@ -326,6 +581,39 @@ def handle_classify(data, image, correct_label=None):
             models.update_game_for_player(game_id, player_id, 0, "Done")
 
 
+@socketio.on("strokes")
+def handle_strokes(data):
+    """
+        WS event for the stroke-delta protocol, where clients send the
+        points drawn since their last message instead of the whole image.
+        params: data: {"game_id": str, "round": int: the round number,
+                       "strokes": [{"id": int, "points": [x0, y0, ...]}]}
+        Coordinates are pixels on a setup.STROKE_CANVAS_SIZE canvas. The
+        round is required, since a new round starts a new drawing.
+    """
+    try:
+        game_id = data["game_id"]
+        round_num = int(data["round"])
+        strokes = data["strokes"]
+    except (KeyError, TypeError, ValueError):
+        raise UserError("game_id, round and strokes are required")
+
+    stroke_buffer.add(request.sid, game_id, round_num, strokes)
+
+
+@socketio.on("classifyStrokes")
+def handle_classifyStrokes(data, correct_label=None):
+    """
+        WS event for classifying the drawing built from "strokes" events.
+        Takes the same data as "classify", and optionally the last
+        "round" and "strokes" not sent yet.
+    """
+    if "strokes" in data:
+        handle_strokes(data)
+    image = stroke_buffer.rasterize(request.sid, data["game_id"])
+    handle_classify(data, image, correct_label)
+
+
 @socketio.on("endGame")
 def handle_endGame(json_data):
     """
@@ -333,7 +621,7 @@ def handle_endGame(json_data):
         their scores and the player with the highest score is deemed the winner.
         The two scores are finally stored in the database.
     """
-    data = json.loads(json_data)
+    data = serializer.decode(json_data, request.sid)
     # Get data from given player
     game_id = data["game_id"]
     score_player = data["score"]
@@ -346,8 +634,60 @@ def handle_endGame(json_data):
     return_data = {"score": score_player, "playerId": player_id}
     # Retrieve the opponent (client) to pass on the score to
     opponent = models.get_opponent(game_id, player_id)
-    emit("endGame", json.dumps(return_data), room=opponent.player_id)
-    models.delete_old_games()
+    serializer.emit("endGame", return_data, room=opponent.player_id)
+
+
+@socketio.on("joinAdmin")
+def handle_joinAdmin(json_data):
+    """
+        Event for administrators. Joins the admin room, where the progress
+        of training jobs is reported.
+    """
+    data = serializer.decode(json_data, request.sid)
+    if not models.check_admin(data.get("username"), data.get("password")):
+        raise UserError("Invalid username or password")
+
+    join_room(setup.ADMIN_ROOM)
+    emit("joinAdmin", serializer.encode({"admin": True}, request.sid))
+
+
+@socketio.on("startTraining")
+def handle_startTraining(json_data):
+    """
+        Starts a background training job. Labels default to all labels,
+        and an optional ISO formatted "start_at" schedules the job.
+    """
+    require_admin()
+    data = serializer.decode(json_data, request.sid) or {}
+    labels = data.get("labels") or models.get_all_labels()
+    start_at = data.get("start_at")
+    if start_at is not None:
+        try:
+            start_at = datetime.fromisoformat(start_at)
+        except (TypeError, ValueError):
+            raise UserError("start_at has to be an ISO formatted time")
+
+    job_id = training_jobs.start(labels, start_at)
+    emit("startTraining", serializer.encode({"job_id": job_id}, request.sid))
+
+
+@socketio.on("getTrainingJob")
+def handle_getTrainingJob(json_data):
+    """
+        Returns the stored state of a training job.
+    """
+    require_admin()
+    data = serializer.decode(json_data, request.sid)
+    job = models.get_training_job(data["job_id"])
+    job_data = {
+        "job_id": job.job_id,
+        "state": job.state,
+        "start_at": job.start_at.isoformat(),
+        "updated": job.updated.isoformat(),
+        "iteration_name": job.iteration_name,
+        "message": job.message,
+    }
+    emit("getTrainingJob", serializer.encode(job_data, request.sid))
 
 
 @socketio.on_error()
@@ -363,6 +703,14 @@ def error_handler(error):
         emit("error", str(error))
 
 
+def require_admin():
+    """
+        Raises UserError if the client hasn't joined the admin room.
+    """
+    if setup.ADMIN_ROOM not in rooms():
+        raise UserError("Only administrators can do this")
+
+
 def get_label(game_id) -> dict[str, str]:
     """
         Provides the client with a new word in both languages.
@@ -375,43 +723,26 @@ def get_label(game_id) -> dict[str, str]:
 
     labels = json.loads(game.labels)
     label: str = labels[game.session_num - 1]
-    norwegian_label = models.to_norwegian(label)
+    norwegian_label = label_table.to_norwegian(label)
     data = {"label": label, "norwegian_label": norwegian_label}
     return data
 
 
-def translate_probabilities(labels):
+def allowed_file(frame):
     """
-        translate the labels in a probability dictionary to norwegian
-    """
-    translation_dict = models.get_translation_dict()
-    return dict(
-        [(translation_dict[label], prob) for label, prob in labels.items()]
-    )
-
-
-def allowed_file(image):
-    """
-        Check if image satisfies the constraints of Custom Vision.
+        Check if image satisfies the constraints of Custom Vision. Compact
+        encodings have been decoded to png, so the limits apply to the
+        decoded image.
     """
     # Ensure the file isn't too large
-    too_large = len(image.read()) > setup.MAX_IMAGE_SIZE
+    too_large = frame.size > setup.MAX_IMAGE_SIZE
     # Ensure the file has correct resolution
-    image.seek(0)
-    pimg = Image.open(image)
-    height, width = pimg.size
+    height, width = frame.image.size
     correct_res = (height >= setup.MIN_RESOLUTION) and (
         width >= setup.MIN_RESOLUTION
     )
 
-    if str(type(pimg)) == "JpegImageFile":
-        is_png = pimg.format == "PNG"
-    else:
-        is_png = pimg
-
-    image.seek(0)
-
-    if not is_png or too_large or not correct_res:
+    if too_large or not correct_res:
         raise UserError("Wrong image format")
 
 
@@ -425,6 +756,21 @@ def white_image(image):
         return False
 
 
+def thinking_data(label):
+    """
+        Generate the json data to be returned to the client when no
+        prediction could be made in time.
+    """
+    data = {
+        "certainty": {},
+        "guess": setup.THINKING_GUESS,
+        "correctLabel": label,
+        "hasWon": False,
+        "gameState": "Playing",
+    }
+    return data
+
+
 def white_image_data(label, time_left, game_id, player_id):
     """
         Generate the json data to be returned to the client when a completely
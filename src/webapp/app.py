@@ -1,7 +1,13 @@
 """
     This file mainly serves as an entry point for the application and should
-    not contain anything else than the main idiom provided below.
+    not contain anything else than the main idiom provided below. The
+    standard library is patched first, so waiting on locks, timers and
+    futures in the prediction pipeline yields to the other greenlets
+    instead of blocking the eventlet hub.
 """
+import eventlet
+eventlet.monkey_patch()
+
 from webapp.api import socketio, app
 
 
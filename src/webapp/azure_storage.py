@@ -0,0 +1,95 @@
+"""
+    Storage backend for Azure blob storage.
+"""
+import logging
+import time
+from threading import Thread
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import BlobServiceClient
+from utilities.keys import Keys
+from utilities import setup
+from webapp.storage_backend import StorageBackend
+
+
+class AzureStorage(StorageBackend):
+    """
+        Stores images as blobs in an Azure blob storage container. The
+        number of images is kept in the "image_count" container metadata.
+    """
+
+    def __init__(self, container_name):
+        super().__init__(container_name)
+        self.base_url = Keys.get("BASE_BLOB_URL")
+        connect_str = Keys.get("BLOB_CONNECTION_STRING")
+        try:
+            # Instantiate a BlobServiceClient using a connection string
+            blob_service_client = BlobServiceClient.from_connection_string(
+                connect_str
+            )
+            # Instantiate a ContainerClient
+            self.container_client = blob_service_client.get_container_client(
+                container_name
+            )
+        except Exception as e:
+            raise Exception("Could not connect to blob client: " + str(e))
+
+    def save(self, name, data):
+        blob_client = self.container_client.get_blob_client(name)
+        try:
+            blob_client.upload_blob(data)
+        except ResourceExistsError:
+            raise FileExistsError(name)
+
+        # update metadata in blob
+        image_count = self.count()
+        metadata = {"image_count": str(image_count + 1)}
+        self.container_client.set_container_metadata(metadata=metadata)
+        return self.url(name)
+
+    def fetch(self, name):
+        blob_client = self.container_client.get_blob_client(name)
+        return blob_client.download_blob().readall()
+
+    def list(self, prefix=""):
+        blobs = self.container_client.list_blobs(name_starts_with=prefix)
+        return [blob.name for blob in blobs]
+
+    def count(self):
+        properties = self.container_client.get_container_properties()
+        return int(properties.metadata["image_count"])
+
+    def reset(self):
+        """
+            Deletes the container and creates it again in a background
+            thread.
+            NOTE: container is deleted by garbage collection, which does not
+            happen instantly. A new blob cannot be initalized before old is
+            collected.
+        """
+        try:
+            self.container_client.delete_container()
+        except Exception as e:
+            raise Exception("could not delete container" + str(e))
+        Thread(target=self.create_container).start()
+
+    def create_container(self):
+        """
+            Method for creating a new container. Tries to create a new
+            container n times, to make sure Azure garbage collection is
+            finished.
+        """
+        tries = setup.CREATE_CONTAINER_TRIES
+        waiting_time = setup.CREATE_CONTAINER_WAITER
+        metadata = {"image_count": "0"}
+        for i in range(tries):
+            time.sleep(waiting_time)
+            try:
+                self.container_client.create_container(
+                    metadata=metadata, public_access="container"
+                )
+                return
+            except Exception as e:
+                logging.error(e)
+
+    def url(self, name):
+        return self.base_url + "/" + self.container_name + "/" + name
@@ -0,0 +1,30 @@
+"""
+    Scheduled compaction of the period leaderboards.
+"""
+from utilities import setup
+from webapp import models
+from webapp.periodic_task import PeriodicTask
+
+
+class BucketCompactor(PeriodicTask):
+    """
+        Trims every period leaderboard bucket to its top scores in the
+        background. Scores are added to the buckets as they are posted, so
+        between compactions a bucket holds at most the top scores plus the
+        scores posted since the last compaction.
+    """
+
+    name = "Leaderboard compaction"
+    done_message = "Compacted %d leaderboard bucket scores"
+
+    def __init__(self, socketio, app,
+                 interval=setup.BUCKET_COMPACTION_INTERVAL,
+                 top_n=setup.TOP_N):
+        super().__init__(socketio, app, interval)
+        self.top_n = top_n
+
+    def run_once(self):
+        """
+            Trims all buckets. Returns the number of scores removed.
+        """
+        return models.compact_leaderboard_buckets(self.top_n)
@@ -0,0 +1,68 @@
+"""
+    Container for an image sent for classification.
+"""
+from io import BytesIO
+from PIL import Image
+from utilities import setup
+from utilities.exceptions import UserError
+from webapp import image_decoding
+
+
+class Frame:
+    """
+        A drawing received for classification. The encoded image is kept as
+        one immutable bytes object, which is handed unchanged to prediction
+        and storage, and the image is decoded at most once and shared by
+        all checks.
+    """
+
+    def __init__(self, data):
+        # bytes are shared without copying, other buffers are copied once
+        self.data = data if isinstance(data, bytes) else bytes(data)
+        self.size = len(self.data)
+        self._image = None
+        self._rgb = None
+
+    @classmethod
+    def decode(cls, data, encoding=setup.IMAGE_ENCODING_PNG, width=None,
+               height=None):
+        """
+            Creates a frame from an image in any accepted encoding. Compact
+            encodings are decoded and normalized to png, the format sent to
+            Custom Vision and storage, so limits on the frame apply to the
+            decoded image.
+        """
+        if encoding == setup.IMAGE_ENCODING_PNG:
+            return cls(data)
+
+        image = image_decoding.decode(data, encoding, width, height)
+        stream = BytesIO()
+        image.save(
+            stream, format="PNG", compress_level=setup.PNG_COMPRESS_LEVEL)
+        frame = cls(stream.getvalue())
+        frame._image = image
+        return frame
+
+    @property
+    def image(self):
+        """
+            The opened image. Only the header is read until pixels are
+            needed.
+        """
+        if self._image is None:
+            try:
+                self._image = Image.open(BytesIO(self.data))
+            except (OSError, ValueError, Image.DecompressionBombError):
+                raise UserError("Wrong image format")
+
+        return self._image
+
+    @property
+    def rgb(self):
+        """
+            The decoded image converted to RGB.
+        """
+        if self._rgb is None:
+            self._rgb = self.image.convert("RGB")
+
+        return self._rgb
@@ -0,0 +1,39 @@
+"""
+    Scheduled cleanup of finished games.
+"""
+import datetime
+from utilities import setup
+from webapp import models
+from webapp.periodic_task import PeriodicTask
+
+
+class GameJanitor(PeriodicTask):
+    """
+        Deletes expired games, players and pairings in the background, so
+        no event handler pays for the cleanup. Games are deleted in bounded
+        batches, each in its own transaction, to keep locks short.
+    """
+
+    name = "Game cleanup"
+    done_message = "Deleted %d expired games"
+
+    def __init__(self, socketio, app, interval=setup.JANITOR_INTERVAL,
+                 batch_size=setup.JANITOR_BATCH_SIZE):
+        super().__init__(socketio, app, interval)
+        self.batch_size = batch_size
+
+    def run_once(self):
+        """
+            Deletes all games which have expired. Returns the number of
+            games deleted.
+        """
+        cutoff = datetime.datetime.today() - datetime.timedelta(
+            days=setup.GAME_EXPIRATION_DAYS)
+        deleted = 0
+        while True:
+            count = models.delete_old_games(cutoff, self.batch_size)
+            deleted += count
+            if count < self.batch_size:
+                return deleted
+            # let other tasks run between batches
+            self.socketio.sleep(0)
@@ -0,0 +1,118 @@
+"""
+    Decoders for the compact image encodings accepted by the classify event.
+    Compact encodings carry black on white sketches in a fraction of the
+    size of a png.
+"""
+from io import BytesIO
+from PIL import Image
+from utilities import setup
+from utilities.exceptions import UserError
+
+WHITE = b"\xff"
+BLACK = b"\x00"
+
+
+def decode(data, encoding, width=None, height=None):
+    """
+        Decodes an image in a compact encoding to a PIL image.
+
+        Parameters:
+        encoding: "bitmap", "rle" or "webp"
+        width, height: size of the image, required by "bitmap" and "rle"
+    """
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        raise UserError("Image data must be binary")
+
+    if encoding == setup.IMAGE_ENCODING_WEBP:
+        return decode_webp(data)
+
+    size = check_size(width, height)
+    if encoding == setup.IMAGE_ENCODING_BITMAP:
+        return decode_bitmap(data, size)
+    if encoding == setup.IMAGE_ENCODING_RLE:
+        return decode_rle(data, size)
+
+    raise UserError("Unknown image encoding")
+
+
+def check_size(width, height):
+    """
+        Validates a declared image size before any pixels are allocated.
+    """
+    try:
+        size = (int(width), int(height))
+    except (TypeError, ValueError):
+        raise UserError("Image size is missing")
+
+    if not all(0 < side <= setup.MAX_RESOLUTION for side in size):
+        raise UserError("Wrong image format")
+
+    return size
+
+
+def decode_bitmap(data, size):
+    """
+        Decodes a 1 bit per pixel bitmap. Rows start on a byte boundary,
+        the most significant bit comes first, and a set bit is ink.
+    """
+    width, height = size
+    if len(data) != (width + 7) // 8 * height:
+        raise UserError("Bitmap does not match image size")
+
+    # "1;I" is the inverted raw mode, where set bits are black
+    return Image.frombytes("1", size, bytes(data), "raw", "1;I")
+
+
+def decode_rle(data, size):
+    """
+        Decodes a run-length encoded image. The pixels in row order are
+        given as lengths of alternating white and black runs, starting
+        with white, where each length is an unsigned LEB128 varint.
+    """
+    width, height = size
+    total = width * height
+    runs = []
+    pixels = 0
+    run = 0
+    shift = 0
+    for byte in bytes(data):
+        run |= (byte & 0x7F) << shift
+        # checked per byte, so a long varint can't make the decoding work
+        # on ever bigger integers
+        if run > total - pixels:
+            raise UserError("Run lengths exceed image size")
+        if byte & 0x80:
+            shift += 7
+            if shift > setup.RLE_MAX_VARINT_SHIFT:
+                raise UserError("Run length is too long")
+            continue
+
+        pixels += run
+        runs.append((BLACK if len(runs) % 2 else WHITE) * run)
+        run = 0
+        shift = 0
+
+    if shift != 0 or pixels != total:
+        raise UserError("Run lengths do not match image size")
+
+    return Image.frombytes("L", size, b"".join(runs))
+
+
+def decode_webp(data):
+    """
+        Decodes a WebP image, checking its size before the pixels are
+        decoded. Transparent pixels become white.
+    """
+    try:
+        image = Image.open(BytesIO(data), formats=["WEBP"])
+        check_size(*image.size)
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise UserError("Wrong image format")
+
+    if image.mode not in ("RGBA", "LA"):
+        return image
+
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
@@ -0,0 +1,139 @@
+"""
+    Persistent index of content hashes for drawings saved as training data.
+"""
+import hashlib
+import os
+import threading
+from io import BytesIO
+from PIL import Image
+from PIL import ImageChops
+from utilities import setup
+
+
+class ImageIndex:
+    """
+        Set of content hashes backed by an append-only file of fixed-size
+        records. Appends of a single record are atomic, so several workers
+        can share the same file, and new records written by other workers
+        are picked up before every lookup.
+    """
+
+    def __init__(self, path, digest_size=setup.IMAGE_HASH_BYTES):
+        self.path = path
+        self.digest_size = digest_size
+        self.hashes = set()
+        # digests of images being uploaded by this process
+        self.reserved = set()
+        self.offset = 0
+        self.seen = 0
+        self.duplicates = 0
+        self.lock = threading.Lock()
+
+    def digest(self, image, label, decoded=None):
+        """
+            Returns the content hash of an image. The image is normalized
+            to grayscale and cropped to the drawn area, so the same drawing
+            hashes equally regardless of encoding or surrounding whitespace.
+            An already decoded PIL image can be passed to skip decoding.
+        """
+        if decoded is None:
+            decoded = Image.open(BytesIO(image))
+        pimg = decoded.convert("L")
+        bbox = ImageChops.invert(pimg).getbbox()
+        if bbox is not None:
+            pimg = pimg.crop(bbox)
+
+        content = hashlib.blake2b(digest_size=self.digest_size)
+        content.update(label.encode("utf-8"))
+        content.update(str(pimg.size).encode("utf-8"))
+        content.update(pimg.tobytes())
+        return content.digest()
+
+    def add(self, digest):
+        """
+            Reserves the digest while the image is uploaded. Returns False
+            if the digest is already present or reserved, i.e. the image is
+            a duplicate. The digest is written to the file by commit once
+            the upload succeeded, or released by discard if it failed.
+        """
+        with self.lock:
+            self._refresh()
+            self.seen += 1
+            if digest in self.hashes or digest in self.reserved:
+                self.duplicates += 1
+                return False
+
+            self.reserved.add(digest)
+            return True
+
+    def commit(self, digest):
+        """
+            Records a reserved digest in the file, shared with the other
+            workers and kept across restarts.
+        """
+        with self.lock:
+            self.reserved.discard(digest)
+            with open(self.path, "ab") as index_file:
+                index_file.write(digest)
+            self.hashes.add(digest)
+            # the record is read again by the next refresh, which is
+            # harmless since the hashes are a set
+
+    def discard(self, digest):
+        """
+            Releases a reserved digest, used when the upload of the image
+            failed, so the drawing can be saved again.
+        """
+        with self.lock:
+            self.reserved.discard(digest)
+
+    def clear(self):
+        """
+            Empties the index, e.g. when the image container is reset.
+        """
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.hashes = set()
+            self.offset = 0
+
+    def dedup_ratio(self):
+        """
+            Returns the share of added images which were duplicates.
+        """
+        if self.seen == 0:
+            return 0.0
+
+        return self.duplicates / self.seen
+
+    def stats(self):
+        """
+            Returns counters describing the index.
+        """
+        return {
+            "indexed": len(self.hashes),
+            "seen": self.seen,
+            "duplicates": self.duplicates,
+            "dedup_ratio": self.dedup_ratio(),
+        }
+
+    def _refresh(self):
+        """
+            Reads records appended to the file since the last read. A partly
+            written record at the end of the file is left for the next read.
+        """
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < self.offset:
+            # the index was cleared by another worker
+            self.hashes = set()
+            self.offset = 0
+        if size == self.offset:
+            return
+
+        with open(self.path, "rb") as index_file:
+            index_file.seek(self.offset)
+            data = index_file.read()
+        complete = len(data) - len(data) % self.digest_size
+        for i in range(0, complete, self.digest_size):
+            self.hashes.add(data[i: i + self.digest_size])
+        self.offset += complete
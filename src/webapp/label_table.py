@@ -0,0 +1,90 @@
+"""
+    In-memory table of labels, used for translations and the compact
+    prediction format.
+"""
+import threading
+from utilities import setup
+from webapp import models
+
+
+class LabelTable:
+    """
+        All labels with their norwegian translation and a numeric id. Ids
+        are positions in the alphabetical list of english labels, so every
+        worker assigns the same ids. The table is read from the database
+        on first use, which must happen inside an app context.
+    """
+
+    def __init__(self):
+        self.english = None
+        self.norwegian = None
+        self.ids = None
+        self.translations = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+            Reads the labels from the database, unless already done.
+        """
+        if self.english is not None:
+            return
+
+        with self.lock:
+            if self.english is not None:
+                return
+
+            translations = models.get_translation_dict()
+            english = sorted(translations)
+            self.norwegian = [translations[label] for label in english]
+            self.ids = dict((label, i) for i, label in enumerate(english))
+            self.translations = translations
+            # set last, other threads check it without the lock
+            self.english = english
+
+    def to_norwegian(self, english_label):
+        """
+            Returns the norwegian translation of an english label.
+        """
+        self.load()
+        return self.translations[english_label]
+
+    def translate_probabilities(self, certainty):
+        """
+            Translates the labels in a probability dictionary to norwegian.
+        """
+        self.load()
+        return dict(
+            (self.translations[label], prob)
+            for label, prob in certainty.items()
+        )
+
+    def table(self):
+        """
+            Returns the table sent once to clients using the compact format.
+        """
+        self.load()
+        return {
+            "labels": self.english,
+            "norwegian": self.norwegian,
+            "bits": setup.COMPACT_PROBABILITY_BITS,
+        }
+
+    def compact_prediction(self, certainty, best_guess, correct_label,
+                           has_won):
+        """
+            Encodes a prediction with label ids instead of strings, and
+            only the top k probabilities quantized to a few bits. A client
+            recovers a probability as q / (2 ** bits - 1).
+        """
+        self.load()
+        scale = 2 ** setup.COMPACT_PROBABILITY_BITS - 1
+        top = sorted(certainty.items(), key=lambda item: -item[1])
+        return {
+            "top": [
+                [self.ids[label], round(prob * scale)]
+                for label, prob in top[:setup.COMPACT_TOP_K]
+            ],
+            "guess": self.ids[best_guess],
+            "correctLabel": self.ids[correct_label],
+            "hasWon": has_won,
+        }
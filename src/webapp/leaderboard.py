@@ -0,0 +1,139 @@
+"""
+    In-memory high score lists.
+"""
+import bisect
+import datetime
+import itertools
+import threading
+from utilities import setup
+from webapp import models
+
+
+class Leaderboard:
+    """
+        The top scores of all time and of today for each difficulty. The
+        lists of a difficulty are read from the database on first use,
+        which must happen inside an app context, and are then updated with
+        every new score, so reading them needs no queries. Each list holds
+        at most top_n entries. The daily lists are emptied when the date
+        changes, since the new day has no scores yet.
+
+        Scores posted to other server instances only show up when reload
+        adds the scores stored since the lists were read, which
+        StandingsRefresher does every refresh interval, so the lists may be
+        that much out of date.
+    """
+
+    def __init__(self, top_n=setup.TOP_N, today=datetime.date.today):
+        self.top_n = top_n
+        self.today = today
+        self.day = today()
+        # difficulty_id -> list of (-score, order, entry), best first
+        self.total = {}
+        self.daily = {}
+        # difficulty_id -> highest score id read
+        self.last_ids = {}
+        self.order = itertools.count()
+        self.lock = threading.Lock()
+
+    def record(self, score, difficulty_id, score_id=None):
+        """
+            Adds a score posted today. Returns the entry sent to clients,
+            whose "id" can be set once the score has been stored.
+        """
+        entry = {"id": score_id, "score": score}
+        with self.lock:
+            self._load(difficulty_id)
+            key = (-score, next(self.order), entry)
+            self._insert(self.total[difficulty_id], key)
+            self._insert(self.daily[difficulty_id], key)
+
+        return entry
+
+    def top(self, difficulty_id):
+        """
+            Returns the daily and all time high score lists.
+        """
+        with self.lock:
+            self._load(difficulty_id)
+            return {
+                "daily": [dict(e) for _, _, e in self.daily[difficulty_id]],
+                "total": [dict(e) for _, _, e in self.total[difficulty_id]],
+            }
+
+    def reload(self):
+        """
+            Adds the scores stored since the last read to the lists of every
+            difficulty used so far. Only rows with a higher id than the last
+            one read are fetched, outside the lock. Must be called inside an
+            app context. Scores recorded by this instance are skipped by id,
+            so they must have been stored, and their entries given ids,
+            before. Returns the number of difficulties read.
+        """
+        with self.lock:
+            last_ids = dict(self.last_ids)
+
+        for difficulty_id, last_id in last_ids.items():
+            scores = models.get_scores_after(last_id, difficulty_id)
+            with self.lock:
+                self._load(difficulty_id)
+                self._merge(difficulty_id, scores)
+
+        return len(last_ids)
+
+    def _merge(self, difficulty_id, scores):
+        total = self.total[difficulty_id]
+        daily = self.daily[difficulty_id]
+        known = set(entry["id"] for _, _, entry in total + daily)
+        for score in scores:
+            self.last_ids[difficulty_id] = max(
+                self.last_ids[difficulty_id], score.score_id)
+            if score.score_id in known:
+                continue
+
+            entry = {"id": score.score_id, "score": score.score}
+            key = (-score.score, next(self.order), entry)
+            self._insert(total, key)
+            if score.date == self.day:
+                self._insert(daily, key)
+
+    def _insert(self, entries, key):
+        if len(entries) == self.top_n and key >= entries[-1]:
+            return
+
+        bisect.insort(entries, key)
+        del entries[self.top_n:]
+
+    def _load(self, difficulty_id):
+        """
+            Reads the lists of a difficulty unless already done, and starts
+            a new day if the date has changed.
+        """
+        today = self.today()
+        if today != self.day:
+            self.day = today
+            self.daily = dict((i, []) for i in self.daily)
+
+        if difficulty_id in self.total:
+            return
+
+        # read first, so a score stored while the lists are read is
+        # fetched again by reload, which skips it if already listed
+        self.last_ids[difficulty_id] = models.get_last_score_id()
+        self.total[difficulty_id], self.daily[difficulty_id] = self._read(
+            difficulty_id)
+
+    def _read(self, difficulty_id):
+        """
+            Returns the all time and daily lists of a difficulty in the
+            database.
+        """
+        total = models.get_top_n_high_score_list(self.top_n, difficulty_id)
+        daily = models.daily_high_score_query(difficulty_id).limit(self.top_n)
+        return self._entries(total), self._entries(
+            {"id": score.score_id, "score": score.score} for score in daily)
+
+    def _entries(self, entries):
+        return [
+            (-entry["score"], next(self.order), entry) for entry in entries
+        ]
@@ -0,0 +1,89 @@
+"""
+    Storage backend for the local filesystem.
+"""
+import mmap
+import os
+import pathlib
+import shutil
+import tempfile
+from webapp.storage_backend import StorageBackend
+
+
+class LocalStorage(StorageBackend):
+    """
+        Stores images as files in a directory per container, for offline
+        deployments and benchmarks. Files are read through memory maps, so
+        repeatedly served images come straight from the page cache without
+        being copied into Python buffers.
+    """
+
+    # file URLs only work on this machine
+    public_urls = False
+
+    def __init__(self, container_name, root):
+        super().__init__(container_name)
+        self.root = os.path.abspath(os.path.join(root, container_name))
+        os.makedirs(self.root, exist_ok=True)
+
+    def save(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so readers never see a partly
+        # written image, and link it in place only if the name is free
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.link(tmp_path, path)
+        finally:
+            os.unlink(tmp_path)
+
+        return self.url(name)
+
+    def fetch(self, name):
+        with open(self._path(name), "rb") as image_file:
+            if os.fstat(image_file.fileno()).st_size == 0:
+                return b""
+
+            # the map stays valid after the file is closed
+            return memoryview(
+                mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def list(self, prefix=""):
+        names = []
+        # only walk the directory the prefix points into
+        start = os.path.join(self.root, os.path.dirname(prefix))
+        for directory, _, files in os.walk(start):
+            for file_name in files:
+                # skip temporary files of unfinished saves
+                if file_name.startswith("."):
+                    continue
+
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    names.append(name)
+
+        return sorted(names)
+
+    def count(self):
+        return len(self.list())
+
+    def reset(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+
+    def url(self, name):
+        return pathlib.Path(self._path(name)).as_uri()
+
+    def _path(self, name):
+        """
+            Returns the file path of an image, making sure it is inside the
+            container directory.
+        """
+        path = os.path.abspath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError("Invalid image name: " + name)
+
+        return path
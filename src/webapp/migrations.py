@@ -0,0 +1,261 @@
+"""
+    Versioned changes to the schema of existing databases, and a check of
+    query plans.
+
+    db.create_all() creates missing tables, but never changes existing
+    ones. Every other change to the schema is added to MIGRATIONS with the
+    next version number. A new database already has the current schema
+    from create_all, so migrations must do nothing if their change is
+    already there.
+"""
+import datetime
+import heapq
+import json
+import logging
+from flask import Flask
+from sqlalchemy import func
+from sqlalchemy import inspect
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from utilities import setup
+from webapp import models
+from webapp import score_periods
+from webapp.models import db
+
+
+def create_indexes(*tables):
+    """
+        Returns a migration creating the missing indexes of the tables.
+    """
+    def upgrade(connection):
+        for table in tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+    return upgrade
+
+
+def add_columns(table, *names):
+    """
+        Returns a migration adding the missing columns of a table.
+    """
+    def upgrade(connection):
+        existing = set(
+            column["name"] for column in inspect(connection).get_columns(
+                table.name))
+        for name in names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(
+                "ALTER TABLE %s ADD %s %s" % (table.name, name, column_type))
+
+    return upgrade
+
+
+def backfill_leaderboard_buckets(connection):
+    """
+        Fills the period leaderboards with the top scores already stored,
+        reading the scores once.
+    """
+    buckets = models.LeaderboardBucket.__table__
+    scores = models.Scores.__table__
+    if connection.execute(select(func.count()).select_from(buckets)).scalar():
+        return
+
+    # (period, start, difficulty_id) -> heap of the top (score, -score_id)
+    tops = {}
+    rows = connection.execution_options(stream_results=True).execute(
+        select(scores.c.score_id, scores.c.score, scores.c.date,
+               scores.c.difficulty_id))
+    for score_id, score, date, difficulty_id in rows:
+        if date is None:
+            continue
+        for period, start in score_periods.periods_of(date):
+            top = tops.setdefault((period, start, difficulty_id), [])
+            if len(top) < setup.TOP_N:
+                heapq.heappush(top, (score, -score_id))
+            else:
+                heapq.heappushpop(top, (score, -score_id))
+
+    values = [
+        {
+            "period": period,
+            "period_start": start,
+            "difficulty_id": difficulty_id,
+            "score_id": -negative_id,
+            "score": score,
+        }
+        for (period, start, difficulty_id), top in tops.items()
+        for score, negative_id in top
+    ]
+    if len(values) > 0:
+        connection.execute(buckets.insert(), values)
+
+
+def backfill_archive_tops(connection):
+    """
+        Merges the top scores of the days already archived into one row
+        per difficulty.
+    """
+    archive_tops = models.ArchiveTop.__table__
+    summaries = models.ScoreSummary.__table__
+    if connection.execute(
+            select(func.count()).select_from(archive_tops)).scalar():
+        return
+
+    # difficulty_id -> top scores of the days read so far
+    tops = {}
+    rows = connection.execute(
+        select(summaries.c.difficulty_id, summaries.c.top))
+    for difficulty_id, top in rows:
+        tops[difficulty_id] = models.merge_top(
+            setup.TOP_N, tops.get(difficulty_id, []), json.loads(top))
+
+    values = [
+        {"difficulty_id": difficulty_id, "top": json.dumps(top)}
+        for difficulty_id, top in tops.items()
+    ]
+    if len(values) > 0:
+        connection.execute(archive_tops.insert(), values)
+
+
+# (version, description, upgrade), in the order they are applied
+MIGRATIONS = [
+    (
+        1,
+        "Indexes for leaderboard, matchmaking and cleanup queries",
+        create_indexes(
+            models.Scores.__table__,
+            models.MulitPlayer.__table__,
+            models.Games.__table__,
+            models.Players.__table__,
+            models.ExampleImages.__table__,
+        ),
+    ),
+    (
+        2,
+        "Period leaderboards from the scores already stored",
+        backfill_leaderboard_buckets,
+    ),
+    (
+        3,
+        "Labels of training jobs, for resuming scheduled jobs",
+        add_columns(models.TrainingJob.__table__, "labels"),
+    ),
+    (
+        4,
+        "All time top scores of the archived days",
+        backfill_archive_tops,
+    ),
+]
+
+
+def applied_versions():
+    """
+        Returns the versions of the migrations applied to the database.
+    """
+    query = db.session.query(models.SchemaVersion.version)
+    versions = set(version for version, in query)
+    # end the transaction, migrations run on their own connections
+    db.session.commit()
+    return versions
+
+
+def migrate(app):
+    """
+        Applies the migrations which have not been applied yet, each in its
+        own transaction. Several workers may start at the same time, so a
+        migration which fails because another worker applied it first is
+        skipped.
+
+        Returns the latest version applied.
+    """
+    with app.app_context():
+        models.SchemaVersion.__table__.create(db.engine, checkfirst=True)
+        applied = applied_versions()
+        for version, description, upgrade in MIGRATIONS:
+            if version in applied:
+                continue
+
+            try:
+                with db.engine.begin() as connection:
+                    upgrade(connection)
+                    connection.execute(
+                        models.SchemaVersion.__table__.insert().values(
+                            version=version,
+                            description=description,
+                            applied=datetime.datetime.today(),
+                        )
+                    )
+                logging.info("Applied migration %d: %s", version, description)
+            except SQLAlchemyError:
+                if version not in applied_versions():
+                    raise
+            applied.add(version)
+
+        return max(applied, default=0)
+
+
+def setup_database(app, labels_file=setup.LABELS_FILE):
+    """
+        Creates missing tables, applies the migrations and adds missing
+        labels.
+
+        Returns the latest version applied.
+    """
+    models.create_tables(app)
+    version = migrate(app)
+    models.seed_labels(app, labels_file)
+    return version
+
+
+def full_scans(query):
+    """
+        Returns the steps in the plan of a query which read a whole table
+        or index instead of seeking, as reported by the database. Used to
+        check that the hot queries are served by the indexes. Only SQLite
+        and SQL Server plans are read, for other databases no steps are
+        returned.
+    """
+    connection = db.session.connection()
+    statement = query.statement.compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + str(statement))
+        return [row[-1] for row in rows if row[-1].startswith("SCAN")]
+
+    if connection.dialect.name == "mssql":
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute("SET SHOWPLAN_ALL ON")
+            cursor.execute(str(statement))
+            rows = cursor.fetchall()
+        finally:
+            cursor.execute("SET SHOWPLAN_ALL OFF")
+        return [
+            row.StmtText for row in rows
+            if row.PhysicalOp in ("Table Scan", "Clustered Index Scan",
+                                  "Index Scan")
+        ]
+
+    logging.warning(
+        "Query plans can't be checked on %s", connection.dialect.name)
+    return []
+
+
+def main():
+    """
+        Sets up the schema of the database configured in utilities.setup.
+    """
+    logging.basicConfig(level=logging.INFO)
+    app = Flask(__name__)
+    app.config.from_object("utilities.setup.Flask_config")
+    models.db.init_app(app)
+    print("Schema version: " + str(setup_database(app)))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,34 @@
     Classes for describing tables in the database and additional functions for
     manipulating them.
 """
+import contextlib
 import datetime
 import csv
+import heapq
+import json
+import math
 import os
 import random
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from flask import has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+from werkzeug.security import check_password_hash
 from utilities.difficulties import DifficultyId
+from utilities import setup
 from utilities.exceptions import UserError
+from utilities.timed_pool import TimedQueuePool
+from webapp import score_periods
 
 db = SQLAlchemy()
 
@@ -21,6 +42,34 @@ class Iteration(db.Model):
     iteration_name = db.Column(db.String(64), primary_key=True)
 
 
+class TrainingJob(db.Model):
+    """
+        Model for storing the state of background training jobs, so their
+        progress survives the worker which runs them.
+    """
+
+    job_id = db.Column(db.String(32), primary_key=True)
+    state = db.Column(db.String(32), nullable=False)
+    start_at = db.Column(db.DateTime)
+    updated = db.Column(db.DateTime)
+    iteration_id = db.Column(db.String(64))
+    iteration_name = db.Column(db.String(64))
+    message = db.Column(db.String(256))
+    # JSON list of the labels to train on
+    labels = db.Column(db.UnicodeText)
+
+
+class TrainingSlot(db.Model):
+    """
+        Model holding the training job which is scheduled or running. The
+        only key used is setup.TRAINING_SLOT, so when two workers start a
+        job at the same time, one of the inserts fails.
+    """
+
+    slot = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), nullable=False)
+
+
 class Games(db.Model):
     """
        This is the Games model in the database. It is important that the
@@ -28,7 +77,7 @@ class Games(db.Model):
        be String when a long hex is given.
     """
 
-    game_id = db.Column(db.NVARCHAR(32), primary_key=True)
+    game_id = db.Column(db.Unicode(32), primary_key=True)
     session_num = db.Column(db.Integer, default=1)
     labels = db.Column(db.String(64))
     date = db.Column(db.DateTime)
@@ -42,6 +91,8 @@ class Games(db.Model):
         cascade="all, delete"
     )
 
+    __table_args__ = (db.Index("ix_games_date", "date"),)
+
 
 class Scores(db.Model):
     """
@@ -50,13 +101,23 @@ class Scores(db.Model):
     """
 
     score_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    player_id = db.Column(db.NVARCHAR(32), db.ForeignKey(
+    player_id = db.Column(db.Unicode(32), db.ForeignKey(
         "players.player_id", ondelete='CASCADE'))
     score = db.Column(db.Integer, nullable=False)
     date = db.Column(db.Date)
     difficulty_id = db.Column(
         db.Integer, db.ForeignKey("difficulty.id"), default=1)
 
+    # all time and daily leaderboards
+    __table_args__ = (
+        db.Index("ix_scores_difficulty_score", "difficulty_id", "score"),
+        db.Index(
+            "ix_scores_date_difficulty_score", "date", "difficulty_id",
+            "score"),
+        # ids of archived scores must not be reused
+        {"sqlite_autoincrement": True},
+    )
+
 
 class Players(db.Model):
     """
@@ -64,14 +125,16 @@ class Players(db.Model):
         foreign key to the game table.
     """
 
-    player_id = db.Column(db.NVARCHAR(32), primary_key=True)
-    game_id = db.Column(db.NVARCHAR(32), db.ForeignKey(
+    player_id = db.Column(db.Unicode(32), primary_key=True)
+    game_id = db.Column(db.Unicode(32), db.ForeignKey(
         "games.game_id"), nullable=False)
     state = db.Column(db.String(32), nullable=False)
 
     game = db.relationship("Games", back_populates="players")
     scores = db.relationship("Scores", backref="Players", passive_deletes=True)
 
+    __table_args__ = (db.Index("ix_players_game_id", "game_id"),)
+
 
 class MulitPlayer(db.Model):
     """
@@ -79,14 +142,19 @@ class MulitPlayer(db.Model):
     """
 
     game_id = db.Column(
-        db.NVARCHAR(32), db.ForeignKey("games.game_id"), primary_key=True
+        db.Unicode(32), db.ForeignKey("games.game_id"), primary_key=True
     )
-    player_1 = db.Column(db.NVARCHAR(32))
-    player_2 = db.Column(db.NVARCHAR(32))
-    pair_id = db.Column(db.NVARCHAR(32))
+    player_1 = db.Column(db.Unicode(32))
+    player_2 = db.Column(db.Unicode(32))
+    pair_id = db.Column(db.Unicode(32))
 
     game = db.relationship("Games", back_populates="mulitplay")
 
+    # matchmaking looks for a game with the pair id waiting for player 2
+    __table_args__ = (
+        db.Index("ix_mulit_player_pair_id_player_2", "pair_id", "player_2"),
+    )
+
 
 class Labels(db.Model):
     """
@@ -123,6 +191,235 @@ class ExampleImages(db.Model):
     image = db.Column(db.String(256), primary_key=True)
     label = db.Column(db.String(32), db.ForeignKey("labels.english"))
 
+    __table_args__ = (db.Index("ix_example_images_label", "label"),)
+
+
+class LeaderboardBucket(db.Model):
+    """
+        Scores of the period leaderboards. A bucket holds the scores of one
+        period and difficulty, e.g. the week starting 2024-01-01. A new
+        score is added to the bucket of every period it belongs to, and
+        compaction removes all but the top scores of each bucket, so a top
+        list is read from a small bucket however many scores there are.
+    """
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    period = db.Column(db.String(16), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    difficulty_id = db.Column(db.Integer, nullable=False)
+    score_id = db.Column(db.Integer)
+    score = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index(
+            "ix_leaderboard_bucket_period_score", "period", "period_start",
+            "difficulty_id", "score"),
+    )
+
+
+class ScoreSummary(db.Model):
+    """
+        Roll-up of the archived scores of one day and difficulty: the top
+        scores, as a JSON list of {"id", "score"}, and the number of scores
+        with each value, as a JSON list of [score, count].
+    """
+    date = db.Column(db.Date, primary_key=True)
+    difficulty_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    top = db.Column(db.Text, nullable=False)
+    histogram = db.Column(db.Text, nullable=False)
+
+
+class ArchiveTop(db.Model):
+    """
+        The top scores of all archived days of a difficulty, as a JSON list
+        of {"id", "score"}. Kept up to date by archival, so the all time
+        list reads one row instead of the summary of every day.
+    """
+    difficulty_id = db.Column(db.Integer, primary_key=True)
+    top = db.Column(db.Text, nullable=False)
+
+
+class ScoresArchive(db.Model):
+    """
+        Scores moved out of the Scores table by archival, with their
+        original ids.
+    """
+    score_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    player_id = db.Column(db.Unicode(32))
+    score = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.Date)
+    difficulty_id = db.Column(db.Integer)
+
+
+class SchemaVersion(db.Model):
+    """
+        Migrations which have been applied to the database.
+    """
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(256))
+    applied = db.Column(db.DateTime)
+
+
+# Counters of SQL statements sent to and transactions committed in the
+# database, and of connections checked out of, opened by and invalidated
+# in the pool, read through database_stats()
+db_stats = Counter()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, many):
+    db_stats["statements"] += 1
+
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    for pragma in setup.SQLITE_PRAGMAS:
+        cursor.execute("PRAGMA " + pragma)
+    cursor.close()
+
+
+@event.listens_for(Session, "after_commit")
+def _count_commit(session):
+    db_stats["commits"] += 1
+
+
+# Transactions of socket and HTTP handlers, which run in a request
+# context, each hold one of these slots, so at most DB_HANDLER_CONCURRENCY
+# handlers use connections at once and the pool always has connections
+# left for the background tasks
+handler_slots = threading.BoundedSemaphore(setup.DB_HANDLER_CONCURRENCY)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _take_handler_slot(session, transaction):
+    if transaction.parent is not None or not has_request_context():
+        return
+
+    if not handler_slots.acquire(timeout=setup.DB_POOL_TIMEOUT):
+        db_stats["handler_slot_timeouts"] += 1
+        raise UserError("The server is busy, please try again")
+    session.info["handler_slot"] = transaction
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_handler_slot(session, transaction):
+    if session.info.get("handler_slot") is transaction:
+        del session.info["handler_slot"]
+        handler_slots.release()
+
+
+def release_connection():
+    """
+        Ends the transaction of the session, so its connection, and its
+        handler slot, are given back while the caller waits for something
+        else than the database.
+    """
+    db.session.commit()
+
+
+@event.listens_for(Pool, "checkout")
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    db_stats["checkouts"] += 1
+
+
+@event.listens_for(Pool, "connect")
+def _count_connect(dbapi_connection, connection_record):
+    db_stats["connects"] += 1
+
+
+@event.listens_for(Pool, "invalidate")
+def _count_invalidation(dbapi_connection, connection_record, exception):
+    # e.g. a connection dropped by the server, found by the pre-ping
+    db_stats["invalidations"] += 1
+
+
+def database_stats():
+    """
+        Returns the number of statements, commits and pool events since
+        startup.
+    """
+    return dict(db_stats)
+
+
+def pool_stats():
+    """
+        Returns the size and use of the connection pool and the time spent
+        checking out connections. Must be called inside an app context.
+    """
+    if not isinstance(db.engine.pool, TimedQueuePool):
+        return {}
+
+    return db.engine.pool.stats()
+
+
+def warm_up_pool(app):
+    """
+        Opens all connections of the pool in parallel, so the first players
+        after a restart don't wait for them. Connections which have been
+        dropped are replaced, since they are pinged before use. Returns the
+        number of connections opened.
+    """
+    with app.app_context():
+        engine = db.engine
+    if not isinstance(engine.pool, TimedQueuePool):
+        return 0
+
+    size = engine.pool.size()
+    with ThreadPoolExecutor(size) as executor:
+        # all connections are held until every worker has one, so each
+        # worker opens its own
+        futures = [executor.submit(engine.connect) for _ in range(size)]
+        errors = []
+        connections = []
+        for future in futures:
+            try:
+                connections.append(future.result())
+            except Exception as e:
+                errors.append(e)
+
+    for connection in connections:
+        connection.close()
+    if len(errors) > 0:
+        raise errors[0]
+
+    return len(connections)
+
+
+@contextlib.contextmanager
+def unit_of_work():
+    """
+        Collects the changes made by the functions in this module and
+        commits them once when the block ends, or rolls them back if it
+        raises. Objects loaded in the block stay in the session's identity
+        map, so looking them up again by key needs no query. A unit of work
+        started inside another joins it.
+    """
+    info = db.session.info
+    info["unit_of_work"] = info.get("unit_of_work", 0) + 1
+    try:
+        yield
+        if info["unit_of_work"] == 1:
+            db.session.commit()
+    except Exception:
+        if info["unit_of_work"] == 1:
+            db.session.rollback()
+        raise
+    finally:
+        info["unit_of_work"] -= 1
+
+
+def _commit():
+    """
+        Commits the session, unless a unit of work is active, which then
+        commits when it ends.
+    """
+    if db.session.info.get("unit_of_work", 0) == 0:
+        db.session.commit()
+
 
 # Functions to manipulate the tables above
 def create_tables(app):
@@ -157,7 +454,7 @@ def insert_into_games(game_id, labels, date, difficulty_id):
                 date=date,
                 difficulty_id=difficulty_id)
             db.session.add(game)
-            db.session.commit()
+            _commit()
             return True
         except Exception as e:
             raise Exception("Could not insert into games :" + str(e))
@@ -168,36 +465,82 @@ def insert_into_games(game_id, labels, date, difficulty_id):
         )
 
 
-def insert_into_scores(player_id, score, date, difficulty_id: DifficultyId):
+def check_score(player_id, score, date, difficulty_id: DifficultyId):
     """
-        Insert values into Scores table.
-
-        Parameters:
-        name: user name, string
-        score: float
-        date: datetime.date
-        difficulty_id: integer: For multiplayer: 4
+        Raises UserError unless the values can be inserted into the Scores
+        table. Scores must be finite and between 0 and setup.MAX_SCORE.
     """
     score_int_or_float = isinstance(score, float) or isinstance(score, int)
 
-    if (
+    if not (
         isinstance(player_id, str)
         and score_int_or_float
         and isinstance(date, datetime.date)
         and isinstance(difficulty_id, int)
     ):
-        try:
-            scores = Scores(player_id=player_id, score=score, date=date, difficulty_id=difficulty_id)
-            db.session.add(scores)
-            db.session.commit()
-            return True
-        except Exception as e:
-            raise Exception("Could not insert into scores: " + str(e))
-    else:
         raise UserError(
             "Name has to be string, score can be int or "
             "float, difficulty_id has to be an integer and date has to be datetime.date.")
 
+    if not (math.isfinite(score) and 0 <= score <= setup.MAX_SCORE):
+        raise UserError(
+            "Score has to be between 0 and " + str(setup.MAX_SCORE))
+
+
+def insert_into_scores(player_id, score, date, difficulty_id: DifficultyId):
+    """
+        Insert values into Scores table.
+
+        Parameters:
+        name: user name, string
+        score: float
+        date: datetime.date
+        difficulty_id: integer: For multiplayer: 4
+
+        Returns the id of the new score.
+    """
+    return insert_many_scores([(player_id, score, date, difficulty_id)])[0]
+
+
+def insert_many_scores(rows):
+    """
+        Insert several scores into the Scores table and the period
+        leaderboards, with one flush and one commit.
+
+        Parameters:
+        rows: list of (player_id, score, date, difficulty_id)
+
+        Returns the ids of the new scores, in the same order.
+    """
+    for row in rows:
+        check_score(*row)
+
+    try:
+        scores = [
+            Scores(
+                player_id=player_id,
+                score=score,
+                date=date,
+                difficulty_id=difficulty_id)
+            for player_id, score, date, difficulty_id in rows
+        ]
+        db.session.add_all(scores)
+        # the ids are read before the commit expires the records
+        db.session.flush()
+        score_ids = [record.score_id for record in scores]
+        for score_id, (_, score, date, difficulty_id) in zip(score_ids, rows):
+            for period, start in score_periods.periods_of(date):
+                db.session.add(LeaderboardBucket(
+                    period=period,
+                    period_start=start,
+                    difficulty_id=difficulty_id,
+                    score_id=score_id,
+                    score=score))
+        _commit()
+        return score_ids
+    except Exception as e:
+        raise Exception("Could not insert into scores: " + str(e))
+
 
 def insert_into_players(player_id, game_id, state):
     """
@@ -216,7 +559,7 @@ def insert_into_players(player_id, game_id, state):
         try:
             player = Players(player_id=player_id, game_id=game_id, state=state)
             db.session.add(player)
-            db.session.commit()
+            _commit()
             return True
         except Exception as e:
             raise Exception("Could not insert into games: " + str(e))
@@ -248,7 +591,7 @@ def insert_into_mulitplayer(game_id, player_id, pair_id):
                 game_id=game_id,
                 pair_id=pair_id)
             db.session.add(mulitplayer)
-            db.session.commit()
+            _commit()
             return True
         except Exception as e:
             raise Exception("Could not insert into mulitplayer: " + str(e))
@@ -256,13 +599,20 @@ def insert_into_mulitplayer(game_id, player_id, pair_id):
         raise UserError("All params has to be string.")
 
 
+def waiting_game_query(pair_id):
+    """
+        Query for games with the pair id which wait for a second player.
+    """
+    return MulitPlayer.query.filter_by(player_2=None, pair_id=pair_id)
+
+
 def check_player_2_in_mulitplayer(player_id, pair_id):
     """
         Function to check if player2 is none in database. If none, a player
         can be added to the game.
     """
     # If there is no rows with player_2=None, game will be None
-    game = MulitPlayer.query.filter_by(player_2=None, pair_id=pair_id).first()
+    game = waiting_game_query(pair_id).first()
     if game is not None:
         if game.player_1 == player_id:
             raise UserError("you can't join a game with yourself")
@@ -275,7 +625,7 @@ def get_game(game_id):
     """
         Return the game record with the corresponding game_id.
     """
-    game = Games.query.get(game_id)
+    game = db.session.get(Games, game_id)
     if game is None:
         raise UserError("game_id invalid or expired")
 
@@ -286,7 +636,7 @@ def get_player(player_id):
     """
         Return the player record with the corresponding player_id.
     """
-    player = Players.query.get(player_id)
+    player = db.session.get(Players, player_id)
     if player is None:
         raise UserError("player_id invalid or expired")
 
@@ -297,7 +647,7 @@ def get_mulitplayer(game_id):
     """
         Return the mulitplayer with the corresponding game_id.
     """
-    mp = MulitPlayer.query.get(game_id)
+    mp = db.session.get(MulitPlayer, game_id)
     if mp is None:
         raise UserError("game_id invalid or expired")
 
@@ -308,16 +658,16 @@ def get_opponent(game_id, player_id):
     """
         Return the player in game record with the corresponding gameID.
     """
-    mp = MulitPlayer.query.get(game_id)
+    mp = db.session.get(MulitPlayer, game_id)
     if mp is None:
         # Needs to be changed to socket error
         raise UserError("Token invalid or expired")
     elif mp.player_1 == player_id:
         if mp.player_2 is not None:
-            return Players.query.get(mp.player_2)
+            return db.session.get(Players, mp.player_2)
         else:
             return None
-    return Players.query.get(mp.player_1)
+    return db.session.get(Players, mp.player_1)
 
 
 def update_game_for_player(game_id, player_id, increase_ses_num, state):
@@ -326,13 +676,11 @@ def update_game_for_player(game_id, player_id, increase_ses_num, state):
         player_id with the given parameters.
     """
     try:
-        game = Games.query.get(game_id)
+        game = db.session.get(Games, game_id)
         game.session_num += increase_ses_num
-        new_ses_new = game.session_num
-        print(new_ses_new)
-        player = Players.query.get(player_id)
+        player = db.session.get(Players, player_id)
         player.state = state
-        db.session.commit()
+        _commit()
         return True
     except Exception as e:
         raise Exception("Could not update game for player: " + str(e))
@@ -343,11 +691,11 @@ def update_mulitplayer(player_2_id, game_id):
         Update mulitplayer with player 2's id.
     """
     try:
-        mp = MulitPlayer.query.get(game_id)
-        player_1 = Players.query.get(mp.player_1)
+        mp = db.session.get(MulitPlayer, game_id)
+        player_1 = db.session.get(Players, mp.player_1)
         player_1.state = "Ready"
         mp.player_2 = player_2_id
-        db.session.commit()
+        _commit()
         return True
     except Exception as e:
         raise Exception("Could not update mulitplayer for player: " + str(e))
@@ -368,6 +716,146 @@ def update_iteration_name(new_name):
     return new_name
 
 
+def insert_into_training_jobs(job_id, start_at, labels):
+    """
+        Insert values into TrainingJob table, and let the job hold the
+        training slot. Raises UserError if another job is scheduled or
+        running.
+
+        Parameters:
+        job_id: random uuid.uuid4().hex
+        start_at: datetime.datetime, when the job should start
+        labels: list of the labels to train on
+    """
+    if not (isinstance(job_id, str) and isinstance(start_at, datetime.datetime)):
+        raise UserError(
+            "job_id has to be string and start_at has to be datetime.datetime.")
+
+    # a second attempt is made if the slot was held by a lost job
+    for _ in range(2):
+        db.session.add(TrainingSlot(slot=setup.TRAINING_SLOT, job_id=job_id))
+        db.session.add(TrainingJob(
+            job_id=job_id,
+            state=setup.TRAINING_SCHEDULED,
+            start_at=start_at,
+            updated=datetime.datetime.today(),
+            labels=json.dumps(labels)))
+        try:
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+        except Exception as e:
+            db.session.rollback()
+            raise Exception("Could not insert into training jobs: " + str(e))
+
+        if not _release_lost_training_slot():
+            break
+
+    raise UserError("A training job is already scheduled or running")
+
+
+def _release_lost_training_slot():
+    """
+        Frees the training slot if the job holding it has finished, or has
+        had no progress for a long time, which means it was lost with its
+        worker. Returns True if the slot is free.
+    """
+    slot = db.session.get(TrainingSlot, setup.TRAINING_SLOT)
+    if slot is None:
+        return True
+
+    job = db.session.get(TrainingJob, slot.job_id)
+    cutoff = datetime.datetime.today() - datetime.timedelta(
+        seconds=setup.TRAINING_JOB_TIMEOUT)
+    if (job is not None and job.state not in setup.TRAINING_FINISHED_STATES
+            and (job.updated > cutoff or job.start_at > cutoff)):
+        db.session.commit()
+        return False
+
+    # only the slot of that job, another worker may have taken it already
+    TrainingSlot.query.filter_by(
+        slot=setup.TRAINING_SLOT, job_id=slot.job_id).delete()
+    db.session.commit()
+    return True
+
+
+def update_training_job(job_id, state, iteration=None, message=None):
+    """
+        Update the state of a training job. The id and publish name of the
+        iteration are stored if an iteration is given.
+    """
+    try:
+        job = db.session.get(TrainingJob, job_id)
+        job.state = state
+        job.updated = datetime.datetime.today()
+        if iteration is not None:
+            job.iteration_id = str(iteration.id)
+            job.iteration_name = iteration.publish_name
+        if message is not None:
+            job.message = message[:256]
+        if state in setup.TRAINING_FINISHED_STATES:
+            TrainingSlot.query.filter_by(job_id=job_id).delete()
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        raise Exception("Could not update training job: " + str(e))
+
+
+def claim_training_job(job_id):
+    """
+        Moves a scheduled training job to the uploading state. Returns True
+        if this call did, so a job resumed by several workers runs once.
+    """
+    claimed = TrainingJob.query.filter_by(
+        job_id=job_id, state=setup.TRAINING_SCHEDULED
+    ).update({
+        "state": setup.TRAINING_UPLOADING,
+        "updated": datetime.datetime.today(),
+    })
+    db.session.commit()
+    return claimed == 1
+
+
+def get_training_job(job_id):
+    """
+        Return the training job record with the corresponding job_id.
+    """
+    job = db.session.get(TrainingJob, job_id)
+    if job is None:
+        raise UserError("job_id invalid")
+
+    return job
+
+
+def get_scheduled_training_job():
+    """
+        Return the training job which holds the training slot and has not
+        started yet, or None.
+    """
+    slot = db.session.get(TrainingSlot, setup.TRAINING_SLOT)
+    if slot is None:
+        return None
+
+    job = db.session.get(TrainingJob, slot.job_id)
+    if job is None or job.state != setup.TRAINING_SCHEDULED:
+        return None
+
+    return job
+
+
+def check_admin(username, password):
+    """
+        Return True if the username and password belong to an administrator.
+    """
+    user = db.session.get(User, username) if isinstance(username, str) else None
+    if user is None or not isinstance(password, str):
+        return False
+
+    return check_password_hash(user.password, password)
+
+
 def delete_session_from_game(game_id):
     """
         To avoid unnecessary data in the database this function is called by
@@ -375,49 +863,267 @@ def delete_session_from_game(game_id):
         connected to the particular game_id, is deleted.
     """
     try:
-        game = Games.query.get(game_id)
+        game = db.session.get(Games, game_id)
         db.session.query(Players).filter(
             Players.game_id == game_id
         ).delete()
-        mp = MulitPlayer.query.get(game_id)
+        mp = db.session.get(MulitPlayer, game_id)
         db.session.delete(game)
         db.session.delete(mp)
-        db.session.commit()
+        _commit()
         return "Record deleted."
     except AttributeError as e:
         db.session.rollback()
         raise AttributeError("Couldn't find game_id: " + str(e))
 
 
-def delete_old_games():
+def delete_old_games(cutoff, batch_size):
     """
-        Delete records in games older than one day.
+        Delete at most batch_size games started before cutoff, with their
+        players and pairings, using one set-based delete per table.
+
+        Returns the number of games deleted.
     """
     try:
-        games = (
-            db.session.query(Games)
-            .filter(
-                Games.date
-                < (datetime.datetime.today() - datetime.timedelta(days=1))
-            )
-            .all()
-        )
-        for game in games:
-            db.session.query(Players).filter(
-                Players.game_id == game.game_id
-            ).delete()
-            db.session.query(MulitPlayer).filter(
-                MulitPlayer.game_id == game.game_id
-            ).delete()
-            db.session.delete(game)
+        game_ids = [
+            game_id for game_id, in db.session.query(Games.game_id)
+            .filter(Games.date < cutoff)
+            .limit(batch_size)
+        ]
+        if len(game_ids) == 0:
+            return 0
+
+        db.session.query(Players).filter(
+            Players.game_id.in_(game_ids)
+        ).delete(synchronize_session=False)
+        db.session.query(MulitPlayer).filter(
+            MulitPlayer.game_id.in_(game_ids)
+        ).delete(synchronize_session=False)
+        db.session.query(Games).filter(
+            Games.game_id.in_(game_ids)
+        ).delete(synchronize_session=False)
 
         db.session.commit()
-        return True
+        return len(game_ids)
     except Exception as e:
         db.session.rollback()
         raise Exception("Couldn't clean up old game records: " + str(e))
 
 
+def daily_high_score_query(difficulty_id):
+    """
+        Query for today's scores, highest first.
+    """
+    today = datetime.date.today()
+    return Scores.query.filter_by(
+        date=today, difficulty_id=difficulty_id).order_by(Scores.score.desc())
+
+
+def top_n_high_score_query(top_n, difficulty_id):
+    """
+        Query for the top n scores of all time.
+    """
+    return Scores.query.filter_by(difficulty_id=difficulty_id).order_by(
+        Scores.score.desc()).limit(top_n)
+
+
+def get_last_score_id():
+    """
+        Returns the highest score id stored, or 0 if there are no scores.
+    """
+    return db.session.query(func.max(Scores.score_id)).scalar() or 0
+
+
+def get_scores_after(score_id, difficulty_id):
+    """
+        Returns the scores of a difficulty with a higher id than score_id,
+        oldest first. The ids are the primary key, so only the new rows are
+        read however many scores are stored.
+    """
+    return Scores.query.filter(
+        Scores.difficulty_id == difficulty_id,
+        Scores.score_id > score_id,
+    ).order_by(Scores.score_id).all()
+
+
+def get_score_counts(difficulty_id, date=None, last_id=None):
+    """
+        Returns the number of scores with each score value, of all time or
+        of the given date, as a list of (score, count). Archived scores are
+        counted from their summaries. If last_id is given, newer scores are
+        left out, so they can be read by get_scores_after instead.
+    """
+    query = db.session.query(Scores.score, func.count()).filter(
+        Scores.difficulty_id == difficulty_id)
+    summaries = db.session.query(ScoreSummary.histogram).filter(
+        ScoreSummary.difficulty_id == difficulty_id)
+    if last_id is not None:
+        query = query.filter(Scores.score_id <= last_id)
+    if date is not None:
+        query = query.filter(Scores.date == date)
+        summaries = summaries.filter(ScoreSummary.date == date)
+
+    counts = Counter(dict(query.group_by(Scores.score).all()))
+    for histogram, in summaries:
+        for score, count in json.loads(histogram):
+            counts[score] += count
+
+    return list(counts.items())
+
+
+def get_period_high_scores(period, period_start, difficulty_id, top_n):
+    """
+        Returns the top n scores of a period leaderboard as a list of
+        dictionaries.
+    """
+    top_n_list = (
+        LeaderboardBucket.query.filter_by(
+            period=period,
+            period_start=period_start,
+            difficulty_id=difficulty_id)
+        .order_by(LeaderboardBucket.score.desc(), LeaderboardBucket.id)
+        .limit(top_n)
+    )
+    return [
+        {"id": bucket.score_id, "score": bucket.score}
+        for bucket in top_n_list
+    ]
+
+
+def compact_leaderboard_buckets(top_n):
+    """
+        Deletes all but the top n scores of every period leaderboard
+        bucket. Returns the number of scores deleted.
+    """
+    try:
+        position = func.row_number().over(
+            partition_by=(
+                LeaderboardBucket.period,
+                LeaderboardBucket.period_start,
+                LeaderboardBucket.difficulty_id,
+            ),
+            order_by=(LeaderboardBucket.score.desc(), LeaderboardBucket.id),
+        ).label("position")
+        ranked = db.session.query(LeaderboardBucket.id, position).subquery()
+        beyond_top_n = db.session.query(ranked.c.id).filter(
+            ranked.c.position > top_n)
+        deleted = db.session.query(LeaderboardBucket).filter(
+            LeaderboardBucket.id.in_(beyond_top_n)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+    except Exception as e:
+        db.session.rollback()
+        raise Exception("Couldn't compact leaderboard buckets: " + str(e))
+
+
+def get_days_to_archive(before, limit):
+    """
+        Returns the oldest dates before the given date which have scores
+        in the Scores table, at most limit of them.
+    """
+    query = (
+        db.session.query(Scores.date)
+        .filter(Scores.date < before)
+        .distinct()
+        .order_by(Scores.date)
+        .limit(limit)
+    )
+    return [date for date, in query]
+
+
+def merge_top(top_n, *tops):
+    """
+        Returns the top n of several lists of {"id", "score"}, highest
+        first. A score in more than one list is only counted once.
+    """
+    entries = dict((entry["id"], entry) for top in tops for entry in top)
+    return heapq.nlargest(
+        top_n, entries.values(), key=lambda entry: entry["score"])
+
+
+def archive_scores_of_day(date, top_n):
+    """
+        Rolls the scores of a day up into one summary per difficulty with
+        the top n scores and a histogram, and moves the scores to the
+        archive table, in one transaction. Summaries of a day archived
+        before are merged with the new scores, and the top scores are
+        merged into the all time top of the archived days.
+
+        Returns the number of scores archived.
+    """
+    try:
+        scores = Scores.query.filter(Scores.date == date)
+        histograms = {}
+        counts = (
+            db.session.query(Scores.difficulty_id, Scores.score, func.count())
+            .filter(Scores.date == date)
+            .group_by(Scores.difficulty_id, Scores.score)
+        )
+        for difficulty_id, score, count in counts:
+            histograms.setdefault(difficulty_id, Counter())[score] += count
+
+        for difficulty_id, histogram in histograms.items():
+            top = [
+                {"id": score.score_id, "score": score.score}
+                for score in scores.filter(
+                    Scores.difficulty_id == difficulty_id)
+                .order_by(Scores.score.desc(), Scores.score_id)
+                .limit(top_n)
+            ]
+            summary = db.session.get(ScoreSummary, (date, difficulty_id))
+            if summary is None:
+                summary = ScoreSummary(
+                    date=date, difficulty_id=difficulty_id, count=0,
+                    top="[]", histogram="[]")
+                db.session.add(summary)
+            else:
+                top += json.loads(summary.top)
+                top = heapq.nlargest(
+                    top_n, top, key=lambda entry: entry["score"])
+                for score, count in json.loads(summary.histogram):
+                    histogram[score] += count
+            summary.count = sum(histogram.values())
+            summary.top = json.dumps(top)
+            summary.histogram = json.dumps(sorted(histogram.items()))
+            archive_top = db.session.get(ArchiveTop, difficulty_id)
+            if archive_top is None:
+                archive_top = ArchiveTop(difficulty_id=difficulty_id, top="[]")
+                db.session.add(archive_top)
+            archive_top.top = json.dumps(
+                merge_top(top_n, json.loads(archive_top.top), top))
+
+        columns = ["score_id", "player_id", "score", "date", "difficulty_id"]
+        db.session.execute(
+            ScoresArchive.__table__.insert().from_select(
+                columns,
+                select(*[getattr(Scores, column) for column in columns])
+                .where(Scores.date == date),
+            )
+        )
+        archived = scores.delete(synchronize_session=False)
+        db.session.commit()
+        return archived
+    except Exception as e:
+        db.session.rollback()
+        raise Exception("Couldn't archive scores: " + str(e))
+
+
+def export_scores(batch_size=setup.EXPORT_BATCH_SIZE):
+    """
+        Yields all scores, archived ones first, as tuples of score_id,
+        player_id, score, date and difficulty_id. Rows are read in batches,
+        so any number of scores can be exported.
+    """
+    for model in (ScoresArchive, Scores):
+        query = db.session.query(
+            model.score_id, model.player_id, model.score, model.date,
+            model.difficulty_id,
+        ).order_by(model.score_id).execution_options(yield_per=batch_size)
+        for row in query:
+            yield tuple(row)
+
+
 def get_daily_high_score(difficulty_id):
     """
         Function for reading all daily scores.
@@ -425,13 +1131,7 @@ def get_daily_high_score(difficulty_id):
         Returns list of dictionaries.
     """
     try:
-        today = datetime.date.today()
-        # filter by today and sort by score
-        top_n_list = (
-            Scores.query.filter_by(date=today, difficulty_id=difficulty_id)
-            .order_by(Scores.score.desc())
-            .all()
-        )
+        top_n_list = daily_high_score_query(difficulty_id).all()
         # structure data
         new = [
             {"id": score.score_id, "score": score.score}
@@ -455,15 +1155,16 @@ def get_top_n_high_score_list(top_n, difficulty_id):
     """
     try:
         # read top n high scores
-        top_n_list = (
-            Scores.query.filter_by(difficulty_id=difficulty_id).order_by(
-                Scores.score.desc()).limit(top_n).all()
-        )
+        top_n_list = top_n_high_score_query(top_n, difficulty_id).all()
         new = [
             {"id": score.score_id, "score": score.score}
             for score in top_n_list
         ]
-        return new
+        # and the top scores of the archived days
+        archive_top = db.session.get(ArchiveTop, difficulty_id)
+        if archive_top is not None:
+            new += json.loads(archive_top.top)
+        return heapq.nlargest(top_n, new, key=lambda entry: entry["score"])
 
     except AttributeError as e:
         raise AttributeError(
@@ -477,7 +1178,7 @@ def to_norwegian(english_label):
         english word.
     """
     try:
-        query = Labels.query.get(english_label)
+        query = db.session.get(Labels, english_label)
         return str(query.norwegian)
 
     except AttributeError as e:
@@ -510,10 +1211,15 @@ def seed_labels(app, filepath):
             with open(filepath) as csvfile:
                 try:
                     readCSV = csv.reader(csvfile, delimiter=",")
-                    for row in readCSV:
-                        # Insert label into Labels table if not present
-                        if Labels.query.get(row[0]) is None:
-                            insert_into_labels(row[0], row[1])
+                    # one query for the existing labels and one commit for
+                    # the new ones, instead of a round trip per label
+                    existing = set(db.session.scalars(select(Labels.english)))
+                    with unit_of_work():
+                        for row in readCSV:
+                            # Insert label into Labels table if not present
+                            if row[0] not in existing:
+                                insert_into_labels(row[0], row[1])
+                                existing.add(row[0])
                 except AttributeError as e:
                     raise AttributeError(
                         "Could not insert into Labels table: " + str(e)
@@ -530,7 +1236,7 @@ def insert_into_labels(english, norwegian):
         try:
             label_row = Labels(english=english, norwegian=norwegian)
             db.session.add(label_row)
-            db.session.commit()
+            _commit()
             return True
         except Exception as e:
             raise Exception("Could not insert into Labels table: " + str(e))
@@ -569,10 +1275,15 @@ def get_all_labels():
 
 def get_iteration_name():
     """
-        Returns the first and only iteration name that should be in the model
+        Returns the first and only iteration name that should be in the model.
+        Raises an exception if no iteration has been stored yet, like in a
+        new database.
     """
     iteration = Iteration.query.filter_by().first()
-    assert iteration.iteration_name is not None
+    if iteration is None or iteration.iteration_name is None:
+        raise Exception(
+            "No iteration in the database, train a model or run "
+            "'python -m customvision.trainer sync'")
     return iteration.iteration_name
 
 
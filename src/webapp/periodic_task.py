@@ -0,0 +1,54 @@
+"""
+    Base class for maintenance jobs run in the background.
+"""
+import logging
+from abc import ABC
+from abc import abstractmethod
+
+
+class PeriodicTask(ABC):
+    """
+        Runs run_once every interval in a socketio background task, inside
+        an app context, so no event handler pays for the work. run_once
+        returns the number of items handled, which is logged with
+        done_message, if set, when it is not zero. A failed run is logged
+        and the task goes on with the next interval.
+    """
+
+    # names the task in the log
+    name = "Task"
+    # logged with the number of items handled in a run
+    done_message = None
+
+    def __init__(self, socketio, app, interval):
+        self.socketio = socketio
+        self.app = app
+        self.interval = interval
+        self.started = False
+
+    def start(self):
+        """
+            Starts running every interval, unless already started.
+        """
+        if self.started:
+            return
+
+        self.started = True
+        self.socketio.start_background_task(self._run)
+
+    @abstractmethod
+    def run_once(self):
+        """
+            Does the work of one run. Returns the number of items handled.
+        """
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            with self.app.app_context():
+                try:
+                    handled = self.run_once()
+                    if handled > 0 and self.done_message is not None:
+                        logging.info(self.done_message, handled)
+                except Exception as e:
+                    logging.error("%s failed: %s", self.name, e)
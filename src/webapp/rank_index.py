@@ -0,0 +1,146 @@
+"""
+    Index of all scores for looking up the rank of a score.
+"""
+import datetime
+import threading
+from collections import Counter
+from utilities import setup
+from utilities.fenwick_tree import FenwickTree
+from webapp import models
+
+
+class RankIndex:
+    """
+        Number of scores with each whole point value, of all time and of
+        today, for each difficulty. The counts are kept in Fenwick trees,
+        so the rank of a score is found in O(log n) of the highest score
+        without counting rows. The counts of a difficulty are read from the
+        database with a grouped query on first use, which must happen
+        inside an app context, and new scores are added as they are posted.
+        The daily counts are emptied when the date changes.
+
+        Scores posted to other server instances are only counted when
+        reload adds the scores stored since the counts were read, which
+        StandingsRefresher does every refresh interval, so ranks may be
+        that much out of date.
+    """
+
+    def __init__(self, today=datetime.date.today):
+        self.today = today
+        self.day = today()
+        # difficulty_id -> FenwickTree
+        self.total = {}
+        self.daily = {}
+        # difficulty_id -> highest score id read
+        self.last_ids = {}
+        # (difficulty_id, position, date) -> number of scores added here
+        # and not yet read back by reload
+        self.local = Counter()
+        self.lock = threading.Lock()
+
+    def add(self, score, difficulty_id):
+        """
+            Adds a score posted today.
+        """
+        with self.lock:
+            self._load(difficulty_id)
+            position = self._position(score)
+            self.total[difficulty_id].add(position)
+            self.daily[difficulty_id].add(position)
+            self.local[difficulty_id, position, self.day] += 1
+
+    def rank(self, score, difficulty_id):
+        """
+            Returns the all time and daily rank of a score, which is one
+            more than the number of higher scores.
+        """
+        with self.lock:
+            self._load(difficulty_id)
+            return {
+                "total": self._rank(self.total[difficulty_id], score),
+                "daily": self._rank(self.daily[difficulty_id], score),
+            }
+
+    def reload(self):
+        """
+            Counts the scores stored since the last read for every
+            difficulty used so far. Only rows with a higher id than the last
+            one read are fetched, outside the lock. Must be called inside an
+            app context. Scores added by this instance were counted already,
+            so a stored score with the same value and date as one of them is
+            taken to be it and skipped. Returns the number of difficulties
+            read.
+        """
+        with self.lock:
+            last_ids = dict(self.last_ids)
+
+        for difficulty_id, last_id in last_ids.items():
+            scores = models.get_scores_after(last_id, difficulty_id)
+            with self.lock:
+                self._load(difficulty_id)
+                self._merge(difficulty_id, scores)
+
+        return len(last_ids)
+
+    def _merge(self, difficulty_id, scores):
+        for score in scores:
+            if score.score_id <= self.last_ids[difficulty_id]:
+                continue
+
+            self.last_ids[difficulty_id] = score.score_id
+            position = self._position(score.score)
+            key = (difficulty_id, position, score.date)
+            if self.local[key]:
+                self.local[key] -= 1
+                if not self.local[key]:
+                    del self.local[key]
+                continue
+
+            self.total[difficulty_id].add(position)
+            if score.date == self.day:
+                self.daily[difficulty_id].add(position)
+
+    def _rank(self, tree, score):
+        return 1 + tree.total - tree.prefix_sum(self._position(score) + 1)
+
+    def _position(self, score):
+        # scores are stored as whole points from 0 to setup.MAX_SCORE, so
+        # the trees never grow past that, whatever score is looked up
+        return min(max(int(score), 0), setup.MAX_SCORE)
+
+    def _load(self, difficulty_id):
+        """
+            Reads the counts of a difficulty unless already done, and starts
+            a new day if the date has changed.
+        """
+        today = self.today()
+        if today != self.day:
+            self.day = today
+            self.daily = dict((i, FenwickTree()) for i in self.daily)
+
+        if difficulty_id in self.total:
+            return
+
+        # newer scores are left to reload, so none is counted twice
+        last_id = models.get_last_score_id()
+        self.last_ids[difficulty_id] = last_id
+        self.total[difficulty_id], self.daily[difficulty_id] = self._read(
+            difficulty_id, today, last_id)
+
+    def _read(self, difficulty_id, day, last_id):
+        """
+            Returns the all time counts of a difficulty and the counts of
+            the given day in the database, up to the score with id last_id.
+        """
+        return (
+            self._tree(models.get_score_counts(
+                difficulty_id, last_id=last_id)),
+            self._tree(models.get_score_counts(difficulty_id, day, last_id)),
+        )
+
+    def _tree(self, counts):
+        tree = FenwickTree()
+        for score, count in counts:
+            tree.add(self._position(score), count)
+
+        return tree
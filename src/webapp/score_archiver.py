@@ -0,0 +1,41 @@
+"""
+    Scheduled archival of old scores.
+"""
+import datetime
+from utilities import setup
+from webapp import models
+from webapp.periodic_task import PeriodicTask
+
+
+class ScoreArchiver(PeriodicTask):
+    """
+        Keeps the Scores table small by rolling the scores of old days up
+        into daily summaries in the background, and moving the scores to
+        the archive table. The summaries keep the top scores and the
+        number of scores with each value, which is all the leaderboards
+        and rank lookups need, so they give the same results as before.
+    """
+
+    name = "Score archival"
+    done_message = "Archived %d scores"
+
+    def __init__(self, socketio, app, interval=setup.SCORE_ARCHIVE_INTERVAL,
+                 age=setup.SCORE_ARCHIVE_AGE,
+                 days_per_run=setup.SCORE_ARCHIVE_DAYS_PER_RUN):
+        super().__init__(socketio, app, interval)
+        self.age = age
+        self.days_per_run = days_per_run
+
+    def run_once(self):
+        """
+            Archives the oldest days which are old enough, each in its own
+            transaction. Returns the number of scores archived.
+        """
+        cutoff = datetime.date.today() - datetime.timedelta(days=self.age)
+        archived = 0
+        for date in models.get_days_to_archive(cutoff, self.days_per_run):
+            archived += models.archive_scores_of_day(date, setup.TOP_N)
+            # let other tasks run between days
+            self.socketio.sleep(0)
+
+        return archived
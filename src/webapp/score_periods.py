@@ -0,0 +1,60 @@
+"""
+    Time windows of the period leaderboards.
+
+    A week starts on monday and a month on its first day. Exhibition
+    periods are set with the "EXHIBITION_STARTS" key, a comma separated
+    list of ISO dates, and each one lasts until the next one starts.
+"""
+import bisect
+import datetime
+import functools
+from utilities import setup
+from utilities.exceptions import UserError
+from utilities.keys import Keys
+
+
+@functools.lru_cache(maxsize=1)
+def exhibition_starts():
+    """
+        Returns the sorted start dates of the exhibition periods.
+    """
+    if not Keys.exists("EXHIBITION_STARTS"):
+        return []
+
+    return sorted(
+        datetime.date.fromisoformat(start.strip())
+        for start in Keys.get("EXHIBITION_STARTS").split(",")
+        if start.strip() != ""
+    )
+
+
+def period_start(period, date):
+    """
+        Returns the first day of the period of the given kind which
+        contains the date, or None if the date is in no such period.
+    """
+    if period == setup.PERIOD_WEEK:
+        return date - datetime.timedelta(days=date.weekday())
+    if period == setup.PERIOD_MONTH:
+        return date.replace(day=1)
+    if period == setup.PERIOD_EXHIBITION:
+        starts = exhibition_starts()
+        i = bisect.bisect_right(starts, date)
+        return starts[i - 1] if i > 0 else None
+
+    raise UserError("Unknown period: " + str(period))
+
+
+def periods_of(date):
+    """
+        Returns (period, start) for every period containing the date.
+    """
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    periods = []
+    for period in setup.PERIODS:
+        start = period_start(period, date)
+        if start is not None:
+            periods.append((period, start))
+
+    return periods
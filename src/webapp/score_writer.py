@@ -0,0 +1,132 @@
+"""
+    Write-behind buffer for posted scores.
+"""
+import atexit
+import logging
+import signal
+import threading
+from utilities import setup
+from webapp import models
+from webapp.periodic_task import PeriodicTask
+
+
+class ScoreWriter(PeriodicTask):
+    """
+        Buffers posted scores and inserts them in batches, when the batch
+        is full and otherwise every flush interval, so a burst of finished
+        games becomes a few transactions instead of one per player. Scores
+        are added to the in-memory leaderboards before they are buffered,
+        and the leaderboard entry of a score gets its id when the batch is
+        stored.
+
+        The buffer is flushed when the process exits, also on SIGTERM.
+        Scores which can't be stored are retried a few times and then
+        dropped, and scores still buffered if the process is killed are
+        lost.
+    """
+
+    name = "Storing scores"
+
+    def __init__(self, socketio, app, batch_size=setup.SCORE_BATCH_SIZE,
+                 interval=setup.SCORE_FLUSH_INTERVAL,
+                 max_attempts=setup.SCORE_MAX_ATTEMPTS):
+        super().__init__(socketio, app, interval)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        # list of ((player_id, score, date, difficulty_id), entry, number
+        # of failed flushes)
+        self.pending = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+    def start(self):
+        """
+            Starts flushing every interval, and flushes the buffer when the
+            process exits.
+        """
+        if self.started:
+            return
+
+        atexit.register(self.flush)
+        if (threading.current_thread() is threading.main_thread()
+                and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL):
+            # exit normally on SIGTERM, so the atexit flush runs
+            signal.signal(signal.SIGTERM, _exit_on_signal)
+        super().start()
+
+    def add(self, player_id, score, date, difficulty_id, entry=None):
+        """
+            Buffers a score. Invalid scores are rejected right away. entry
+            is the leaderboard entry whose "id" is set when the score is
+            stored.
+        """
+        row = (player_id, score, date, difficulty_id)
+        models.check_score(*row)
+        with self.lock:
+            self.pending.append((row, entry, 0))
+            full = len(self.pending) >= self.batch_size
+
+        if full:
+            self.socketio.start_background_task(self.flush)
+
+    def flush(self):
+        """
+            Inserts all buffered scores in one transaction. If that fails,
+            the scores are inserted one at a time, so a bad score can't
+            hold back the others. A score which fails while others are
+            stored is dropped. If every score fails, e.g. because the
+            database is down, they are kept for the next flush, at most
+            max attempts times. Returns the number of scores stored.
+        """
+        with self.flush_lock:
+            with self.lock:
+                batch = self.pending
+                self.pending = []
+            if len(batch) == 0:
+                return 0
+
+            try:
+                self._store(batch)
+                return len(batch)
+            except Exception as e:
+                logging.warning(
+                    "Could not store %d scores, storing them one at a "
+                    "time: %s", len(batch), e)
+
+            failed = []
+            for item in batch:
+                try:
+                    self._store([item])
+                except Exception as e:
+                    failed.append((item, e))
+
+            stored = len(batch) - len(failed)
+            retry = []
+            for (row, entry, attempts), e in failed:
+                if stored > 0 or attempts + 1 >= self.max_attempts:
+                    logging.error("Dropped score %s: %s", row, e)
+                else:
+                    retry.append((row, entry, attempts + 1))
+            with self.lock:
+                self.pending = retry + self.pending
+            return stored
+
+    def _store(self, items):
+        with self.app.app_context():
+            with models.unit_of_work():
+                score_ids = models.insert_many_scores(
+                    [row for row, _, _ in items])
+
+        for (_, entry, _), score_id in zip(items, score_ids):
+            if entry is not None:
+                entry["id"] = score_id
+
+    def run_once(self):
+        """
+            Flushes the buffer. Returns the number of scores stored.
+        """
+        return self.flush()
+
+
+def _exit_on_signal(signum, frame):
+    raise SystemExit(0)
@@ -0,0 +1,74 @@
+"""
+    Encoding of Socket.IO event payloads.
+"""
+import json
+import threading
+
+
+class EventSerializer:
+    """
+        Lets events carry native objects instead of JSON strings. Old
+        clients send and receive payloads as JSON strings, which Socket.IO
+        then encodes a second time. A client which sends a native object
+        is remembered, and from then on gets native objects back. Events
+        to a room are encoded separately for old and new clients.
+    """
+
+    def __init__(self, socketio, namespace="/"):
+        self.socketio = socketio
+        self.namespace = namespace
+        self.native_clients = set()
+        self.lock = threading.Lock()
+
+    def decode(self, data, sid):
+        """
+            Returns the payload of an incoming event as an object.
+        """
+        if isinstance(data, (str, bytes)):
+            return json.loads(data or "null")
+
+        if data is not None:
+            with self.lock:
+                self.native_clients.add(sid)
+        return data
+
+    def encode(self, data, sid):
+        """
+            Returns the payload in the encoding the client understands.
+        """
+        if sid in self.native_clients:
+            return data
+
+        return json.dumps(data)
+
+    def emit(self, event, data, room):
+        """
+            Emits an event to a room or a single client, encoding the
+            payload once per encoding used by its members. Only members
+            connected to this server are known, so with a message queue
+            the encoding of the local members decides.
+        """
+        manager = self.socketio.server.manager
+        sids = [
+            sid for sid, _ in manager.get_participants(self.namespace, room)
+        ]
+        native = [sid for sid in sids if sid in self.native_clients]
+        if len(native) == 0 or len(native) == len(sids):
+            # every member uses the same encoding
+            payload = data if len(native) > 0 else json.dumps(data)
+            self.socketio.emit(
+                event, payload, room=room, namespace=self.namespace)
+            return
+
+        encoded = json.dumps(data)
+        for sid in sids:
+            payload = data if sid in self.native_clients else encoded
+            self.socketio.emit(
+                event, payload, room=sid, namespace=self.namespace)
+
+    def forget(self, sid):
+        """
+            Forgets a client which has disconnected.
+        """
+        with self.lock:
+            self.native_clients.discard(sid)
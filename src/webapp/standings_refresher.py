@@ -0,0 +1,32 @@
+"""
+    Scheduled sync of the in-memory leaderboard and rank counts.
+"""
+from utilities import setup
+from webapp.periodic_task import PeriodicTask
+
+
+class StandingsRefresher(PeriodicTask):
+    """
+        Adds the scores stored since the last refresh to the in-memory
+        leaderboard and rank counts every refresh interval. Each server
+        instance only adds the scores posted to it, so without a reload the
+        instances drift apart. Buffered scores are stored first, so the
+        scores posted to this instance are recognized when read back.
+    """
+
+    name = "Standings refresh"
+
+    def __init__(self, socketio, app, leaderboard, rank_index, score_writer,
+                 interval=setup.STANDINGS_REFRESH_INTERVAL):
+        super().__init__(socketio, app, interval)
+        self.leaderboard = leaderboard
+        self.rank_index = rank_index
+        self.score_writer = score_writer
+
+    def run_once(self):
+        """
+            Stores buffered scores and adds the new scores to the lists and
+            counts. Returns the number of difficulties reloaded.
+        """
+        self.score_writer.flush()
+        return self.leaderboard.reload() + self.rank_index.reload()
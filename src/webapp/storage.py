@@ -1,137 +1,117 @@
 """
-    Tools for interacting with Azure blob storage.
+    Tools for storing drawings. Images are kept in Azure blob storage or on
+    the local filesystem, depending on the "STORAGE_BACKEND" key.
 """
-import os
-import uuid
-import sys
-import time
 import logging
-from webapp import api
-from threading import Thread
-from azure.storage.blob import BlobClient
-from azure.storage.blob import BlobServiceClient
+import mimetypes
 from utilities.keys import Keys
 from utilities import setup
+from webapp.image_index import ImageIndex
+from webapp.azure_storage import AzureStorage
+from webapp.local_storage import LocalStorage
 import random
 import base64
 
+image_index = ImageIndex(setup.IMAGE_INDEX_PATH)
+backends = {}
 
-def save_image(image, label, certainty):
+
+def get_backend(container_name=setup.CONTAINER_NAME_NEW):
+    """
+        Returns the storage backend for the given container. Backends are
+        created once per container and reused.
     """
-        Upload image to blob storage container named "newimgcontainer" with same name as image label.
-        Image is renamed to assure unique name. Uploads only if certainty is larger than threshold
-        Returns public URL to access image, or non if certainty too low.
+    if container_name in backends:
+        return backends[container_name]
+
+    if Keys.exists("STORAGE_BACKEND"):
+        backend_name = Keys.get("STORAGE_BACKEND")
+    else:
+        backend_name = setup.STORAGE_BACKEND_AZURE
+
+    if backend_name == setup.STORAGE_BACKEND_AZURE:
+        backend = AzureStorage(container_name)
+    elif backend_name == setup.STORAGE_BACKEND_LOCAL:
+        backend = LocalStorage(container_name, Keys.get("LOCAL_STORAGE_PATH"))
+    else:
+        raise ValueError("Unknown storage backend: " + backend_name)
+
+    backends[container_name] = backend
+    return backend
+
+
+def save_image(image, label, certainty, decoded=None):
     """
-    # save image in blob storage if certainty above threshold
+        Save image in the container named "newimgcontainer" with same name as image label.
+        Image is named by a hash of its normalized content, and drawings which have already been
+        saved are skipped. Saves only if certainty is larger than threshold
+        Returns URL to access image, or non if certainty too low or image is a duplicate.
+        decoded is the already decoded image, if available, to avoid decoding it again.
+    """
+    # save image in storage if certainty above threshold
     if certainty < setup.SAVE_CERTAINTY:
         return
 
-    file_name = f"{label}/{uuid.uuid4().hex}.png"
-    connection_string = Keys.get("BLOB_CONNECTION_STRING")
-    base_url = Keys.get("BASE_BLOB_URL")
-    container_name = setup.CONTAINER_NAME_NEW
+    digest = image_index.digest(image, label, decoded)
+    if not image_index.add(digest):
+        logging.info(
+            "skipped duplicate image, dedup ratio: %.3f",
+            image_index.dedup_ratio())
+        return
+
+    file_name = f"{label}/{digest.hex()}.png"
+    backend = get_backend()
     try:
-        blob = BlobClient.from_connection_string(
-            conn_str=connection_string,
-            container_name=container_name,
-            blob_name=file_name,
-        )
-        blob.upload_blob(image)
-        container_client = blob_connection()
-        # update metadata in blob
-        image_count = int(
-            container_client.get_container_properties().metadata["image_count"]
-        )
-        metadata = {"image_count": str(image_count + 1)}
-        container_client.set_container_metadata(metadata=metadata)
+        url = backend.save(file_name, image)
+    except FileExistsError:
+        # another worker saved the same drawing
+        image_index.commit(digest)
+        return
     except Exception as e:
-        api.app.logger.error(e)
-    url = base_url + "/" + container_name + "/" + file_name
+        image_index.discard(digest)
+        logging.error(e)
+        url = backend.url(file_name)
+    else:
+        image_index.commit(digest)
     logging.info(url)
     return url
 
 
-def clear_dataset():
+def dedup_stats():
     """
-        Method for resetting dataset back to original dataset
-        from Google Quickdraw. It deletes the 'New Images Container'.
-        NOTE: container is deleted by garbage collection, which does not
-        happen instantly. A new blob cannot be initalized before old is collected.
+        Returns deduplication counters for saved images.
     """
-    container_client = blob_connection()
-    try:
-        container_client.delete_container()
-    except Exception as e:
-        raise Exception("could not delete container" + str(e))
-    Thread(target=create_container).start()
+    return image_index.stats()
 
 
-def create_container():
+def clear_dataset():
     """
-        Method for creating a new container. Tries to create a new container
-        n times, to make sure Azure garbage collection is finished.
+        Method for resetting dataset back to original dataset
+        from Google Quickdraw. It deletes all images in the 'New Images Container'.
     """
-    tries = setup.CREATE_CONTAINER_TRIES
-    waiting_time = setup.CREATE_CONTAINER_WAITER
-    container_client = blob_connection()
-    success = False
-    metadata = {"image_count": "0"}
-    for i in range(tries):
-        if success:
-            return
-
-        time.sleep(waiting_time)
-        try:
-            container_client.create_container(
-                metadata=metadata, public_access="container"
-            )
-            success = True
-        except Exception as e:
-            api.app.logger.error(e)
+    get_backend().reset()
+    image_index.clear()
 
 
 def image_count():
     """
         Returns number of images in 'newimgcontainer'.
     """
-    container_client = blob_connection()
-    return container_client.get_container_properties().metadata["image_count"]
-
-
-def blob_connection(container_name=setup.CONTAINER_NAME_NEW):
-    """
-        Helper method for connection to blob service.
-    """
-    connect_str = Keys.get("BLOB_CONNECTION_STRING")
-    try:
-        # Instantiate a BlobServiceClient using a connection string
-        blob_service_client = BlobServiceClient.from_connection_string(
-            connect_str
-        )
-        # Instantiate a ContainerClient
-        container_client = blob_service_client.get_container_client(
-            container_name
-        )
-    except Exception as e:
-        raise Exception("Could not connect to blob client: " + str(e))
-
-    return container_client
+    return get_backend().count()
 
 
 def get_n_random_images_from_label(n, label):
     """
-        Returns n random images from the blob storage container with the given label.
+        Returns n random images from the original image container with the given label.
     """
-    container_client = blob_connection(setup.CONTAINER_NAME_ORIGINAL)
-    blob_prefix = f"{label}/"
-    blobs = list(container_client.list_blobs(name_starts_with=blob_prefix))
-    selected_blobs = random.sample(blobs, min(n, len(blobs)))
+    backend = get_backend(setup.CONTAINER_NAME_ORIGINAL)
+    names = backend.list(f"{label}/")
+    selected_names = random.sample(names, min(n, len(names)))
     images = []
-    for blob in selected_blobs:
-        blob_client = container_client.get_blob_client(blob)
-        image_data = blob_client.download_blob().readall()
+    for name in selected_names:
+        content_type = mimetypes.guess_type(name)[0]
         decoded_image = image_to_data_url(
-            image_data, blob.content_settings.content_type)
+            backend.fetch(name), content_type or "application/octet-stream")
         images.append(decoded_image)
     return images
 
@@ -148,13 +128,10 @@ def get_images_from_relative_url(image_urls):
     """
         Returns a list of images from a list of relative URLs.
     """
-    container_client = blob_connection(setup.CONTAINER_NAME_ORIGINAL)
+    backend = get_backend(setup.CONTAINER_NAME_ORIGINAL)
     images = []
     for image in image_urls:
-        blob_client = container_client.get_blob_client(image)
-
-        image_data = blob_client.download_blob().readall()
         decoded_image = image_to_data_url(
-            image_data, "application/octet-stream")
+            backend.fetch(image), "application/octet-stream")
         images.append(decoded_image)
     return images
@@ -0,0 +1,58 @@
+"""
+    Interface for the storage used to keep drawings.
+"""
+from abc import ABC
+from abc import abstractmethod
+
+
+class StorageBackend(ABC):
+    """
+        Base class for storage backends. A backend stores images by name in
+        a single container, where names use "<label>/<file name>" so that
+        all images of a label share a prefix. A backend which doesn't
+        implement every method can't be created.
+    """
+
+    # True if Custom Vision can download the images from their URLs
+    public_urls = True
+
+    def __init__(self, container_name):
+        self.container_name = container_name
+
+    @abstractmethod
+    def save(self, name, data):
+        """
+            Stores data under the given name and returns the URL of the
+            image. Raises FileExistsError if the name is taken.
+        """
+
+    @abstractmethod
+    def fetch(self, name):
+        """
+            Returns the content stored under the given name as a bytes-like
+            object.
+        """
+
+    @abstractmethod
+    def list(self, prefix=""):
+        """
+            Returns the names of all images starting with prefix.
+        """
+
+    @abstractmethod
+    def count(self):
+        """
+            Returns the number of images saved in the container.
+        """
+
+    @abstractmethod
+    def reset(self):
+        """
+            Deletes all images in the container.
+        """
+
+    @abstractmethod
+    def url(self, name):
+        """
+            Returns the URL of the image with the given name.
+        """
@@ -0,0 +1,99 @@
+"""
+    Server side buffer of drawing strokes for the stroke-delta protocol.
+"""
+import threading
+from array import array
+from io import BytesIO
+from PIL import Image
+from PIL import ImageDraw
+from utilities import setup
+from utilities.exceptions import UserError
+
+
+class StrokeBuffer:
+    """
+        Keeps the strokes of each player's current drawing, so clients only
+        send the points added since their last message instead of the whole
+        canvas. Points are stored as unsigned 16 bit coordinates, and a new
+        game or round starts a new drawing.
+    """
+
+    def __init__(self, size=setup.STROKE_CANVAS_SIZE,
+                 max_points=setup.STROKE_MAX_POINTS):
+        self.size = size
+        self.max_points = max_points
+        # player_id -> [(game_id, round), {stroke_id: array}, point count]
+        self.drawings = {}
+        self.lock = threading.Lock()
+
+    def add(self, player_id, game_id, round_num, strokes):
+        """
+            Appends points to the player's drawing. The whole message is
+            checked before any of it is applied, so an invalid message
+            leaves the drawing as it was.
+
+            Parameters:
+            strokes: list of {"id": int, "points": [x0, y0, x1, y1, ...]},
+            points are appended to the stroke with the same id
+        """
+        parsed = []
+        try:
+            for stroke in strokes:
+                stroke_id = int(stroke["id"])
+                points = stroke["points"]
+                if len(points) % 2 != 0:
+                    raise ValueError("odd number of coordinates")
+                parsed.append((stroke_id, array("H", (
+                    min(max(int(p), 0), self.size - 1) for p in points))))
+        except (KeyError, TypeError, ValueError):
+            raise UserError("Invalid stroke data")
+
+        added = sum(len(points) // 2 for _, points in parsed)
+        key = (game_id, round_num)
+        with self.lock:
+            drawing = self.drawings.get(player_id)
+            if drawing is None or drawing[0] != key:
+                drawing = [key, {}, 0]
+            if drawing[2] + added > self.max_points:
+                raise UserError("Drawing has too many points")
+
+            self.drawings[player_id] = drawing
+            drawing[2] += added
+            for stroke_id, points in parsed:
+                drawing[1].setdefault(stroke_id, array("H")).extend(points)
+
+    def rasterize(self, player_id, game_id):
+        """
+            Draws the player's strokes black on white and returns the
+            image as png bytes.
+        """
+        with self.lock:
+            drawing = self.drawings.get(player_id)
+            if drawing is None or drawing[0][0] != game_id:
+                strokes = []
+            else:
+                strokes = [drawing[1][i] for i in sorted(drawing[1])]
+
+        image = Image.new("L", (self.size, self.size), 255)
+        draw = ImageDraw.Draw(image)
+        width = setup.STROKE_WIDTH
+        for points in strokes:
+            if len(points) == 2:
+                x, y = points
+                draw.ellipse(
+                    (x - width / 2, y - width / 2, x + width / 2,
+                     y + width / 2), fill=0)
+            else:
+                draw.line(points.tolist(), fill=0, width=width, joint="curve")
+
+        stream = BytesIO()
+        image.save(
+            stream, format="PNG", compress_level=setup.PNG_COMPRESS_LEVEL)
+        return stream.getvalue()
+
+    def clear(self, player_id):
+        """
+            Drops the drawing of a player.
+        """
+        with self.lock:
+            self.drawings.pop(player_id, None)
@@ -81,6 +81,8 @@ printline
 
 # Launch app
 cd src
+echo "Setting up the database schema"
+python3 -m webapp.migrations || exit 1
 echo "Launching eventlet server"
 python3 -m webapp.app
 